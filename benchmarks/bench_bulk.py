@@ -0,0 +1,83 @@
+"""
+Benchmark the bulk loading API, against the one-by-one calls.
+Usage: python benchmarks/bench_bulk.py [scale]
+"""
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import time
+from json import load
+from graphh import Graph, Neuro
+
+MISERABLES = load(open('tests/data/les_miserables.json'))
+COUNTRIES = load(open('tests/data/countries.json'))
+FIELDS = ('capital', 'region', 'subregion', 'cca3', 'ccn3', 'cioc', 'area')
+
+
+def iter_links(scale):
+    for i in range(scale):
+        for link in MISERABLES['links']:
+            yield f'{link["source"]}{i}', 'knows', f'{link["target"]}{i}'
+
+
+def iter_countries(scale):
+    for i in range(scale):
+        for item in COUNTRIES:
+            uid = f'{item["cca2"]}{i}'
+            for field in FIELDS:
+                yield uid, field, item[field]
+            for border in item['borders']:
+                yield uid, 'borders', border
+
+
+def timed(name, func, *args):
+    t1 = time.time()
+    func(*args)
+    t2 = time.time()
+    print('{:32} `{:.4f}` seconds.'.format(name, t2 - t1))
+    return t2 - t1
+
+
+def bench_nodes_edges(scale):
+    names = [f'{n["id"]}{i}' for i in range(scale) for n in MISERABLES['nodes']]
+    pairs = [(f'{l["source"]}{i}', f'{l["target"]}{i}') for i in range(scale) for l in MISERABLES['links']]
+
+    def one_by_one():
+        g = Graph()
+        for name in names:
+            g.add_node(name)
+        for head, tail in pairs:
+            g.add_edge(g.get_node(head), g.get_node(tail))
+
+    def bulk():
+        g = Graph()
+        keys = dict(zip(names, g.add_nodes_from(names)))
+        g.add_edges_from((keys[head], keys[tail]) for head, tail in pairs)
+
+    print(f'Miserables x{scale} :: {len(names)} nodes, {len(pairs)} edges')
+    t1 = timed('Graph.add_node / add_edge', one_by_one)
+    t2 = timed('Graph.add_nodes_from / edges', bulk)
+    print('Speed-up: x{:.2f}\n'.format(t1 / t2))
+
+
+def bench_triples(name, triples):
+    def one_by_one():
+        g = Neuro()
+        for s, p, t in triples:
+            g.add_triple(s, p, t)
+
+    def bulk():
+        Neuro().add_triples(triples)
+
+    print(f'{name} :: {len(triples)} triples')
+    t1 = timed('Neuro.add_triple', one_by_one)
+    t2 = timed('Neuro.add_triples', bulk)
+    print('Speed-up: x{:.2f}\n'.format(t1 / t2))
+
+
+if __name__ == '__main__':
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    bench_nodes_edges(scale)
+    bench_triples(f'Miserables x{scale}', list(iter_links(scale)))
+    bench_triples(f'Countries x{scale}', list(iter_countries(scale)))
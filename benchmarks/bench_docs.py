@@ -0,0 +1,86 @@
+"""
+Benchmark the bulk document API, against the one-by-one calls,
+and the hot reads, with and without the cache.
+Usage: python benchmarks/bench_docs.py [scale] [workers]
+"""
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import time
+from json import load
+from graphh import FsConvention
+
+COUNTRIES = load(open('tests/data/countries.json'))
+
+
+def iter_docs(scale):
+    for i in range(scale):
+        for item in COUNTRIES:
+            yield f'{item["cca2"]}{i}', {
+                'common_name': item['name']['common'],
+                'capital': item['capital'],
+                'region': item['region'],
+                'sub_region': item['subregion'],
+                'area_size': item['area'],
+                'borders': item['borders'],
+                'currencies': item['currency'],
+            }
+
+
+def timed(name, func, *args):
+    t1 = time.time()
+    func(*args)
+    t2 = time.time()
+    print('{:32} `{:.4f}` seconds.'.format(name, t2 - t1))
+    return t2 - t1
+
+
+def bench_docs(scale, workers):
+    docs = list(iter_docs(scale))
+
+    def one_by_one():
+        g = FsConvention('Geo')
+        g.create_table('countries')
+        for uid, data in docs:
+            g.create_doc('countries', uid, data)
+
+    def bulk(workers=0):
+        g = FsConvention('Geo')
+        g.create_table('countries')
+        g.create_docs('countries', docs, workers=workers)
+
+    print(f'Countries x{scale} :: {len(docs)} docs')
+    t1 = timed('FsConvention.create_doc', one_by_one)
+    t2 = timed('FsConvention.create_docs', bulk)
+    print('Speed-up: x{:.2f}'.format(t1 / t2))
+    if workers:
+        t3 = timed(f'create_docs, {workers} workers', bulk, workers)
+        print('Speed-up: x{:.2f}'.format(t1 / t3))
+
+
+def bench_cache(scale, reads=100_000):
+    g = FsConvention('Geo')
+    g.create_table('countries')
+    g.create_docs('countries', iter_docs(scale))
+    # The same few hot documents and filters, over and over
+    uids = [f'{item["cca2"]}0' for item in COUNTRIES[:20]]
+    regions = ('Europe', 'Asia', 'Africa')
+
+    def hot_reads():
+        for i in range(reads):
+            g.get_doc('countries', uids[i % len(uids)])
+            if i % 100 == 0:
+                g.query_docs('countries', {'region': regions[i % len(regions)]})
+
+    t1 = timed('get_doc + query_docs', hot_reads)
+    g.enable_cache(size=1000)
+    t2 = timed('get_doc + query_docs, cached', hot_reads)
+    print('Speed-up: x{:.2f}'.format(t1 / t2), g.cache_info())
+
+
+if __name__ == '__main__':
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    bench_docs(scale, workers)
+    bench_cache(scale)
@@ -0,0 +1,72 @@
+"""
+Stress the concurrency mode: the read throughput of many threads,
+with and without a writer thread adding triples at the same time.
+Usage: python benchmarks/bench_locks.py [readers] [seconds]
+"""
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import time
+import threading
+from json import load
+from graphh.locks import SafeNeuro
+
+COUNTRIES = load(open('tests/data/countries.json'))
+FIELDS = ('capital', 'region', 'subregion', 'cca3')
+
+
+def iter_countries(copy):
+    for item in COUNTRIES:
+        uid = f'{item["cca2"]}{copy}'
+        for field in FIELDS:
+            yield uid, field, item[field]
+        for border in item['borders']:
+            yield uid, 'borders', border
+
+
+def stress(g, readers, seconds, writing):
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+    region = g.get_node('region')
+
+    def read(n):
+        while not stop.is_set():
+            item = COUNTRIES[reads[n] % len(COUNTRIES)]
+            list(g.query_sp_t(f'{item["cca2"]}0', 'borders'))
+            list(g.query_pt_s('region', item['region']))
+            g.out_degree(region)
+            reads[n] += 1
+
+    def write():
+        copy = 1
+        while not stop.is_set():
+            triples = list(iter_countries(copy))
+            with g.writing():
+                for s, p, t in triples:
+                    g.add_triple(s, p, t)
+            writes[0] += len(triples)
+            copy += 1
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    if writing:
+        threads.append(threading.Thread(target=write))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(reads) / seconds, writes[0] / seconds
+
+
+if __name__ == '__main__':
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    for writing in (False, True):
+        g = SafeNeuro()
+        g.add_triples(iter_countries(0))
+        reads, writes = stress(g, readers, seconds, writing)
+        print('{} readers, {:6} :: {:10.0f} reads/s, {:10.0f} triples/s written, {} nodes.'.format(
+            readers, 'writer' if writing else 'alone', reads, writes, g.number_of_nodes()))
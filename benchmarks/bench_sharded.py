@@ -0,0 +1,51 @@
+"""
+Benchmark the sharded Neuro, against a single Neuro in this process.
+Usage: python benchmarks/bench_sharded.py [copies] [shards]
+"""
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import time
+from json import load
+from graphh import Neuro
+from graphh.sharded import ShardedNeuro
+
+COUNTRIES = load(open('tests/data/countries.json'))
+
+
+def iter_countries(copies):
+    for copy in range(copies):
+        for item in COUNTRIES:
+            uid = f'{item["cca2"]}{copy}'
+            yield uid, 'region', item['region']
+            yield uid, 'capital', item['capital']
+            for border in item['borders']:
+                yield uid, 'borders', f'{border}{copy}'
+
+
+def timed(name, func, *args):
+    t1 = time.time()
+    func(*args)
+    t2 = time.time()
+    print('{:32} `{:.4f}` seconds.'.format(name, t2 - t1))
+    return t2 - t1
+
+
+def bench(g, copies):
+    timed('add triples', g.add_triples, iter_countries(copies))
+    timed('query thing', lambda: list(g.query_thing('borders')))
+    timed('query pt_s', lambda: [list(g.query_pt_s('region', r)) for r in ('Europe', 'Asia', 'Africa')])
+    timed('query sp_t x 1000', lambda: [list(g.query_sp_t(f'RO{i}', 'borders')) for i in range(1000)])
+
+
+if __name__ == '__main__':
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f'{copies} copies, {shards} shards, {os.cpu_count()} CPUs')
+    print('-- Neuro')
+    bench(Neuro(), copies)
+    print('-- ShardedNeuro')
+    with ShardedNeuro(shards=shards) as g:
+        bench(g, copies)
+        print('Nodes per shard:', g.shard_sizes())
@@ -0,0 +1,51 @@
+"""
+Benchmark the shared memory analytics, with one worker and with more workers.
+Usage: python benchmarks/bench_shared.py [copies] [workers]
+"""
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import time
+from json import load
+from graphh import Neuro
+from graphh.shared import SharedGraph
+
+COUNTRIES = load(open('tests/data/countries.json'))
+
+
+def iter_countries(copies):
+    for copy in range(copies):
+        for item in COUNTRIES:
+            uid = f'{item["cca2"]}{copy}'
+            yield uid, 'region', item['region']
+            yield uid, 'capital', item['capital']
+            for border in item['borders']:
+                yield uid, 'borders', f'{border}{copy}'
+
+
+def timed(name, func, *args):
+    t1 = time.time()
+    func(*args)
+    t2 = time.time()
+    print('{:32} `{:.4f}` seconds.'.format(name, t2 - t1))
+    return t2 - t1
+
+
+if __name__ == '__main__':
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    g = Neuro()
+    g.add_triples(iter_countries(copies))
+    f = g.freeze()
+    print(f'{g.number_of_nodes()} nodes, {g.number_of_edges()} edges, {os.cpu_count()} CPUs')
+    sources = f.node_list()[:500]
+    timed('export to shared memory', lambda: SharedGraph(f, workers=1).close())
+    for n in sorted({1, workers}):
+        with SharedGraph(f, workers=n) as sg:
+            print(f'-- {n} workers')
+            # The first call starts the pool
+            timed('degrees (with the pool start)', sg.degrees)
+            timed('degrees', sg.degrees)
+            timed('reach counts', sg.reach_counts, sources, False, 3)
+            timed('predicate stats', sg.predicate_stats)
@@ -0,0 +1,56 @@
+"""
+Benchmark the traversal module, against a naive BFS over the Graph API.
+Usage: python benchmarks/bench_traversal.py [line size] [complete size]
+"""
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import time
+from graphh import Graph
+from graphh.traversal import bfs, shortest_path, bidirectional_path
+from graphh.generators import generate_line_gr, gen_complete_gr
+
+
+def naive_bfs(g, source):
+    seen = {source}
+    queue = [source]
+    while queue:
+        node = queue.pop(0)
+        for nxt in g.iter_next_nodes(node):
+            if nxt not in seen:
+                seen.add(nxt)
+                queue.append(nxt)
+    return seen
+
+
+def timed(name, func, *args):
+    t1 = time.time()
+    func(*args)
+    t2 = time.time()
+    print('{:32} `{:.4f}` seconds.'.format(name, t2 - t1))
+    return t2 - t1
+
+
+def bench_graph(name, g, source, target):
+    c = Graph(compact=True)
+    c.from_dict(g.to_dict())
+    f = g.freeze()
+    print(f'{name} :: {g.number_of_nodes()} nodes, {g.number_of_edges()} edges')
+    t1 = timed('naive BFS', naive_bfs, g, source)
+    for label, x in (('dict', g), ('compact', c), ('frozen', f)):
+        t2 = timed(f'bfs ({label})', lambda: sum(1 for _ in bfs(x, source)))
+        timed(f'shortest_path ({label})', shortest_path, x, source, target)
+        timed(f'bidirectional_path ({label})', bidirectional_path, x, source, target)
+        print('Speed-up: x{:.2f}'.format(t1 / t2))
+    print()
+
+
+if __name__ == '__main__':
+    line_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    complete_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    g = generate_line_gr(line_size)
+    bench_graph(f'Line {line_size}', g, g.get_node(1), g.get_node(line_size))
+    g = gen_complete_gr(complete_size)
+    bench_graph(f'Complete {complete_size}', g, g.get_node('a'), g.get_node(chr(complete_size + 96)))
@@ -0,0 +1,73 @@
+"""
+Benchmark each query_triple pattern shape, on the scaled countries dataset.
+Usage: python benchmarks/bench_triples.py [scale]
+"""
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import time
+from json import load
+from itertools import islice
+from graphh import Neuro
+
+COUNTRIES = load(open('tests/data/countries.json'))
+FIELDS = ('capital', 'region', 'subregion', 'cca3', 'ccn3', 'cioc', 'area')
+# How many queries of each shape
+QUERIES = 1000
+
+
+def iter_countries(scale):
+    for i in range(scale):
+        for item in COUNTRIES:
+            uid = f'{item["cca2"]}{i}'
+            for field in FIELDS:
+                yield uid, field, item[field]
+            for border in item['borders']:
+                yield uid, 'borders', border
+
+
+def iter_patterns(scale):
+    """
+    The query patterns, for the countries in the first copy of the dataset
+    """
+    items = COUNTRIES[:QUERIES]
+    for i in range(QUERIES):
+        item = items[i % len(items)]
+        uid = f'{item["cca2"]}{i % scale}'
+        yield {
+            'S P ?': (uid, 'capital', '?'),
+            '? P T': ('?', 'region', item['region']),
+            'S P T': (uid, 'region', item['region']),
+            'S ? ?': (uid, '?', '?'),
+            '? ? T': ('?', '?', item['capital']),
+            'S ? T': (uid, '?', item['region']),
+            '? P ?': ('?', 'cioc', '?'),
+        }
+
+
+def bench_patterns(name, g, scale):
+    print(f'{name} :: {g.number_of_nodes()} nodes, {g.number_of_edges()} edges')
+    patterns = list(iter_patterns(scale))
+    for shape in patterns[0]:
+        t1 = time.time()
+        results = 0
+        for pattern in patterns:
+            # The huge results are capped, to measure the lookup and not the copy
+            results += sum(1 for _ in islice(g.query_triple(*pattern[shape]), 1000))
+        t2 = time.time()
+        print('{:8} {:>10} results `{:.4f}` seconds, {:.0f} queries/s.'.format(
+            shape, results, t2 - t1, len(patterns) / ((t2 - t1) or 1e-9)))
+    print()
+
+
+if __name__ == '__main__':
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    triples = list(iter_countries(scale))
+    for name, g in (('Neuro', Neuro()), ('Neuro partitioned', Neuro(partitioned=True))):
+        t1 = time.time()
+        g.add_triples(triples)
+        t2 = time.time()
+        print('Loaded {} triples in `{:.4f}` seconds.'.format(len(triples), t2 - t1))
+        bench_patterns(f'{name}, countries x{scale}', g, scale)
+        del g
@@ -0,0 +1,108 @@
+"""
+Asyncio facade for Neuro and FsConvention queries.
+The sync generators are consumed in chunks, so a long scan doesn't block the event loop:
+
+  * by default, the chunks are taken in the event loop, which gets control back after each chunk
+  * with an executor, the chunks are taken in the executor threads,
+    so even the slow chunks (eg: a match with few results) don't block the loop
+
+    g = AsyncGraph(neuro, chunk_size=500, executor=ThreadPoolExecutor(2), timeout=1.0)
+    async for thing in g.query_thing('capital', 'Bu', '<'):
+        ...
+
+In the event loop, the graph can be changed by the other tasks, between the chunks:
+the queries copy the keys they read (the adjacency, or the postings) before the first result,
+so they return the results found when they started, decoded as they are when they're taken.
+If the graph is changed while the queries run in the executor, use a thread-safe graph,
+eg: SafeNeuro, from graphh.locks.
+The process executors don't fit, because the graph lives in this process.
+"""
+#- rev: v3 -
+#- hash: CCXJ46 -
+
+import asyncio
+from itertools import islice
+
+# Results per chunk, between the yields to the event loop
+CHUNK_SIZE = 1000
+
+
+def take(iterator, size: int) -> list:
+    return list(islice(iterator, size))
+
+
+class AsyncGraph:
+    """
+    Async iterators over the queries of a graph.
+    The timeouts (in seconds) are for the whole query, and raise asyncio.TimeoutError;
+    the query can also be cancelled, like any other task.
+    """
+
+    __slots__ = ('graph', 'chunk_size', 'executor', 'timeout')
+
+    def __init__(self, graph, chunk_size=CHUNK_SIZE, executor=None, timeout=None):
+        if chunk_size < 1:
+            raise ValueError(f'Invalid chunk size: {chunk_size}')
+        self.graph = graph
+        self.chunk_size = chunk_size
+        self.executor = executor
+        # The default timeout of the queries
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.graph!r}, chunk_size={self.chunk_size})'
+
+    def query_subject(self, predicate: str, match='', where='', timeout=None):
+        return self._iterate(self.graph.query_subject, (predicate, match, where), timeout)
+
+    def query_thing(self, predicate: str, match='', where='', timeout=None):
+        return self._iterate(self.graph.query_thing, (predicate, match, where), timeout)
+
+    def query_sp_t(self, subject: str, predicate: str, timeout=None):
+        return self._iterate(self.graph.query_sp_t, (subject, predicate), timeout)
+
+    def query_pt_s(self, predicate: str, thing: str, timeout=None):
+        return self._iterate(self.graph.query_pt_s, (predicate, thing), timeout)
+
+    def query_docs(self, table: str, query: dict, fields=set(), timeout=None):
+        """
+        The documents are decoded in chunks, like the other results.
+        """
+        return self._iterate(self.graph.iter_docs, (table, query, fields), timeout)
+
+    async def _iterate(self, func, args: tuple, timeout=None):
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else loop.time() + timeout
+        size = self.chunk_size
+        if self.executor is None:
+            iterator = iter(func(*args))
+            try:
+                while True:
+                    chunk = take(iterator, size)
+                    for item in chunk:
+                        yield item
+                    if len(chunk) < size:
+                        return
+                    # Let the other tasks run
+                    await asyncio.sleep(0)
+                    if deadline is not None and loop.time() > deadline:
+                        raise asyncio.TimeoutError()
+            finally:
+                if hasattr(iterator, 'close'):
+                    iterator.close()
+        # The chunks are taken one by one, so the iterator is used by one thread at a time;
+        # if the query is cancelled, the running chunk ends in its thread, and the rest is dropped
+        iterator = await self._wait(loop, loop.run_in_executor(self.executor, lambda: iter(func(*args))), deadline)
+        while True:
+            chunk = await self._wait(loop, loop.run_in_executor(self.executor, take, iterator, size), deadline)
+            for item in chunk:
+                yield item
+            if len(chunk) < size:
+                return
+
+    @staticmethod
+    async def _wait(loop, future, deadline):
+        if deadline is None:
+            return await future
+        return await asyncio.wait_for(future, max(deadline - loop.time(), 0))
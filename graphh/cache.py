@@ -0,0 +1,96 @@
+"""
+Bounded LRU cache, for the decoded documents and the query results.
+Each entry depends on a few keys (eg: the doc key, or the P+T keys of a query),
+so a change of one key drops only the entries that depend on it.
+"""
+#- rev: v3 -
+#- hash: AN55JW -
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """
+    Least recently used cache, with at most `maxsize` entries,
+    and the hit / miss counters.
+    Even the reads change the cache, so they are locked too.
+    """
+
+    __slots__ = ('maxsize', 'hits', 'misses', '_data', '_deps', '_lock')
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError(f'Invalid cache size: {maxsize}')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, dependency keys), from the oldest to the newest
+        self._data = OrderedDict()
+        # dependency key -> keys
+        self._deps = {}
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(size:{len(self)}, hits:{self.hits}, misses:{self.misses})'
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, deps=()):
+        """
+        Add a value, that is dropped when any of the dependency keys changes.
+        The oldest entries are evicted, over the max size.
+        """
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, deps)
+            for dep in deps:
+                keys = self._deps.get(dep)
+                if keys is None:
+                    self._deps[dep] = {key}
+                else:
+                    keys.add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key):
+        _, deps = self._data.pop(key)
+        for dep in deps:
+            keys = self._deps.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._deps[dep]
+
+    def invalidate(self, dep) -> int:
+        """
+        Drop the entries that depend on a key; returns how many.
+        """
+        with self._lock:
+            keys = self._deps.pop(dep, ())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._deps.clear()
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
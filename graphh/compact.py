@@ -0,0 +1,433 @@
+"""
+Compact storage for Graph.
+The node & edge keys are interned as dense integers, once,
+and the adjacency is kept in CSR style arrays, instead of sets.
+The tables are append-only: removing a node or an edge raises ValueError.
+"""
+#- rev: v5 -
+#- hash: CA4EWU -
+
+from array import array
+from collections.abc import MutableMapping
+
+try:
+    import numpy as np
+except ImportError: # pragma: no cover
+    np = None
+
+# Unsigned 32-bit integers, enough for 4 billion nodes and edges
+INT_TYPE = 'I'
+# Minimum number of fresh edges, before re-building the CSR arrays
+MIN_PENDING = 1024
+
+
+def build_csr(size: int, column: array):
+    """
+    Group the positions of a column of dense ints, by value.
+    Returns (offsets, positions), so the positions of value X are
+    positions[offsets[X]:offsets[X + 1]], in insertion order.
+    """
+    offsets = array(INT_TYPE)
+    positions = array(INT_TYPE)
+    if np is not None:
+        col = np.frombuffer(column, dtype=INT_TYPE)
+        counts = np.zeros(size + 1, dtype=INT_TYPE)
+        np.cumsum(np.bincount(col, minlength=size), out=counts[1:])
+        offsets.frombytes(counts.tobytes())
+        positions.frombytes(np.argsort(col, kind='stable').astype(INT_TYPE).tobytes())
+        return offsets, positions
+
+    counts = [0] * (size + 1)
+    for v in column:
+        counts[v + 1] += 1
+    for i in range(size):
+        counts[i + 1] += counts[i]
+    offsets.extend(counts)
+    positions.frombytes(bytes(positions.itemsize * len(column)))
+    cursor = counts[:-1]
+    for pos, v in enumerate(column):
+        positions[cursor[v]] = pos
+        cursor[v] += 1
+    return offsets, positions
+
+
+def gather(column: array, positions: array) -> array:
+    """
+    Returns the values of a column, at the given positions.
+    """
+    values = array(INT_TYPE)
+    if np is not None:
+        col = np.frombuffer(column, dtype=INT_TYPE)
+        values.frombytes(col[np.frombuffer(positions, dtype=INT_TYPE)].tobytes())
+    else:
+        values.extend(column[p] for p in positions)
+    return values
+
+
+class NodeTable(MutableMapping):
+    """
+    Node key -> Value, just like the MemoryStore,
+    but each node key is also mapped to a dense integer.
+    """
+
+    __slots__ = ('_ids', '_keys', '_values')
+
+    def __init__(self):
+        # Node key -> dense int
+        self._ids = {}
+        # Dense int -> Node key
+        self._keys = []
+        # Dense int -> Value
+        self._values = []
+
+    def index(self, key: bytes):
+        """
+        Returns the dense int of a node key, or None
+        """
+        return self._ids.get(key)
+
+    def key_at(self, idx: int) -> bytes:
+        """
+        Returns the node key of a dense int
+        """
+        return self._keys[idx]
+
+    def __contains__(self, key) -> bool:
+        return key in self._ids
+
+    def __getitem__(self, key):
+        return self._values[self._ids[key]]
+
+    def get(self, key, default=None):
+        idx = self._ids.get(key)
+        if idx is None:
+            return default
+        return self._values[idx]
+
+    def __setitem__(self, key, value):
+        idx = self._ids.get(key)
+        if idx is None:
+            self._ids[key] = len(self._keys)
+            self._keys.append(key)
+            self._values.append(value)
+        else:
+            self._values[idx] = value
+
+    def __delitem__(self, key):
+        # The dense ints of the next nodes would change
+        raise ValueError('Compact graphs are append-only, the nodes cannot be removed')
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def keys(self):
+        return self._keys
+
+    def items(self):
+        return zip(self._keys, self._values)
+
+
+class EdgeTable(MutableMapping):
+    """
+    Edge key -> (node_id, node_id), just like the MemoryStore,
+    but the heads and the tails are stored as arrays of dense node ints.
+    """
+
+    __slots__ = ('_nodes', '_ids', '_keys', '_heads', '_tails')
+
+    def __init__(self, nodes: NodeTable):
+        self._nodes = nodes
+        # Edge key -> dense int
+        self._ids = {}
+        # Dense int -> Edge key
+        self._keys = []
+        # Dense int -> dense head node, dense tail node
+        self._heads = array(INT_TYPE)
+        self._tails = array(INT_TYPE)
+
+    def index(self, key: bytes):
+        """
+        Returns the dense int of an edge key, or None
+        """
+        return self._ids.get(key)
+
+    def key_at(self, idx: int) -> bytes:
+        """
+        Returns the edge key of a dense int
+        """
+        return self._keys[idx]
+
+    def __contains__(self, key) -> bool:
+        return key in self._ids
+
+    def __getitem__(self, key):
+        idx = self._ids[key]
+        keys = self._nodes._keys
+        return (keys[self._heads[idx]], keys[self._tails[idx]])
+
+    def get(self, key, default=None):
+        if key not in self._ids:
+            return default
+        return self[key]
+
+    def __setitem__(self, key, value):
+        if key in self._ids:
+            return
+        head_id, tail_id = value
+        self._ids[key] = len(self._keys)
+        self._keys.append(key)
+        self._heads.append(self._nodes._ids[head_id])
+        self._tails.append(self._nodes._ids[tail_id])
+
+    def __delitem__(self, key):
+        # The dense ints of the next edges, in the CSR arrays, would change
+        raise ValueError('Compact graphs are append-only, the edges cannot be removed')
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def keys(self):
+        return self._keys
+
+    def items(self):
+        keys = self._nodes._keys
+        for key, h, t in zip(self._keys, self._heads, self._tails):
+            yield key, (keys[h], keys[t])
+
+
+class CsrAdjacency:
+    """
+    Incoming & outgoing adjacency, as CSR arrays over the dense ints.
+    The fresh edges are kept in small overflow lists,
+    until there are enough of them to re-build the arrays.
+    """
+
+    __slots__ = ('_nodes', '_edges', '_sealed', '_inc', '_out', '_inc_new', '_out_new')
+
+    def __init__(self, nodes: NodeTable, edges: EdgeTable):
+        self._nodes = nodes
+        self._edges = edges
+        # How many edges are in the CSR arrays
+        self._sealed = 0
+        # (offsets, edges) for incoming and outgoing
+        self._inc = (array(INT_TYPE, [0]), array(INT_TYPE))
+        self._out = (array(INT_TYPE, [0]), array(INT_TYPE))
+        # Dense node -> list of fresh dense edges
+        self._inc_new = {}
+        self._out_new = {}
+
+    def rebuild(self):
+        """
+        Move all the edges in the CSR arrays
+        """
+        size = len(self._nodes)
+        self._inc = build_csr(size, self._edges._tails)
+        self._out = build_csr(size, self._edges._heads)
+        self._sealed = len(self._edges)
+        self._inc_new.clear()
+        self._out_new.clear()
+
+    def add_edge(self, edge_id: bytes):
+        """
+        Index a new edge, that must exist in the edges table
+        """
+        idx = self._edges._ids[edge_id]
+        self._inc_new.setdefault(self._edges._tails[idx], []).append(idx)
+        self._out_new.setdefault(self._edges._heads[idx], []).append(idx)
+        # Re-building when the fresh edges are 1/4 of the sealed edges,
+        # keeps the cost of adding an edge O(1) amortized
+        if len(self._edges) - self._sealed > max(MIN_PENDING, self._sealed >> 2):
+            self.rebuild()
+
+    def add_edges(self, edge_ids):
+        """
+        Index many new edges, that must exist in the edges table
+        """
+        if len(edge_ids) < MIN_PENDING:
+            for edge_id in edge_ids:
+                self.add_edge(edge_id)
+        else:
+            self.rebuild()
+
+    @staticmethod
+    def _row(csr, fresh, idx):
+        offsets, edges = csr
+        if idx + 1 < len(offsets):
+            yield from memoryview(edges)[offsets[idx]:offsets[idx + 1]]
+        yield from fresh.get(idx, ())
+
+    @staticmethod
+    def _row_len(csr, fresh, idx):
+        offsets, _ = csr
+        size = len(fresh.get(idx, ()))
+        if idx + 1 < len(offsets):
+            size += offsets[idx + 1] - offsets[idx]
+        return size
+
+    def prev_ids(self, idx: int) -> list:
+        """
+        Returns the dense ints of the incoming nodes
+        """
+        heads = self._edges._heads
+        return [heads[e] for e in self._row(self._inc, self._inc_new, idx)]
+
+    def next_ids(self, idx: int) -> list:
+        """
+        Returns the dense ints of the outgoing nodes
+        """
+        tails = self._edges._tails
+        return [tails[e] for e in self._row(self._out, self._out_new, idx)]
+
+    def inc_edges(self, node_id: bytes) -> set:
+        idx = self._nodes._ids.get(node_id)
+        if idx is None:
+            return set()
+        keys = self._edges._keys
+        return {keys[e] for e in self._row(self._inc, self._inc_new, idx)}
+
+    def out_edges(self, node_id: bytes) -> set:
+        idx = self._nodes._ids.get(node_id)
+        if idx is None:
+            return set()
+        keys = self._edges._keys
+        return {keys[e] for e in self._row(self._out, self._out_new, idx)}
+
+    def prev_nodes(self, node_id: bytes):
+        idx = self._nodes._ids.get(node_id)
+        if idx is None:
+            return
+        keys = self._nodes._keys
+        heads = self._edges._heads
+        for e in self._row(self._inc, self._inc_new, idx):
+            yield keys[heads[e]]
+
+    def next_nodes(self, node_id: bytes):
+        idx = self._nodes._ids.get(node_id)
+        if idx is None:
+            return
+        keys = self._nodes._keys
+        tails = self._edges._tails
+        for e in self._row(self._out, self._out_new, idx):
+            yield keys[tails[e]]
+
+    def inc_degree(self, node_id: bytes) -> int:
+        idx = self._nodes._ids.get(node_id)
+        if idx is None:
+            return 0
+        return self._row_len(self._inc, self._inc_new, idx)
+
+    def out_degree(self, node_id: bytes) -> int:
+        idx = self._nodes._ids.get(node_id)
+        if idx is None:
+            return 0
+        return self._row_len(self._out, self._out_new, idx)
+
+
+class FrozenNodeTable(NodeTable):
+    """
+    Read-only NodeTable, for frozen graphs.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, items=()):
+        super().__init__()
+        for key, value in items:
+            NodeTable.__setitem__(self, key, value)
+
+    def __setitem__(self, key, value):
+        raise TypeError('The graph is frozen')
+
+
+class FrozenEdgeTable(EdgeTable):
+    """
+    Read-only EdgeTable, for frozen graphs.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, nodes: NodeTable, items=()):
+        super().__init__(nodes)
+        for key, value in items:
+            EdgeTable.__setitem__(self, key, value)
+
+    def __setitem__(self, key, value):
+        raise TypeError('The graph is frozen')
+
+
+class FrozenAdjacency:
+    """
+    Incoming & outgoing adjacency of a frozen graph.
+    For each node, the edges and the neighbor nodes are contiguous array slices,
+    so iterating the neighbors doesn't need to look up the edges.
+    """
+
+    __slots__ = ('_nodes', '_edges', '_inc', '_out')
+
+    def __init__(self, nodes: NodeTable, edges: EdgeTable):
+        self._nodes = nodes
+        self._edges = edges
+        size = len(nodes)
+        # (offsets, edges, neighbor nodes) for incoming and outgoing
+        inc_off, inc_edges = build_csr(size, edges._tails)
+        out_off, out_edges = build_csr(size, edges._heads)
+        self._inc = (inc_off, inc_edges, gather(edges._heads, inc_edges))
+        self._out = (out_off, out_edges, gather(edges._tails, out_edges))
+
+    def rebuild(self):
+        raise TypeError('The graph is frozen')
+
+    add_edge = add_edges = rebuild
+
+    @staticmethod
+    def _span(csr, idx):
+        if idx is None:
+            return 0, 0
+        offsets = csr[0]
+        return offsets[idx], offsets[idx + 1]
+
+    def prev_ids(self, idx: int):
+        """
+        Returns the dense ints of the incoming nodes, as an array slice
+        """
+        lo, hi = self._span(self._inc, idx)
+        return memoryview(self._inc[2])[lo:hi]
+
+    def next_ids(self, idx: int):
+        """
+        Returns the dense ints of the outgoing nodes, as an array slice
+        """
+        lo, hi = self._span(self._out, idx)
+        return memoryview(self._out[2])[lo:hi]
+
+    def inc_edges(self, node_id: bytes) -> set:
+        lo, hi = self._span(self._inc, self._nodes._ids.get(node_id))
+        keys = self._edges._keys
+        return {keys[e] for e in self._inc[1][lo:hi]}
+
+    def out_edges(self, node_id: bytes) -> set:
+        lo, hi = self._span(self._out, self._nodes._ids.get(node_id))
+        keys = self._edges._keys
+        return {keys[e] for e in self._out[1][lo:hi]}
+
+    def prev_nodes(self, node_id: bytes):
+        keys = self._nodes._keys
+        return (keys[n] for n in self.prev_ids(self._nodes._ids.get(node_id)))
+
+    def next_nodes(self, node_id: bytes):
+        keys = self._nodes._keys
+        return (keys[n] for n in self.next_ids(self._nodes._ids.get(node_id)))
+
+    def inc_degree(self, node_id: bytes) -> int:
+        lo, hi = self._span(self._inc, self._nodes._ids.get(node_id))
+        return hi - lo
+
+    def out_degree(self, node_id: bytes) -> int:
+        lo, hi = self._span(self._out, self._nodes._ids.get(node_id))
+        return hi - lo
@@ -1,21 +1,64 @@
 
-#- rev: v2 -
-#- hash: VXGLBJ -
+#- rev: v19 -
+#- hash: 3J3YBM -
 
-from .neuro import Neuro
-from .util import hash
+import gc
+from itertools import repeat
+from types import MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
+from .neuro import Neuro, node_hasher
+from .cache import LRUCache
+from .util import HashCollision, chunks
 from stones import MemoryStore
 
+# Documents per chunk, for the worker processes
+DOCS_CHUNK = 1000
+
+
+def hash_docs(hasher, doc_path: str, docs):
+    """
+    Hash a chunk of (uid, data) documents, maybe in a worker process.
+    Returns the new nodes as key -> value,
+    and the (doc key, ((predicate key, thing key), ...)) of each document.
+    """
+    nodes = {}
+    key_of = node_hasher(hasher, nodes, {})
+    hashed = []
+    for uid, data in docs:
+        chain = []
+        for predicate, thing in data.items():
+            p_key = key_of(predicate)
+            things = thing if isinstance(thing, (tuple, list)) else (thing,)
+            chain.extend((p_key, key_of(t)) for t in things)
+        hashed.append((key_of(f'{doc_path}{uid}/'), tuple(chain)))
+    return nodes, hashed
+
+
+def copy_doc(doc: dict) -> dict:
+    """
+    Copy a decoded document, with the sets of things.
+    """
+    return {k: set(v) if isinstance(v, set) else v for k, v in doc.items()}
+
 
 class FsConvention(Neuro):
     """
     File-system-like convention graph.
     """
 
-    def __init__(self, app: str):
-        super().__init__()
+    def __init__(self, app: str, compact=False, hasher=None):
+        super().__init__(compact, hasher)
         self._app = app
+        # Doc key -> ((predicate key, thing key), ...)
         self._chains = MemoryStore(encoder='noop')
+        # Table name -> doc keys
+        self._table_docs = {}
+        # Table name -> P+T key -> doc keys, the P+T index of each table
+        self._table_pt = {}
+        # Doc key -> table name, of the documents inserted by `create_docs`, while they're inserted
+        self._batch_docs = {}
+        # The decoded docs & the query results, only if enabled
+        self._cache = None
         # Save app paths
         self._app_root_path = f'/{self._app}/'
         self._app_tables_path = f'/{self._app}/tables/'
@@ -29,18 +72,202 @@ class FsConvention(Neuro):
         self.add_edge(self._app_root_id, self._app_meta_id)
 
 
+    def _freeze_into(self, frozen):
+        super()._freeze_into(frozen)
+        frozen._app = self._app
+        frozen._chains = MappingProxyType(dict(self._chains))
+        frozen._table_docs = MappingProxyType({k: frozenset(v) for k, v in self._table_docs.items()})
+        frozen._table_pt = MappingProxyType({
+            table: MappingProxyType({k: frozenset(v) for k, v in index.items()})
+            for table, index in self._table_pt.items()})
+        frozen._app_root_path = self._app_root_path
+        frozen._app_tables_path = self._app_tables_path
+        frozen._app_meta_path = self._app_meta_path
+        frozen._app_root_id = self._app_root_id
+        frozen._app_tables_id = self._app_tables_id
+        frozen._app_meta_id = self._app_meta_id
+        frozen._cache = None
+
+
+    def from_dict(self, data: dict):
+        """
+        Load instance from Python dictionary.
+        The doc sets and the P+T postings of the tables are not saved;
+        they are made again from the doc edges and the P+T index.
+        """
+        super().from_dict(data)
+        self._index_doc_edges(data['e'].values())
+        edges = self._edges
+        self._index_docs((s_key, pt_key, *edges[pt_key]) for pt_key, subjects in data['pt'].items()
+                         for s_key in subjects)
+
+
+    def enable_cache(self, size=1024) -> LRUCache:
+        """
+        Cache the decoded documents of `get_doc` & `query_docs`,
+        and the results of `query_docs` & `query_pt_s`, for the hot reads.
+        The entries are dropped when their document or posting changes,
+        from the triple hooks. The bulk loaders don't call the hooks,
+        so the cache should be enabled after loading.
+        """
+        self._cache = LRUCache(size)
+        return self._cache
+
+    def disable_cache(self):
+        self._cache = None
+
+    def cache_info(self) -> dict:
+        """
+        Returns the hits, misses, size & max size of the cache.
+        """
+        if self._cache is None:
+            return {}
+        return self._cache.info()
+
+
+    def _index_triple(self, s_key: bytes, p_key: bytes, t_key: bytes):
+        super()._index_triple(s_key, p_key, t_key)
+        self._extend_chains(((s_key, p_key, t_key),))
+        self._index_docs(((s_key, self._hasher.hash(p_key, t_key), p_key, t_key),))
+
+    def _merge_indexes(self, sp: dict, pt: dict):
+        super()._merge_indexes(sp, pt)
+        if pt:
+            # The P+T keys are the same as the edge keys
+            edges = self._edges
+            entries = [(s_key, pt_key, *edges[pt_key]) for pt_key, subjects in pt.items() for s_key in subjects]
+            self._extend_chains((s_key, p_key, t_key) for s_key, _, p_key, t_key in entries)
+            self._index_docs(entries)
+
+    def _extend_chains(self, triple_keys):
+        """
+        Keep the chains of the existing documents up to date,
+        with the properties added later, eg: with add_triple.
+        """
+        chains = self._chains
+        for s_key, p_key, t_key in triple_keys:
+            chain = chains.get(s_key)
+            if chain is not None and (p_key, t_key) not in chain:
+                chains[s_key] = chain + ((p_key, t_key),)
+
+    def _doc_chain(self, d_key: bytes) -> tuple:
+        """
+        The (predicate key, thing key) pairs of a document, from its chain;
+        the documents without a chain, eg: loaded from a file, or created with add_triple,
+        walk the predicate edges and the S+P index.
+        """
+        chain = self._chains.get(d_key)
+        if chain is not None:
+            return chain
+        return tuple((p_key, t_key) for p_key in self._subject_predicates(d_key)
+                     for t_key in self._sp_keys(d_key, p_key))
+
+    def _insert_edges(self, fresh: dict):
+        super()._insert_edges(fresh)
+        self._index_doc_edges(fresh.values())
+
+    def _doc_table(self, d_key: bytes):
+        """
+        The table of a document, from its path: /app/tables/{table}/docs/{uid}/
+        Returns None for the other nodes.
+        """
+        # The bulk inserts know the table of their documents
+        table = self._batch_docs.get(d_key)
+        if table is not None:
+            return table
+        path = self.get_node_id(d_key)
+        if path.__class__ is not str or not path.startswith(self._app_tables_path):
+            return None
+        table, sep, uid = path[len(self._app_tables_path):].partition('/docs/')
+        if not sep or not uid or '/' in table:
+            return None
+        return table
+
+    def _index_docs(self, entries):
+        """
+        Add the triples of the documents to the doc sets & the P+T postings of their tables,
+        from (subject key, P+T key, predicate key, thing key) entries.
+        The other subjects are ignored.
+        """
+        tables = {}
+        for s_key, pt_key, p_key, t_key in entries:
+            table = tables.get(s_key, False)
+            if table is False:
+                table = tables[s_key] = self._doc_table(s_key)
+                if table is not None:
+                    self._table_docs.setdefault(table, set()).add(s_key)
+            if table is not None:
+                self._table_pt.setdefault(table, {}).setdefault(pt_key, set()).add(s_key)
+
+    def _index_doc_edges(self, edges):
+        """
+        Add the documents to the doc sets, from the (table docs, doc) edges
+        """
+        heads = {}
+        batch = self._batch_docs
+        for head_id, tail_id in edges:
+            # In a bulk insert, the other edges are the S->P & P->T edges of the triples
+            if batch and tail_id not in batch:
+                continue
+            table = self._doc_table(tail_id)
+            if table is None:
+                continue
+            # The docs node of each table is hashed once
+            docs_id = heads.get(table)
+            if docs_id is None:
+                docs_id = heads[table] = self._hasher.node(f'{self._app_tables_path}{table}/docs/')
+            if head_id == docs_id:
+                self._table_docs.setdefault(table, set()).add(tail_id)
+
+
+    def after_triple_add(self, s_key, p_key, t_key):
+        super().after_triple_add(s_key, p_key, t_key)
+        if self._cache is not None:
+            self._cache.invalidate(s_key)
+            self._cache.invalidate(self._hasher.hash(p_key, t_key))
+
+    def after_triple_remove(self, s_key, p_key, t_key):
+        super().after_triple_remove(s_key, p_key, t_key)
+        chain = self._chains.get(s_key)
+        if chain is not None and (p_key, t_key) in chain:
+            self._chains[s_key] = tuple(pair for pair in chain if pair != (p_key, t_key))
+        pt_key = self._hasher.hash(p_key, t_key)
+        # Drop the document from the P+T postings of its table, found from its path
+        postings = self._table_pt.get(self._doc_table(s_key))
+        if postings is not None:
+            found = postings.get(pt_key)
+            if found is not None:
+                found.discard(s_key)
+                if not found:
+                    del postings[pt_key]
+        if self._cache is not None:
+            self._cache.invalidate(s_key)
+            self._cache.invalidate(pt_key)
+
+    def before_node_remove(self, node_id):
+        super().before_node_remove(node_id)
+        # The triples of the node are removed first, so only the doc set & the chain are left
+        docs = self._table_docs.get(self._doc_table(node_id))
+        if docs is not None:
+            docs.discard(node_id)
+        if node_id in self._chains:
+            del self._chains[node_id]
+        if self._cache is not None:
+            self._cache.invalidate(node_id)
+
+
     def list_tables(self):
         tables = []
         for oe in self.out_edges(self._app_tables_id):
-            n = self.get_node_id(self.tail(oe))
+            n = self.get_node_id(self.edge_tail(oe))
             tables.append(n)
         return tables
 
     def list_docs(self, table: str):
-        doc_path = hash(f'{self._app_tables_path}{table}/docs/')
+        doc_path = self._hasher.node(f'{self._app_tables_path}{table}/docs/')
         docs = []
         for oe in self.out_edges(doc_path):
-            n = self.get_node_id(self.tail(oe))
+            n = self.get_node_id(self.edge_tail(oe))
             docs.append(n)
         return docs
 
@@ -56,6 +283,8 @@ class FsConvention(Neuro):
             # print(f'Table "{tb_path}" exists already !')
             return False
         # print(f'Creating table "{tb_path}"')
+        self._table_docs[table] = set()
+        self._table_pt[table] = {}
         # Make edge between Tables and the New Table
         self.add_edge(self._app_tables_id, tb_key)
         tb_doc = self.add_node(f'{tb_path}docs/')
@@ -71,6 +300,7 @@ class FsConvention(Neuro):
         Insert a new document in a table.
         The UID must be unique in the table, to avoid collision.
         The data must be a dictionary.
+        Returns the doc key.
         """
         doc_path = f'{self._app_tables_path}{table}/docs/'
         doc_uid = f'{doc_path}{uid}/'
@@ -79,41 +309,187 @@ class FsConvention(Neuro):
             # print(f'Document "{table}/{uid}" exists already !')
             return False
         # print(f'Creating doc "{doc_uid}"')
-        tb_doc = hash(doc_path)
+        tb_doc = self._hasher.node(doc_path)
         self.add_edge(tb_doc, node_id)
+        # The triples are added to the postings of the table by `_index_triple`
+        self._table_docs.setdefault(table, set()).add(node_id)
 
-        prop_keys = []
+        chain = []
         for predicate, thing in data.items():
-            if isinstance(thing, (tuple, list)):
-                for t in thing:
-                    k = self.add_triple(doc_uid, predicate, t)
-                    prop_keys.append(k)
-            else:
-                k = self.add_triple(doc_uid, predicate, thing)
-                prop_keys.append(k)
+            things = thing if isinstance(thing, (tuple, list)) else (thing,)
+            for t in things:
+                _, p_key, t_key = self.add_triple(doc_uid, predicate, t)
+                chain.append((p_key, t_key))
 
-        key = hash(*prop_keys)
-        self._chains[key] = tuple(prop_keys)
-        return key
+        self._chains[node_id] = tuple(chain)
+        return node_id
 
 
-    def get_doc_id(self, doc_uid: str, fields=set()) -> dict:
+    def create_docs(self, table: str, docs, workers=0, chunk_size=DOCS_CHUNK) -> list:
         """
-        Return a specific document UID from a table.
+        Insert many documents in a table, in bulk.
+        The docs are (uid, data) pairs, like for `create_doc`.
+        Each predicate and thing is hashed once for the whole batch,
+        and the nodes, edges and indexes are updated in bulk.
+        If workers > 0, the hashing is done in a process pool, in chunks of documents.
+        Returns the keys of the new documents; the existing ones are ignored.
+        """
+        h = self._hasher
+        doc_path = f'{self._app_tables_path}{table}/docs/'
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(hash_docs, repeat(h), repeat(doc_path), chunks(docs, chunk_size)))
+        else:
+            results = [hash_docs(h, doc_path, docs)]
+
+        nodes = {}
+        fresh = {}
+        for chunk_nodes, hashed in results:
+            for key, value in chunk_nodes.items():
+                if key in nodes:
+                    if h.collides(nodes[key], value):
+                        raise HashCollision(f'Node {value!r} has the same key as {nodes[key]!r}')
+                else:
+                    nodes[key] = value
+            for d_key, chain in hashed:
+                if d_key not in fresh and d_key not in self._nodes:
+                    fresh[d_key] = chain
+        if not fresh:
+            return []
+        # The bulk insert creates millions of small containers,
+        # the cyclic GC would scan them over and over
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._insert_docs(table, doc_path, nodes, fresh)
+        finally:
+            if enabled:
+                gc.enable()
+        return list(fresh)
+
+
+    def _insert_docs(self, table: str, doc_path: str, nodes: dict, fresh: dict):
+        h = self._hasher
+        # Only the nodes of the new documents
+        used = {k for chain in fresh.values() for pair in chain for k in pair}
+        used.update(fresh)
+        self._merge_nodes({k: nodes[k] for k in used})
+        # The table of the new documents is known, the edge & index hooks don't parse their paths
+        self._batch_docs = dict.fromkeys(fresh, table)
+        try:
+            self.add_edges_from((h.node(doc_path), d_key) for d_key in fresh)
+            triples = [(d_key, p_key, t_key) for d_key, chain in fresh.items() for p_key, t_key in chain]
+            self._insert_triples(triples)
+        finally:
+            self._batch_docs = {}
+
+        # The triples are added to the postings of the table by `_merge_indexes`;
+        # the documents without triples are only in the doc set
+        self._table_docs.setdefault(table, set()).update(fresh)
+        for d_key, chain in fresh.items():
+            self._chains[d_key] = chain
+        # Execute `after hook`
+        self.after_triples_add(triples)
+
+
+    def update_doc(self, table: str, uid: str, data: dict) -> bytes:
+        """
+        Replace the data of a document, from a table.
+        Only the triples that changed are removed, or added,
+        by comparing the new data with the chain of the document.
+        Returns the doc key, or False if the document doesn't exist.
+        The compact graphs are append-only, so removing properties raises ValueError,
+        before the document is changed.
+        """
+        h = self._hasher
+        doc_uid = f'{self._app_tables_path}{table}/docs/{uid}/'
+        d_key = h.node(doc_uid)
+        if d_key not in self._table_docs.get(table, ()):
+            return False
+        values = {}
+        for predicate, thing in data.items():
+            things = thing if isinstance(thing, (tuple, list)) else (thing,)
+            for t in things:
+                values[h.node(predicate), h.node(t)] = (predicate, t)
+        old = self._doc_chain(d_key)
+        removed = set(old).difference(values)
+        if removed and self._compact:
+            raise ValueError('Compact graphs are append-only, the properties cannot be removed')
+        for pair in removed:
+            self._remove_triple(d_key, *pair)
+        for pair in values.keys() - set(old):
+            self.add_triple(doc_uid, *values[pair])
+        self._chains[d_key] = tuple(values)
+        return d_key
+
+
+    def delete_doc(self, table: str, uid: str) -> bool:
+        """
+        Remove a document from a table, with all its triples.
+        Returns False if the document doesn't exist.
+        The compact graphs are append-only, so this raises ValueError.
+        """
+        d_key = self._hasher.node(f'{self._app_tables_path}{table}/docs/{uid}/')
+        if d_key not in self._table_docs.get(table, ()):
+            return False
+        if self._compact:
+            raise ValueError('Compact graphs are append-only, the documents cannot be removed')
+        # The doc set, the chain & the cache are updated by `before_node_remove`
+        self.remove_node(d_key)
+        return True
+
+
+    def _decode_chain(self, chain: tuple, field_keys, values: dict) -> dict:
+        """
+        Decode the (predicate key, thing key) pairs of a document.
+        The node values are cached in `values`.
         """
-        d_key = hash(doc_uid)
         doc = {}
-        for next_id in self.iter_next_nodes(d_key):
-            pred = self.get_node_id(next_id)
-            if fields and pred not in fields:
+        for p_key, t_key in chain:
+            if field_keys and p_key not in field_keys:
                 continue
-            thing = set(self.query_sp_t(doc_uid, pred))
-            if len(thing) == 1:
-                thing = thing.pop()
-            doc[pred] = thing
+            pred = values.get(p_key)
+            if pred is None:
+                pred = values[p_key] = self.get_node_id(p_key)
+            thing = values.get(t_key)
+            if thing is None:
+                thing = values[t_key] = self.get_node_id(t_key)
+            if pred not in doc:
+                doc[pred] = thing
+            elif isinstance(doc[pred], set):
+                doc[pred].add(thing)
+            elif doc[pred] != thing:
+                doc[pred] = {doc[pred], thing}
         return doc
 
 
+    def get_doc_id(self, doc_uid: str, fields=set()) -> dict:
+        """
+        Return a specific document UID from a table.
+        The document is decoded from its chain, in one lookup.
+        """
+        d_key = self._hasher.node(doc_uid)
+        if self._cache is None:
+            return self._get_doc(d_key, fields)
+        return self._cached_doc(d_key, fields, lambda: self._get_doc(d_key, fields))
+
+    def _get_doc(self, d_key: bytes, fields) -> dict:
+        h = self._hasher
+        return self._decode_chain(self._doc_chain(d_key), {h.node(f) for f in fields}, {})
+
+    def _cached_doc(self, d_key: bytes, fields, decode) -> dict:
+        """
+        The decoded document from the cache, or from `decode()`.
+        Returns a copy, so the cached document can't be changed.
+        """
+        key = ('doc', d_key, frozenset(fields))
+        doc = self._cache.get(key)
+        if doc is None:
+            doc = decode()
+            self._cache.put(key, doc, (d_key,))
+        return copy_doc(doc)
+
+
     def get_doc(self, table: str, uid: str, fields=set()) -> dict:
         """
         Return a specific document UID from a table.
@@ -121,16 +497,80 @@ class FsConvention(Neuro):
         return self.get_doc_id(f'{self._app_tables_path}{table}/docs/{uid}/', fields)
 
 
+    def get_docs(self, table: str, uids, fields=set()) -> list:
+        """
+        Return many documents from a table, in the same order as the UIDs.
+        The predicates and the things shared by the documents are decoded once.
+        The missing documents are empty dicts.
+        """
+        h = self._hasher
+        doc_path = f'{self._app_tables_path}{table}/docs/'
+        field_keys = {h.node(f) for f in fields}
+        values = {}
+        return [self._decode_chain(self._doc_chain(h.node(f'{doc_path}{uid}/')), field_keys, values)
+                for uid in uids]
+
+
     def query_docs(self, table: str, query: dict, fields=set()):
         """
-        Find all documents that match, from a table.
+        Find all documents that match all the predicate: thing pairs, from a table.
+        Only the postings of the table are used; the smallest one is scanned,
+        the others are only checked.
         """
-        docs = []
-        for s, p in query.items():
-            for doc_uid in self.query_triple('?', s, p):
-                # If the document is not from this table
-                if doc_uid.split('/')[3] != table:
-                    continue
-                # Fetch the complete document
-                docs.append(self.get_doc_id(doc_uid, fields))
-        return docs
+        return list(self.iter_docs(table, query, fields))
+
+    def iter_docs(self, table: str, query: dict, fields=set()):
+        """
+        Like `query_docs`, but returns a generator;
+        the matching keys are found first, then the documents are decoded one at a time,
+        so the graph can change between the documents.
+        """
+        postings = self._table_pt.get(table)
+        if not query or not postings:
+            return
+        h = self._hasher
+        pt_keys = [h.hash(h.node(p), h.node(t)) for p, t in query.items()]
+        field_keys = {h.node(f) for f in fields}
+        values = {}
+        cache = self._cache
+        if cache is None:
+            for d_key in list(self._match_docs(postings, pt_keys)):
+                yield self._decode_chain(self._doc_chain(d_key), field_keys, values)
+            return
+        key = ('query_docs', table, frozenset(pt_keys))
+        found = cache.get(key)
+        if found is None:
+            found = tuple(self._match_docs(postings, pt_keys))
+            cache.put(key, found, pt_keys)
+        for d_key in found:
+            yield self._cached_doc(d_key, fields, lambda: self._decode_chain(
+                self._doc_chain(d_key), field_keys, values))
+
+    @staticmethod
+    def _match_docs(postings: dict, pt_keys: list):
+        sets = sorted((postings.get(pt_key, ()) for pt_key in pt_keys), key=len)
+        for d_key in sets[0]:
+            if all(d_key in others for others in sets[1:]):
+                yield d_key
+
+    def query_pt_s(self, predicate: str, thing: str):
+        """
+        Find all "subjects" that match with the specified predicate and thing.
+        The results are cached, if the cache is enabled.
+        """
+        if self._cache is None:
+            return super().query_pt_s(predicate, thing)
+        h = self._hasher
+        pt_key = h.hash(h.node(predicate), h.node(thing))
+        key = ('query_pt_s', pt_key)
+        subjects = self._cache.get(key)
+        if subjects is None:
+            subjects = tuple(super().query_pt_s(predicate, thing))
+            self._cache.put(key, subjects, (pt_key,))
+        return iter(subjects)
+
+    def count_docs(self, table: str) -> int:
+        """
+        Returns the number of documents in a table.
+        """
+        return len(self._table_docs.get(table, ()))
@@ -1,10 +1,16 @@
 
-#- rev: v2 -
-#- hash: HJIUQG -
+#- rev: v10 -
+#- hash: CT5LCO -
 
-from .util import hash
+from .util import Hasher, HashCollision
+from .compact import NodeTable, EdgeTable, CsrAdjacency
+from .compact import FrozenNodeTable, FrozenEdgeTable, FrozenAdjacency
+from .stats import DegreeColumns, degree_array, top_k, histogram
 from stones import MemoryStore
 
+# Returned for the nodes without adjacency, instead of new sets
+NO_ADJACENCY = (frozenset(), frozenset())
+
 
 class Events:
 
@@ -20,6 +26,34 @@ class Events:
     def after_edge_add(self, edge_id):
         pass
 
+    def before_nodes_add(self, node_ids):
+        for node_id in node_ids:
+            self.before_node_add(node_id)
+
+    def after_nodes_add(self, node_ids):
+        for node_id in node_ids:
+            self.after_node_add(node_id)
+
+    def before_edges_add(self, edge_ids):
+        for edge_id in edge_ids:
+            self.before_edge_add(edge_id)
+
+    def after_edges_add(self, edge_ids):
+        for edge_id in edge_ids:
+            self.after_edge_add(edge_id)
+
+    def before_node_remove(self, node_id):
+        pass
+
+    def after_node_remove(self, node_id):
+        pass
+
+    def before_edge_remove(self, edge_id):
+        pass
+
+    def after_edge_remove(self, edge_id):
+        pass
+
 
 class Graph(Events):
     """
@@ -32,11 +66,29 @@ class Graph(Events):
       * chains
       * meta
       * indexes
-    """
 
-    __slots__ = ('_nodes', '_edges', '_adjacency')
+    When `compact` is True, the node and edge keys are interned as dense integers
+    and the adjacency is kept in CSR arrays, instead of sets.
+    This uses a lot less memory for large graphs.
+    The compact graphs are append-only: removing nodes, edges or triples raises ValueError,
+    before anything is changed.
+
+    The `hasher` is the ID scheme of the graph, by default 32 bytes Blake2.
+    Shorter digests use less memory, eg: Hasher(size=8, memo=1024)
+    """
 
-    def __init__(self):
+    __slots__ = ('_nodes', '_edges', '_adjacency', '_compact', '_hasher', '_degrees')
+
+    def __init__(self, compact=False, hasher=None):
+        self._compact = compact
+        self._hasher = hasher or Hasher()
+        # The degree columns, made on the first use, see `stats.py`
+        self._degrees = None
+        if compact:
+            self._nodes = NodeTable()
+            self._edges = EdgeTable(self._nodes)
+            self._adjacency = CsrAdjacency(self._nodes, self._edges)
+            return
         # The nodes are stored as:
         # Node key -> Value
         self._nodes = MemoryStore(encoder='noop')
@@ -51,6 +103,25 @@ class Graph(Events):
         return f'{self.__class__.__name__}(nodes:{len(self._nodes)}, edges:{len(self._edges)})'
 
 
+    def freeze(self):
+        """
+        Returns an immutable copy of the graph, optimized for reading.
+        The neighbors of each node are stored as contiguous arrays,
+        so iterating the neighbors and the degrees are array slices.
+        """
+        frozen = self.__class__.__new__(self.__class__)
+        self._freeze_into(frozen)
+        return frozen
+
+    def _freeze_into(self, frozen):
+        frozen._compact = True
+        frozen._hasher = self._hasher
+        frozen._degrees = None
+        frozen._nodes = FrozenNodeTable(self.iter_nodes())
+        frozen._edges = FrozenEdgeTable(frozen._nodes, self.iter_edges())
+        frozen._adjacency = FrozenAdjacency(frozen._nodes, frozen._edges)
+
+
     def to_dict(self) -> dict:
         """
         Represent instance as Python dictionaries, ready for serialization.
@@ -63,8 +134,17 @@ class Graph(Events):
         Load instance from Python dictionary.
         This will OVERWRITE all existing nodes and all existing edges!
         """
+        for key in data['n']:
+            self._hasher.check_key(key)
+            break
+        if self._compact:
+            self._nodes.update(data['n'])
+            self._edges.update(data['e'])
+            self._adjacency.rebuild()
+            return
         self._edges.update(data['e'])
         self._nodes.update(data['n'])
+        self._degrees = None
         # Create the adjancency sets
         for key in self._nodes:
             self._adjacency[key] = (set(), set())
@@ -80,8 +160,10 @@ class Graph(Events):
         The node must be a hashable value (number, string, binary).
         Adding the same node data twice will be silently ignored.
         """
-        key = hash(node_data)
+        key = self._hasher.node(node_data)
         if key in self._nodes:
+            if self._hasher.check:
+                self._check_node(key, node_data)
             if safe:
                 return key
             else:
@@ -92,8 +174,12 @@ class Graph(Events):
         self._nodes[key] = node_data
         # Execute `after hook`
         self.after_node_add(key)
+        if self._compact:
+            return key
         # index 0 -> incoming edges; index 1 -> outgoing edges;
         self._adjacency[key] = (set(), set())
+        if self._degrees is not None:
+            self._degrees.add_nodes((key,))
         return key
 
 
@@ -105,8 +191,10 @@ class Graph(Events):
             return False
 
         # Hashing the node ids
-        key = hash(head_id, tail_id)
+        key = self._hasher.hash(head_id, tail_id)
         if key in self._edges:
+            if self._hasher.check:
+                self._check_edge(key, head_id, tail_id)
             if safe:
                 return key
             else:
@@ -117,11 +205,166 @@ class Graph(Events):
         self._edges[key] = (head_id, tail_id)
         # Execute `after hook`
         self.after_edge_add(key)
+        if self._compact:
+            self._adjacency.add_edge(key)
+            return key
         # index 0 -> incoming edges; index 1 -> outgoing edges;
         self._adjacency[tail_id][0].add(key)
         self._adjacency[head_id][1].add(key)
+        if self._degrees is not None:
+            self._degrees.add_edges(((head_id, tail_id),))
+        return key
+
+
+    def add_nodes_from(self, nodes) -> list:
+        """
+        Adds many nodes to the graph, in one pass.
+        Returns the list of node keys, in the same order as the nodes.
+        """
+        keys = []
+        fresh = {}
+        check = self._hasher.check
+        node_hash = self._hasher.node
+        for node_data in nodes:
+            key = node_hash(node_data)
+            keys.append(key)
+            if key in fresh:
+                if check and self._hasher.collides(fresh[key], node_data):
+                    raise HashCollision(f'Node {node_data!r} has the same key as {fresh[key]!r}')
+            elif key in self._nodes:
+                if check:
+                    self._check_node(key, node_data)
+            else:
+                fresh[key] = node_data
+        self._insert_nodes(fresh)
+        return keys
+
+
+    def add_edges_from(self, edges) -> list:
+        """
+        Adds many directed edges, from (head_id, tail_id) pairs, in one pass.
+        The adjacency is updated once, at the end.
+        Returns the list of edge keys, in the same order as the pairs;
+        the pairs with missing nodes are False.
+        """
+        keys = []
+        fresh = {}
+        for head_id, tail_id in edges:
+            if head_id not in self._nodes or tail_id not in self._nodes:
+                keys.append(False)
+                continue
+            key = self._hasher.hash(head_id, tail_id)
+            keys.append(key)
+            if key in fresh:
+                continue
+            if key in self._edges:
+                if self._hasher.check:
+                    self._check_edge(key, head_id, tail_id)
+            else:
+                fresh[key] = (head_id, tail_id)
+        self._insert_edges(fresh)
+        return keys
+
+
+    def _check_node(self, key: bytes, node_data):
+        old = self._nodes.get(key)
+        if self._hasher.collides(old, node_data):
+            raise HashCollision(f'Node {node_data!r} has the same key as {old!r}')
+
+    def _check_edge(self, key: bytes, head_id: bytes, tail_id: bytes):
+        old = self._edges.get(key)
+        if old is not None and tuple(old) != (head_id, tail_id):
+            raise HashCollision(f'Edge {(head_id, tail_id)!r} has the same key as {old!r}')
+
+
+    def _insert_nodes(self, fresh: dict):
+        """
+        Store new nodes, from a dict of: Node key -> Value
+        """
+        if not fresh:
+            return
+        self.before_nodes_add(fresh)
+        self._nodes.update(fresh)
+        self.after_nodes_add(fresh)
+        if not self._compact:
+            for key in fresh:
+                self._adjacency[key] = (set(), set())
+            if self._degrees is not None:
+                self._degrees.add_nodes(fresh)
+
+    def _insert_edges(self, fresh: dict):
+        """
+        Store new edges, from a dict of: Edge key -> (node_id, node_id)
+        """
+        if not fresh:
+            return
+        self.before_edges_add(fresh)
+        self._edges.update(fresh)
+        self.after_edges_add(fresh)
+        if self._compact:
+            self._adjacency.add_edges(fresh)
+            return
+        # Group the edges by node, to touch each adjacency set once
+        inc, out = {}, {}
+        for key, (head_id, tail_id) in fresh.items():
+            inc.setdefault(tail_id, []).append(key)
+            out.setdefault(head_id, []).append(key)
+        for node_id, keys in inc.items():
+            self._adjacency[node_id][0].update(keys)
+        for node_id, keys in out.items():
+            self._adjacency[node_id][1].update(keys)
+        if self._degrees is not None:
+            self._degrees.add_edges(fresh.values())
+
+
+    def remove_edge(self, head_id: bytes, tail_id: bytes):
+        """
+        Removes the directed edge going from head_id to tail_id.
+        Returns the edge key, or False if the edge doesn't exist.
+        """
+        key = self._hasher.hash(head_id, tail_id)
+        if key not in self._edges:
+            return False
+        self._remove_edge(key)
         return key
 
+    def _remove_edge(self, key: bytes):
+        if self._compact:
+            raise ValueError('Compact graphs are append-only')
+        head_id, tail_id = self._edges[key]
+        # Execute `before hook`
+        self.before_edge_remove(key)
+        del self._edges[key]
+        self._adjacency[tail_id][0].discard(key)
+        self._adjacency[head_id][1].discard(key)
+        if self._degrees is not None:
+            self._degrees.add_edges(((head_id, tail_id),), step=-1)
+        # Execute `after hook`
+        self.after_edge_remove(key)
+
+
+    def remove_node(self, node_id: bytes) -> bool:
+        """
+        Removes a node, and all its incoming and outgoing edges.
+        Returns False if the node doesn't exist.
+        """
+        if node_id not in self._nodes:
+            return False
+        if self._compact:
+            raise ValueError('Compact graphs are append-only')
+        inc, out = self._adjacency[node_id]
+        for key in list(inc | out):
+            self._remove_edge(key)
+        # Execute `before hook`
+        self.before_node_remove(node_id)
+        del self._nodes[node_id]
+        del self._adjacency[node_id]
+        # The positions of the next nodes change; the columns are counted again, when needed
+        self._degrees = None
+        # Execute `after hook`
+        self.after_node_remove(node_id)
+        return True
+
 
     def add_bi_edge(self, head_id: bytes, tail_id: bytes):
         """
@@ -154,7 +397,7 @@ class Graph(Events):
         """
         Returns the node ID from the graph
         """
-        key = hash(node_data)
+        key = self._hasher.node(node_data)
         if key in self._nodes:
             return key
         return False
@@ -177,14 +420,14 @@ class Graph(Events):
         """
         Returns True if the edge (head_id, tail_id) is in the graph
         """
-        key = hash(head_id, tail_id)
+        key = self._hasher.hash(head_id, tail_id)
         return key in self._edges
 
     def get_edge(self, head_id: bytes, tail_id: bytes) -> bytes:
         """
         Returns the edge (head_id, tail_id) from the graph
         """
-        key = hash(head_id, tail_id)
+        key = self._hasher.hash(head_id, tail_id)
         if key in self._edges:
             return key
         return False
@@ -252,6 +495,9 @@ class Graph(Events):
         """
         Iterate outgoing nodes
         """
+        if self._compact:
+            yield from self._adjacency.next_nodes(node_id)
+            return
         for edge_id in self.out_edges(node_id):
             yield self.edge_tail(edge_id)
 
@@ -259,6 +505,9 @@ class Graph(Events):
         """
         Iterate incoming nodes
         """
+        if self._compact:
+            yield from self._adjacency.prev_nodes(node_id)
+            return
         for edge_id in self.inc_edges(node_id):
             yield self.edge_head(edge_id)
 
@@ -267,13 +516,17 @@ class Graph(Events):
         """
         Returns a set with the outgoing edges
         """
-        return self._adjacency.get(node_id, (set(), set()))[1]
+        if self._compact:
+            return self._adjacency.out_edges(node_id)
+        return self._adjacency.get(node_id, NO_ADJACENCY)[1]
 
     def inc_edges(self, node_id: bytes) -> set:
         """
         Returns a set with the incoming edges
         """
-        return self._adjacency.get(node_id, (set(), set()))[0]
+        if self._compact:
+            return self._adjacency.inc_edges(node_id)
+        return self._adjacency.get(node_id, NO_ADJACENCY)[0]
 
     def all_edges(self, node_id: bytes) -> set:
         """
@@ -286,12 +539,16 @@ class Graph(Events):
         """
         Returns the number of outgoing edges
         """
+        if self._compact:
+            return self._adjacency.out_degree(node_id)
         return len(self.out_edges(node_id))
 
     def inc_degree(self, node_id: bytes) -> int:
         """
         Returns the number of incoming edges
         """
+        if self._compact:
+            return self._adjacency.inc_degree(node_id)
         return len(self.inc_edges(node_id))
 
     def all_degree(self, node_id: bytes) -> int:
@@ -301,4 +558,34 @@ class Graph(Events):
         return self.inc_degree(node_id) + self.out_degree(node_id)
 
 
+    def _degree_columns(self) -> DegreeColumns:
+        if self._degrees is None:
+            self._degrees = DegreeColumns(self)
+        return self._degrees
+
+    def degrees(self, mode='all'):
+        """
+        Returns the degree of all nodes, as an array,
+        in the same order as the node list.
+        Mode is "inc", "out", or "all".
+        """
+        return degree_array(self, mode)
+
+    def top_k_by_degree(self, k: int, mode='all') -> list:
+        """
+        Returns the K nodes with the largest degree,
+        as a list of (node key, degree), largest first.
+        """
+        values = degree_array(self, mode)
+        keys = self.node_list()
+        return [(keys[i], values[i]) for i in top_k(values, k)]
+
+    def degree_histogram(self, mode='all') -> list:
+        """
+        Returns a list with the number of nodes for each degree,
+        from 0 to the max degree.
+        """
+        return histogram(degree_array(self, mode))
+
+
 # Eof()
@@ -1,26 +1,45 @@
 """
 Import and export Graph to CBOR.
+The graph is streamed as a sequence of CBOR records, see `stream.py`.
 """
-#- rev: v1 -
-#- hash: WIE62B -
+#- rev: v3 -
+#- hash: 4EDTSQ -
 
 import time
 import cbor2
+from .stream import CHUNK_SIZE, iter_records, load_records, read_records
 
 
-def export_cbor(graph, file_name='graphh.cbor'):
+def export_cbor(graph, file_name='graphh.cbor', chunk_size=CHUNK_SIZE):
     t1 = time.time()
     with open(file_name, 'wb') as fd:
-        cbor2.dump(graph.to_dict(), fd)
+        encoder = cbor2.CBOREncoder(fd)
+        for record in iter_records(graph, chunk_size):
+            encoder.encode(record)
     t2 = time.time()
     print('Exported CBOR in `{:.4f}` seconds.'.format(t2 - t1))
 
 
+def iter_cbor_records(fd):
+    """
+    Read the graph records from an open file, one by one.
+    """
+    decoder = cbor2.CBORDecoder(fd)
+
+    def decode_all():
+        while True:
+            try:
+                yield decoder.decode()
+            except cbor2.CBORDecodeEOF:
+                return
+
+    return read_records(decode_all())
+
+
 def import_cbor(graph, file_name):
     t1 = time.time()
     with open(file_name, 'rb') as fd:
-        data = cbor2.load(fd)
-        graph.from_dict(data)
+        load_records(graph, iter_cbor_records(fd))
     t2 = time.time()
     print('Imported CBOR in `{:.4f}` seconds.'.format(t2 - t1))
     return graph
@@ -1,44 +1,86 @@
 """
 Import and export Graph to CSV.
+The files are streamed in chunks of rows, so the memory doesn't depend on the file size.
 """
-#- rev: v1 -
-#- hash: 3ZXNOZ -
+#- rev: v4 -
+#- hash: IU2N7W -
 
+import csv
 import time
-from binascii import hexlify, unhexlify
+from ..locks import write_lock
+from ..util import chunks
+from .stream import HEADER, CHUNK_SIZE, load_records
 
+# Items per row, in the node and edge records
+ROW_SIZE = {'n': 2, 'e': 3}
 
-def export_csv(graph, nodes_file='g_nodes.csv', edges_file='g_edges.csv'):
+
+def export_csv(graph, nodes_file='g_nodes.csv', edges_file='g_edges.csv', chunk_size=CHUNK_SIZE):
     t1 = time.time()
-    with open(nodes_file, 'w') as nfile:
-        nfile.write('id,label\n')
-        for k, val in graph.iter_nodes():
-            hex = hexlify(k).decode('utf')
-            nfile.write(f'{hex},{val}\n')
-
-    with open(edges_file, 'w') as efile:
-        efile.write('Source,Target\n')
-        for _, (head, tail) in graph.iter_edges():
-            head = hexlify(head).decode('utf')
-            tail = hexlify(tail).decode('utf')
-            efile.write(f'{head},{tail}\n')
+    rows = 0
+    with open(nodes_file, 'w', newline='') as nfile:
+        writer = csv.writer(nfile)
+        writer.writerow(('id', 'label'))
+        nodes = ((k.hex(), val) for k, val in graph.iter_nodes())
+        for chunk in chunks(nodes, chunk_size):
+            writer.writerows(chunk)
+            rows += len(chunk)
+
+    with open(edges_file, 'w', newline='') as efile:
+        writer = csv.writer(efile)
+        writer.writerow(('Source', 'Target'))
+        edges = ((head.hex(), tail.hex()) for _, (head, tail) in graph.iter_edges())
+        for chunk in chunks(edges, chunk_size):
+            writer.writerows(chunk)
+            rows += len(chunk)
     t2 = time.time()
-    print('Exported CSV in `{:.4f}` seconds.'.format(t2 - t1))
+    print('Exported CSV in `{:.4f}` seconds, {:.0f} rows/s.'.format(t2 - t1, rows / ((t2 - t1) or 1e-9)))
+
+
+def iter_csv_records(hasher, nodes_file='g_nodes.csv', edges_file='g_edges.csv', chunk_size=CHUNK_SIZE):
+    """
+    Read the CSV files as graph records, see `stream.py`.
+    The keys are computed with the hasher of the target graph.
+    """
+    yield HEADER
+    # The CSV values are always strings, so the nodes that were not strings
+    # may get a different key; the edges are moved to the new keys
+    moved = {}
+    with open(nodes_file, 'r', newline='') as nfile:
+        reader = csv.reader(nfile)
+        next(reader, None) # Ignore header
+        for chunk in chunks(reader, chunk_size):
+            items = []
+            for hex, val in chunk:
+                key = hasher.node(val)
+                old = bytes.fromhex(hex)
+                if old != key:
+                    moved[old] = key
+                items += (key, val)
+            yield 'n', items
+
+    with open(edges_file, 'r', newline='') as efile:
+        reader = csv.reader(efile)
+        next(reader, None) # Ignore header
+        for chunk in chunks(reader, chunk_size):
+            items = []
+            for head, tail in chunk:
+                head = bytes.fromhex(head)
+                tail = bytes.fromhex(tail)
+                head = moved.get(head, head)
+                tail = moved.get(tail, tail)
+                items += (hasher.hash(head, tail), head, tail)
+            yield 'e', items
 
 
-def import_csv(graph, nodes_file='g_nodes.csv', edges_file='g_edges.csv'):
+def import_csv(graph, nodes_file='g_nodes.csv', edges_file='g_edges.csv', chunk_size=CHUNK_SIZE):
     t1 = time.time()
-    with open(nodes_file, 'r') as nfile:
-        nfile.readline() # Ignore header
-        for line in nfile.readlines():
-            key, val = line[:-1].split(',')
-            graph.add_node(val) == unhexlify(key), 'The CSV nodes file is corrupted'
-
-    with open(edges_file, 'r') as efile:
-        efile.readline() # Ignore header
-        for line in efile.readlines():
-            head, tail = line[:-1].split(',')
-            graph.add_edge(unhexlify(head), unhexlify(tail))
+    rows = 0
+    with write_lock(graph):
+        for tag, items in iter_csv_records(graph._hasher, nodes_file, edges_file, chunk_size):
+            load_records(graph, [(tag, items)])
+            if tag in ROW_SIZE:
+                rows += len(items) // ROW_SIZE[tag]
     t2 = time.time()
-    print('Imported CSV in `{:.4f}` seconds.'.format(t2 - t1))
+    print('Imported CSV in `{:.4f}` seconds, {:.0f} rows/s.'.format(t2 - t1, rows / ((t2 - t1) or 1e-9)))
     return graph
@@ -1,30 +1,36 @@
 """
 Import and export Graph to MsgPack.
+The graph is streamed as a sequence of MsgPack records, see `stream.py`.
 """
-#- rev: v1 -
-#- hash: VUYN5X -
+#- rev: v3 -
+#- hash: UZZTA7 -
 
 import time
 import msgpack
+from .stream import CHUNK_SIZE, iter_records, load_records, read_records
 
 
-def export_msgpack(graph, file_name='graphh.pack'):
+def export_msgpack(graph, file_name='graphh.pack', chunk_size=CHUNK_SIZE):
     t1 = time.time()
+    packer = msgpack.Packer(use_bin_type=True)
     with open(file_name, 'wb') as fd:
-        fd.write(msgpack.packb(graph.to_dict(), use_bin_type=True))
+        for record in iter_records(graph, chunk_size):
+            fd.write(packer.pack(record))
     t2 = time.time()
     print('Exported MsgPack in `{:.4f}` seconds.'.format(t2 - t1))
 
 
+def iter_msgpack_records(fd):
+    """
+    Read the graph records from an open file, one by one.
+    """
+    return read_records(msgpack.Unpacker(fd, raw=False, max_buffer_size=0))
+
+
 def import_msgpack(graph, file_name):
     t1 = time.time()
     with open(file_name, 'rb') as fd:
-        data = msgpack.unpackb(fd.read())
-        # Fix binary keys
-        data['n'] = data[b'n']
-        data['e'] = data[b'e']
-        del data[b'n'], data[b'e']
-        graph.from_dict(data)
+        load_records(graph, iter_msgpack_records(fd))
     t2 = time.time()
     print('Imported MsgPack in `{:.4f}` seconds.'.format(t2 - t1))
     return graph
@@ -0,0 +1,89 @@
+"""
+Import many graph shards in parallel, using a process pool.
+The workers decode and hash the shards, and return pre-hashed records;
+the main process only merges the records into the graph.
+
+The shards can be:
+  * (nodes_file, edges_file) pairs of CSV files
+  * MsgPack files, *.pack, *.mp or *.msgpack
+  * CBOR files, *.cbor or *.cb
+"""
+#- rev: v3 -
+#- hash: QBP7ED -
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ..locks import write_lock
+from .stream import CHUNK_SIZE, load_records
+
+MSGPACK_EXT = ('.pack', '.mp', '.msgpack')
+CBOR_EXT = ('.cbor', '.cb')
+
+
+def read_shard(shard, hasher, chunk_size=CHUNK_SIZE) -> list:
+    """
+    Decode and hash a shard, in a worker process.
+    The CSV values are hashed here; the MsgPack and CBOR files have their own keys,
+    so they are checked against the hasher, and a shard made with a different ID scheme is refused.
+    Returns the list of graph records, see `stream.py`.
+    """
+    if isinstance(shard, (tuple, list)):
+        from .csv import iter_csv_records
+        return list(iter_csv_records(hasher, *shard, chunk_size=chunk_size))
+
+    ext = os.path.splitext(shard)[1].lower()
+    if ext in MSGPACK_EXT:
+        from .msgpack import iter_msgpack_records as iter_records
+    elif ext in CBOR_EXT:
+        from .cbor import iter_cbor_records as iter_records
+    else:
+        raise ValueError(f'Unknown shard format: {shard}')
+    with open(shard, 'rb') as fd:
+        records = list(iter_records(fd))
+    check_records(records, hasher, shard)
+    return records
+
+
+def check_records(records: list, hasher, shard=''):
+    """
+    Re-hash the nodes and edges of the records, and raise if any key is different.
+    """
+    node_hash, edge_hash = hasher.node, hasher.hash
+    for tag, items in records:
+        if tag == 'n':
+            bad = any(node_hash(v) != k for k, v in zip(items[::2], items[1::2]))
+        elif tag == 'e':
+            bad = any(edge_hash(h, t) != k for k, h, t in zip(items[::3], items[1::3], items[2::3]))
+        else:
+            continue
+        if bad:
+            raise ValueError(f'The keys of shard {shard} are not made by {hasher}')
+
+
+def import_parallel(graph, shards, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Import many shards into one graph.
+    The nodes are merged as soon as a shard is ready;
+    the edges and indexes are merged at the end, because they can
+    point to nodes from other shards.
+    """
+    t1 = time.time()
+    rest = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(read_shard, shard, graph._hasher, chunk_size) for shard in shards]
+        for future in as_completed(futures):
+            for tag, items in future.result():
+                if tag == 'n':
+                    load_records(graph, [(tag, items)])
+                else:
+                    rest.append((tag, items))
+    t2 = time.time()
+    # First all edges, then the indexes; the readers see them all, or none
+    with write_lock(graph):
+        load_records(graph, (r for r in rest if r[0] == 'e'))
+        load_records(graph, (r for r in rest if r[0] != 'e'))
+    t3 = time.time()
+    print('Imported {} shards in `{:.4f}` seconds, merged in `{:.4f}` seconds.'.format(
+        len(shards), t3 - t1, t3 - t2))
+    return graph
@@ -0,0 +1,467 @@
+"""
+Export Graph to a native binary snapshot, and open it with mmap.
+The opened Graph is read-only, and nothing is deserialized at open;
+the queries read the nodes, edges and indexes directly from the file.
+
+Layout (little-endian):
+  * header
+  * node keys, sorted; the position is the node number
+  * node value offsets in the heap, node value types
+  * edge keys, sorted; the position is the edge number
+  * edge heads, edge tails, as node numbers
+  * outgoing CSR: offsets by node, edge numbers
+  * incoming CSR: offsets by node, edge numbers
+  * only Neuro: S+P CSR and P+T CSR; offsets by edge, node numbers
+  * the value heap
+"""
+#- rev: v7 -
+#- hash: FZ5ZAJ -
+
+import sys
+import mmap
+import time
+import struct
+from array import array
+from collections.abc import Mapping
+from ..compact import INT_TYPE, build_csr
+from ..neuro import Neuro
+from ..graph import Graph
+from ..util import Hasher
+
+MAGIC = b'GRAPHH\x00\x01'
+VERSION = 1
+# magic, version, flags, key size, hash algo, nodes, edges, S+P values, P+T values, heap size
+HEADER = struct.Struct('<8sIIIIQQQQQ')
+FLAG_NEURO = 1
+ALGOS = ('blake2b', 'xxh3')
+
+# Value types
+T_NONE, T_STR, T_BYTES, T_INT, T_FLOAT, T_BOOL = range(6)
+
+
+def check_value(value):
+    """
+    Raise if a value can't be saved; check it before changing the graph.
+    """
+    if value is not None and not isinstance(value, (str, bytes, int, float)):
+        raise TypeError(f'Cannot save {type(value)} in a snapshot')
+
+
+def encode_value(value):
+    if value is None:
+        return T_NONE, b''
+    if isinstance(value, str):
+        return T_STR, value.encode('utf8')
+    if isinstance(value, bytes):
+        return T_BYTES, value
+    if isinstance(value, bool):
+        return T_BOOL, b'1' if value else b'0'
+    if isinstance(value, int):
+        return T_INT, str(value).encode('ascii')
+    if isinstance(value, float):
+        return T_FLOAT, repr(value).encode('ascii')
+    raise TypeError(f'Cannot save {type(value)} in a snapshot')
+
+
+def decode_value(kind, raw):
+    if kind == T_STR:
+        return str(raw, 'utf8')
+    if kind == T_BYTES:
+        return bytes(raw)
+    if kind == T_INT:
+        return int(raw)
+    if kind == T_FLOAT:
+        return float(raw)
+    if kind == T_BOOL:
+        return raw == b'1'
+    return None
+
+
+def _layout(key_size, nodes, edges, sp_size, pt_size, heap_size, neuro):
+    """
+    Returns the sections as: name -> (offset, size, format)
+    Every section starts at a multiple of 8 bytes.
+    """
+    sections = [
+        ('node_keys', nodes * key_size, 'B'),
+        ('node_heap', (nodes + 1) * 8, 'Q'),
+        ('node_type', nodes, 'B'),
+        ('edge_keys', edges * key_size, 'B'),
+        ('edge_heads', edges * 4, INT_TYPE),
+        ('edge_tails', edges * 4, INT_TYPE),
+        ('out_off', (nodes + 1) * 4, INT_TYPE),
+        ('out_edges', edges * 4, INT_TYPE),
+        ('inc_off', (nodes + 1) * 4, INT_TYPE),
+        ('inc_edges', edges * 4, INT_TYPE),
+    ]
+    if neuro:
+        sections += [
+            ('sp_off', (edges + 1) * 4, INT_TYPE),
+            ('sp_nodes', sp_size * 4, INT_TYPE),
+            ('pt_off', (edges + 1) * 4, INT_TYPE),
+            ('pt_nodes', pt_size * 4, INT_TYPE),
+        ]
+    sections.append(('heap', heap_size, 'B'))
+    layout = {}
+    offset = HEADER.size
+    for name, size, fmt in sections:
+        offset += -offset % 8
+        layout[name] = (offset, size, fmt)
+        offset += size
+    return layout
+
+
+def export_snapshot(graph, file_name='graphh.snap'):
+    t1 = time.time()
+    if sys.byteorder != 'little':
+        raise OSError('Snapshots can only be saved on little-endian machines')
+    neuro = isinstance(graph, Neuro)
+    if neuro and graph._predicates is not None:
+        raise ValueError('Partitioned Neuro graphs cannot be saved as snapshots')
+    hasher = graph._hasher
+
+    nodes = sorted(graph.iter_nodes())
+    node_idx = {key: i for i, (key, _) in enumerate(nodes)}
+    heap = bytearray()
+    node_heap = array('Q', [0])
+    node_type = bytearray()
+    for _, value in nodes:
+        kind, raw = encode_value(value)
+        node_type.append(kind)
+        heap += raw
+        node_heap.append(len(heap))
+
+    edges = sorted(graph.iter_edges())
+    edge_heads = array(INT_TYPE, (node_idx[h] for _, (h, _) in edges))
+    edge_tails = array(INT_TYPE, (node_idx[t] for _, (_, t) in edges))
+    out_off, out_edges = build_csr(len(nodes), edge_heads)
+    inc_off, inc_edges = build_csr(len(nodes), edge_tails)
+
+    data = {
+        'node_keys': b''.join(key for key, _ in nodes),
+        'node_heap': node_heap,
+        'node_type': node_type,
+        'edge_keys': b''.join(key for key, _ in edges),
+        'edge_heads': edge_heads,
+        'edge_tails': edge_tails,
+        'out_off': out_off,
+        'out_edges': out_edges,
+        'inc_off': inc_off,
+        'inc_edges': inc_edges,
+        'heap': heap,
+    }
+    sp_size = pt_size = 0
+    if neuro:
+        # The S+P and P+T keys are the same as the edge keys
+        for name, index in (('sp', graph._sp), ('pt', graph._pt)):
+            offsets = array(INT_TYPE, [0])
+            values = array(INT_TYPE)
+            for key, _ in edges:
+                values.extend(sorted(node_idx[n] for n in index.get(key) or ()))
+                offsets.append(len(values))
+            data[f'{name}_off'] = offsets
+            data[f'{name}_nodes'] = values
+        sp_size = len(data['sp_nodes'])
+        pt_size = len(data['pt_nodes'])
+
+    header = HEADER.pack(MAGIC, VERSION, FLAG_NEURO if neuro else 0, hasher.size, ALGOS.index(hasher.algo),
+                         len(nodes), len(edges), sp_size, pt_size, len(heap))
+    layout = _layout(hasher.size, len(nodes), len(edges), sp_size, pt_size, len(heap), neuro)
+    with open(file_name, 'wb') as fd:
+        fd.write(header)
+        for name, (offset, size, _) in layout.items():
+            fd.write(bytes(offset - fd.tell()))
+            chunk = data[name]
+            if len(memoryview(chunk).cast('B')) != size:
+                raise ValueError(f'Invalid snapshot section {name}')
+            fd.write(chunk)
+    t2 = time.time()
+    print('Exported snapshot in `{:.4f}` seconds.'.format(t2 - t1))
+
+
+class _SortedKeys:
+    """
+    Fixed width keys, sorted, found with binary search.
+    """
+
+    __slots__ = ('_mv', '_size', '_count')
+
+    def __init__(self, mv, size: int):
+        self._mv = mv
+        self._size = size
+        self._count = len(mv) // size if size else 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx: int) -> bytes:
+        size = self._size
+        return bytes(self._mv[idx * size:(idx + 1) * size])
+
+    def find(self, key: bytes):
+        """
+        Returns the position of a key, or None
+        """
+        if not isinstance(key, bytes) or len(key) != self._size:
+            return None
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self[lo] == key:
+            return lo
+        return None
+
+
+class _ReadOnly(Mapping):
+
+    def __setitem__(self, key, value):
+        raise TypeError('The snapshot is read-only')
+
+    def __delitem__(self, key):
+        raise TypeError('The snapshot is read-only')
+
+
+class SnapshotNodes(_ReadOnly):
+    """
+    Node key -> Value, read from the snapshot.
+    """
+
+    def __init__(self, keys, heap_off, types, heap):
+        self._keys = keys
+        self._heap_off = heap_off
+        self._types = types
+        self._heap = heap
+
+    def index(self, key: bytes):
+        return self._keys.find(key)
+
+    def key_at(self, idx: int) -> bytes:
+        return self._keys[idx]
+
+    def value_at(self, idx: int):
+        raw = self._heap[self._heap_off[idx]:self._heap_off[idx + 1]]
+        return decode_value(self._types[idx], raw)
+
+    def __contains__(self, key) -> bool:
+        return self._keys.find(key) is not None
+
+    def __getitem__(self, key):
+        idx = self._keys.find(key)
+        if idx is None:
+            raise KeyError(key)
+        return self.value_at(idx)
+
+    def get(self, key, default=None):
+        idx = self._keys.find(key)
+        if idx is None:
+            return default
+        return self.value_at(idx)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        for idx in range(len(self._keys)):
+            yield self._keys[idx]
+
+    def items(self):
+        for idx in range(len(self._keys)):
+            yield self._keys[idx], self.value_at(idx)
+
+
+class SnapshotEdges(_ReadOnly):
+    """
+    Edge key -> (node_id, node_id), read from the snapshot.
+    """
+
+    def __init__(self, keys, heads, tails, nodes):
+        self._keys = keys
+        self._heads = heads
+        self._tails = tails
+        self._nodes = nodes
+
+    def index(self, key: bytes):
+        return self._keys.find(key)
+
+    def key_at(self, idx: int) -> bytes:
+        return self._keys[idx]
+
+    def __contains__(self, key) -> bool:
+        return self._keys.find(key) is not None
+
+    def __getitem__(self, key):
+        idx = self._keys.find(key)
+        if idx is None:
+            raise KeyError(key)
+        return (self._nodes.key_at(self._heads[idx]), self._nodes.key_at(self._tails[idx]))
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        for idx in range(len(self._keys)):
+            yield self._keys[idx]
+
+    def items(self):
+        node_key = self._nodes.key_at
+        for idx in range(len(self._keys)):
+            yield self._keys[idx], (node_key(self._heads[idx]), node_key(self._tails[idx]))
+
+
+class SnapshotAdjacency:
+    """
+    Incoming & outgoing adjacency, read from the snapshot CSR arrays.
+    Same interface as the compact CsrAdjacency.
+    """
+
+    def __init__(self, nodes, edges, inc, out):
+        self._nodes = nodes
+        self._edges = edges
+        self._inc = inc
+        self._out = out
+
+    def rebuild(self):
+        raise TypeError('The snapshot is read-only')
+
+    add_edge = add_edges = rebuild
+
+    def _row(self, csr, node_id):
+        idx = self._nodes.index(node_id)
+        if idx is None:
+            return ()
+        offsets, edges = csr
+        return edges[offsets[idx]:offsets[idx + 1]]
+
+    def inc_edges(self, node_id: bytes) -> set:
+        return {self._edges.key_at(e) for e in self._row(self._inc, node_id)}
+
+    def out_edges(self, node_id: bytes) -> set:
+        return {self._edges.key_at(e) for e in self._row(self._out, node_id)}
+
+    def prev_nodes(self, node_id: bytes):
+        heads = self._edges._heads
+        for e in self._row(self._inc, node_id):
+            yield self._nodes.key_at(heads[e])
+
+    def next_nodes(self, node_id: bytes):
+        tails = self._edges._tails
+        for e in self._row(self._out, node_id):
+            yield self._nodes.key_at(tails[e])
+
+    def inc_degree(self, node_id: bytes) -> int:
+        return len(self._row(self._inc, node_id))
+
+    def out_degree(self, node_id: bytes) -> int:
+        return len(self._row(self._out, node_id))
+
+
+class SnapshotIndex(_ReadOnly):
+    """
+    S+P -> things, or P+T -> subjects, read from the snapshot.
+    The keys are the same as the edge keys.
+    """
+
+    def __init__(self, edges, offsets, values, nodes):
+        self._edges = edges
+        self._offsets = offsets
+        self._values = values
+        self._nodes = nodes
+
+    def _row(self, idx):
+        return self._values[self._offsets[idx]:self._offsets[idx + 1]]
+
+    def __contains__(self, key) -> bool:
+        idx = self._edges.index(key)
+        return idx is not None and self._offsets[idx] != self._offsets[idx + 1]
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        idx = self._edges.index(key)
+        if idx is None or self._offsets[idx] == self._offsets[idx + 1]:
+            return default
+        return {self._nodes.key_at(n) for n in self._row(idx)}
+
+    def __len__(self) -> int:
+        return sum(1 for idx in range(len(self._edges)) if self._offsets[idx] != self._offsets[idx + 1])
+
+    def __iter__(self):
+        for idx in range(len(self._edges)):
+            if self._offsets[idx] != self._offsets[idx + 1]:
+                yield self._edges.key_at(idx)
+
+
+def open_snapshot(file_name):
+    """
+    Open a snapshot file as a read-only Graph, or Neuro.
+    """
+    t1 = time.time()
+    if sys.byteorder != 'little':
+        raise OSError('Snapshots can only be opened on little-endian machines')
+    with open(file_name, 'rb') as fd:
+        mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < HEADER.size:
+        raise ValueError(f'Invalid snapshot file: {file_name}')
+    (magic, version, flags, key_size, algo, nodes, edges,
+        sp_size, pt_size, heap_size) = HEADER.unpack_from(mm)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'Invalid snapshot file: {file_name}')
+    neuro = bool(flags & FLAG_NEURO)
+
+    mv = memoryview(mm)
+    sections = {}
+    for name, (offset, size, fmt) in _layout(key_size, nodes, edges, sp_size, pt_size, heap_size, neuro).items():
+        # A truncated file would give short sections
+        if offset + size > len(mv):
+            raise ValueError(f'Invalid snapshot section {name}')
+        sections[name] = mv[offset:offset + size].cast(fmt)
+
+    node_table = SnapshotNodes(
+        _SortedKeys(sections['node_keys'], key_size),
+        sections['node_heap'], sections['node_type'], sections['heap'])
+    edge_table = SnapshotEdges(
+        _SortedKeys(sections['edge_keys'], key_size),
+        sections['edge_heads'], sections['edge_tails'], node_table)
+
+    cls = Neuro if neuro else Graph
+    graph = cls.__new__(cls)
+    graph._compact = True
+    graph._hasher = Hasher(size=key_size, algo=ALGOS[algo])
+    graph._degrees = None
+    graph._nodes = node_table
+    graph._edges = edge_table
+    graph._adjacency = SnapshotAdjacency(node_table, edge_table,
+        (sections['inc_off'], sections['inc_edges']),
+        (sections['out_off'], sections['out_edges']))
+    if neuro:
+        graph._sp = SnapshotIndex(edge_table, sections['sp_off'], sections['sp_nodes'], node_table)
+        graph._pt = SnapshotIndex(edge_table, sections['pt_off'], sections['pt_nodes'], node_table)
+        graph._predicates = None
+        graph._value_indexes = {}
+    t2 = time.time()
+    print('Opened snapshot in `{:.4f}` seconds.'.format(t2 - t1))
+    return graph
+
+
+def import_snapshot(graph, file_name):
+    """
+    Load a snapshot file into a normal, writable graph.
+    """
+    t1 = time.time()
+    graph.from_dict(open_snapshot(file_name).to_dict())
+    t2 = time.time()
+    print('Imported snapshot in `{:.4f}` seconds.'.format(t2 - t1))
+    return graph
@@ -0,0 +1,108 @@
+"""
+Graph as a stream of records, for the streaming CBOR & MsgPack formats.
+Each record is a (tag, flat list) pair, with at most CHUNK_SIZE items:
+  * ("graphh", 1) -- the header
+  * ("n", [node key, value, ...])
+  * ("e", [edge key, head key, tail key, ...])
+  * ("sp", [S+P key, [thing keys], ...]) -- only Neuro
+  * ("pt", [P+T key, [subject keys], ...]) -- only Neuro
+  * ("t", [subject key, predicate key, thing key, ...]) -- only partitioned Neuro
+"""
+#- rev: v6 -
+#- hash: BAIB2L -
+
+from itertools import chain
+from ..neuro import Neuro
+from ..locks import write_lock
+from ..util import chunks
+
+HEADER = ('graphh', 1)
+CHUNK_SIZE = 10_000
+
+
+def iter_records(graph, chunk_size=CHUNK_SIZE):
+    """
+    Yield all the graph records, in chunks, without copying the graph.
+    """
+    yield HEADER
+    for chunk in chunks(graph.iter_nodes(), chunk_size):
+        yield 'n', list(chain.from_iterable(chunk))
+    for chunk in chunks(graph.iter_edges(), chunk_size):
+        yield 'e', [x for key, (head, tail) in chunk for x in (key, head, tail)]
+    if isinstance(graph, Neuro) and graph._predicates is not None:
+        for chunk in chunks(graph._predicates, chunk_size):
+            yield 't', list(chain.from_iterable(chunk))
+    elif isinstance(graph, Neuro):
+        for tag, index in (('sp', graph._sp), ('pt', graph._pt)):
+            for chunk in chunks(index, chunk_size):
+                yield tag, [x for key in chunk for x in (key, list(index.get(key) or ()))]
+
+
+def load_records(graph, records):
+    """
+    Insert the records into the graph, as they come.
+    The edges with missing nodes are ignored.
+    The keys must come from the same ID scheme as the graph, like in `from_dict`.
+    The thread-safe graphs are locked for writing, until all the records are in.
+    """
+    with write_lock(graph):
+        nodes = graph._nodes
+        hasher = graph._hasher
+        checked = False
+        for tag, items in records:
+            if tag in ('n', 'e') and items and not checked:
+                hasher.check_key(items[0])
+                checked = True
+            if tag == 'n':
+                fresh = dict(zip(items[::2], items[1::2]))
+                if hasher.check:
+                    for k in fresh:
+                        if k in nodes:
+                            graph._check_node(k, fresh[k])
+                graph._insert_nodes({k: v for k, v in fresh.items() if k not in nodes})
+            elif tag == 'e':
+                fresh = {k: (h, t) for k, h, t in zip(items[::3], items[1::3], items[2::3])
+                         if h in nodes and t in nodes}
+                if hasher.check:
+                    for k in fresh:
+                        if k in graph._edges:
+                            graph._check_edge(k, *fresh[k])
+                graph._insert_edges({k: v for k, v in fresh.items() if k not in graph._edges})
+            elif tag == 'sp':
+                graph._merge_indexes(dict(zip(items[::2], items[1::2])), {})
+            elif tag == 'pt':
+                graph._merge_indexes({}, dict(zip(items[::2], items[1::2])))
+            elif tag == 't':
+                graph._insert_triples([(s, p, t) for s, p, t in zip(items[::3], items[1::3], items[2::3])
+                                       if s in nodes and p in nodes and t in nodes])
+            elif (tag, items) != HEADER:
+                raise ValueError(f'Invalid graph record: {tag}')
+    return graph
+
+
+def legacy_records(data: dict, chunk_size=CHUNK_SIZE):
+    """
+    Convert the old format, a single dict from Graph.to_dict(), to records.
+    """
+    data = {k.decode() if isinstance(k, bytes) else k: v for k, v in data.items()}
+    yield HEADER
+    for chunk in chunks(data['n'].items(), chunk_size):
+        yield 'n', list(chain.from_iterable(chunk))
+    for chunk in chunks(data['e'].items(), chunk_size):
+        yield 'e', [x for key, (head, tail) in chunk for x in (key, head, tail)]
+    for tag in ('sp', 'pt'):
+        for chunk in chunks(data.get(tag, {}).items(), chunk_size):
+            yield tag, [x for key, keys in chunk for x in (key, list(keys))]
+
+
+def read_records(objects):
+    """
+    Records from a sequence of decoded objects, in the new or the old format.
+    """
+    objects = iter(objects)
+    first = next(objects, None)
+    if isinstance(first, dict):
+        yield from legacy_records(first)
+    elif first is not None:
+        yield first
+        yield from objects
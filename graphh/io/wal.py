@@ -0,0 +1,237 @@
+"""
+Append-only log of Graph mutations, with periodic compaction into a snapshot.
+Saving after a batch of inserts only writes that batch;
+a restart loads the last snapshot, then replays the log.
+
+Log records:
+  * N: node key, value type, value size, value
+  * E: head key, tail key
+  * T: subject key, predicate key, thing key
+  * X: removed node key
+  * D: removed edge, head key, tail key
+  * R: removed triple, subject key, predicate key, thing key
+"""
+#- rev: v4 -
+#- hash: LKOY6V -
+
+import os
+import time
+import struct
+from ..graph import Graph
+from ..neuro import Neuro
+from ..locks import write_lock
+from .snapshot import check_value, encode_value, decode_value, export_snapshot, import_snapshot
+
+MAGIC = b'GRAPHLOG'
+VERSION = 1
+# magic, version, key size
+HEADER = struct.Struct('<8sII')
+# value type, value size
+VALUE = struct.Struct('<BI')
+COMPACT_EVERY = 100_000
+# The records made only of keys: tag -> number of keys
+KEY_RECORDS = {b'T': 3, b'X': 1, b'D': 2, b'R': 3}
+
+
+class AppendLog:
+    """
+    Mixin that appends the graph mutations to a log file.
+    It must come before the graph class, eg:
+
+        class LoggedNeuro(AppendLog, Neuro): pass
+
+        g = LoggedNeuro()
+        g.open_log('data/geo') # loads data/geo.snap + data/geo.log
+        g.add_triple('RO', 'capital', 'Bucharest')
+        g.save() # flush the new records
+    """
+
+    _log = None
+    _log_path = ''
+    _log_records = 0
+    _compact_every = COMPACT_EVERY
+
+    def open_log(self, path: str, compact_every=COMPACT_EVERY):
+        """
+        Load the snapshot and replay the log, then start logging.
+        The partitioned Neuro graphs can't be logged, because they can't be saved as snapshots.
+        """
+        if getattr(self, '_predicates', None) is not None:
+            raise ValueError('Partitioned Neuro graphs cannot be logged')
+        self._log_path = path
+        self._compact_every = compact_every
+        log_file = path + '.log'
+        # The thread-safe graphs are locked, until the snapshot & the log are loaded
+        with write_lock(self):
+            if os.path.isfile(path + '.snap'):
+                import_snapshot(self, path + '.snap')
+            if os.path.isfile(log_file) and os.path.getsize(log_file):
+                self._log_records = self._replay(log_file)
+                self._log = open(log_file, 'ab')
+            else:
+                self._new_log()
+
+    def _new_log(self):
+        self._log = open(self._log_path + '.log', 'wb')
+        self._log.write(HEADER.pack(MAGIC, VERSION, self._hasher.size))
+        self._log_records = 0
+
+    def save(self, sync=False):
+        """
+        Flush the new records to the log file.
+        If the log is large enough, compact it into a snapshot.
+        """
+        if self._log_records >= self._compact_every:
+            self.compact()
+        self._log.flush()
+        if sync:
+            os.fsync(self._log.fileno())
+
+    def compact(self):
+        """
+        Save the whole graph in a snapshot, and empty the log.
+        """
+        tmp_file = self._log_path + '.snap.tmp'
+        export_snapshot(self, tmp_file)
+        os.replace(tmp_file, self._log_path + '.snap')
+        # If this fails before the log is truncated, the log replays over
+        # the snapshot; that's fine, because all the records are idempotent
+        self._log.close()
+        self._new_log()
+
+    def close_log(self):
+        if self._log:
+            self.save()
+            self._log.close()
+            self._log = None
+
+    def _replay(self, log_file: str) -> int:
+        t1 = time.time()
+        # Stop logging while replaying
+        self._log = None
+        key_size = self._hasher.size
+        records = 0
+        with open(log_file, 'rb') as fd:
+            magic, version, size = HEADER.unpack(fd.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or size != key_size:
+                raise ValueError(f'Invalid log file: {log_file}')
+            good = fd.tell()
+            nodes, edges = {}, []
+            while True:
+                tag = fd.read(1)
+                if tag == b'N':
+                    key = fd.read(key_size)
+                    head = fd.read(VALUE.size)
+                    if len(head) < VALUE.size:
+                        break
+                    kind, length = VALUE.unpack(head)
+                    raw = fd.read(length)
+                    if len(key) < key_size or len(raw) < length:
+                        break
+                    if edges:
+                        self.add_edges_from(edges)
+                        edges = []
+                    nodes[key] = decode_value(kind, raw)
+                elif tag == b'E':
+                    pair = fd.read(key_size * 2)
+                    if len(pair) < key_size * 2:
+                        break
+                    if nodes:
+                        self._replay_nodes(nodes)
+                        nodes = {}
+                    edges.append((pair[:key_size], pair[key_size:]))
+                elif tag in KEY_RECORDS:
+                    keys = fd.read(key_size * KEY_RECORDS[tag])
+                    if len(keys) < key_size * KEY_RECORDS[tag]:
+                        break
+                    self._replay_nodes(nodes)
+                    self.add_edges_from(edges)
+                    nodes, edges = {}, []
+                    self._replay_keys(tag, [keys[i:i + key_size] for i in range(0, len(keys), key_size)])
+                else:
+                    break
+                good = fd.tell()
+                records += 1
+            self._replay_nodes(nodes)
+            self.add_edges_from(edges)
+        # Drop the last record, if it was not written completely
+        if good < os.path.getsize(log_file):
+            os.truncate(log_file, good)
+        t2 = time.time()
+        print('Replayed {} log records in `{:.4f}` seconds.'.format(records, t2 - t1))
+        return records
+
+    def _replay_nodes(self, nodes: dict):
+        self._insert_nodes({k: v for k, v in nodes.items() if k not in self._nodes})
+
+    def _replay_keys(self, tag: bytes, keys: list):
+        # The removed records are idempotent, like the others
+        if tag == b'T':
+            self._index_triple(*keys)
+        elif tag == b'X':
+            self.remove_node(keys[0])
+        elif tag == b'D':
+            self.remove_edge(*keys)
+        else:
+            self._remove_triple(*keys)
+
+    def add_node(self, node_data, safe=True):
+        # Refuse the values that can't be logged, before the graph is changed
+        if self._log:
+            check_value(node_data)
+        return super().add_node(node_data, safe)
+
+    def before_nodes_add(self, node_ids):
+        super().before_nodes_add(node_ids)
+        if self._log:
+            for value in node_ids.values():
+                check_value(value)
+
+    def after_node_add(self, node_id):
+        super().after_node_add(node_id)
+        if self._log:
+            kind, raw = encode_value(self._nodes.get(node_id))
+            self._log.write(b'N' + node_id + VALUE.pack(kind, len(raw)) + raw)
+            self._log_records += 1
+
+    def after_edge_add(self, edge_id):
+        super().after_edge_add(edge_id)
+        if self._log:
+            head_id, tail_id = self._edges.get(edge_id)
+            self._log.write(b'E' + head_id + tail_id)
+            self._log_records += 1
+
+    def after_triple_add(self, s_key, p_key, t_key):
+        super().after_triple_add(s_key, p_key, t_key)
+        if self._log:
+            self._log.write(b'T' + s_key + p_key + t_key)
+            self._log_records += 1
+
+
+    def after_node_remove(self, node_id):
+        super().after_node_remove(node_id)
+        if self._log:
+            self._log.write(b'X' + node_id)
+            self._log_records += 1
+
+    def before_edge_remove(self, edge_id):
+        super().before_edge_remove(edge_id)
+        if self._log:
+            # The edge is gone, after removing it
+            head_id, tail_id = self._edges.get(edge_id)
+            self._log.write(b'D' + head_id + tail_id)
+            self._log_records += 1
+
+    def after_triple_remove(self, s_key, p_key, t_key):
+        super().after_triple_remove(s_key, p_key, t_key)
+        if self._log:
+            self._log.write(b'R' + s_key + p_key + t_key)
+            self._log_records += 1
+
+
+class LoggedGraph(AppendLog, Graph):
+    pass
+
+
+class LoggedNeuro(AppendLog, Neuro):
+    pass
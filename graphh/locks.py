@@ -0,0 +1,284 @@
+"""
+Concurrency mode for the graphs: many reader threads, one writer.
+The graph methods are wrapped with a reader / writer lock:
+
+  * the writers (add_*, remove_*, create_*, ...) are exclusive
+  * the readers (iter_*, query_*, get_*, ...) run together, between writes
+
+The results of the readers are copied while holding the lock,
+eg: the generators are consumed into lists, and the adjacency sets are copied,
+so they can't change while they are iterated. This costs some laziness,
+eg: `islice(g.query_thing('p'), 10)` still collects all the things.
+
+The range queries (query_range, top_k) make the range index of their predicate
+on the first use: that's done under the write lock, before the read.
+
+The bulk loaders of graphh.io (the streamed & parallel imports, the log replay)
+take the write lock too, with `write_lock`.
+
+For read-only workloads, `freeze()` is cheaper: the frozen graph never changes,
+so it can be shared by all the threads, without locks.
+"""
+#- rev: v5 -
+#- hash: ITN5W7 -
+
+import threading
+from functools import wraps
+from contextlib import contextmanager, nullcontext
+from .graph import Graph
+from .neuro import Neuro
+from .convention import FsConvention
+
+WRITES = (
+    'from_dict', 'add_node', 'add_edge', 'add_nodes_from', 'add_edges_from', 'add_bi_edge',
+    'remove_edge', 'remove_node', 'add_triple', 'add_triples', 'remove_triple',
+    'create_value_index', 'drop_value_index', 'create_table', 'create_doc', 'create_docs',
+    'update_doc', 'delete_doc', 'enable_cache', 'disable_cache',
+)
+READS = (
+    'freeze', 'to_dict', 'get_node_id', 'get_node', 'has_edge_id', 'get_edge_id', 'has_edge', 'get_edge',
+    'number_of_nodes', 'number_of_edges', 'iter_nodes', 'iter_edges', 'node_list', 'edge_list',
+    'edge_head', 'edge_tail', 'iter_next_nodes', 'iter_prev_nodes', 'out_edges', 'inc_edges',
+    'all_edges', 'out_degree', 'inc_degree', 'all_degree', 'degrees', 'top_k_by_degree', 'degree_histogram',
+    'query_subject', 'query_thing', 'query_sp_t', 'query_pt_s',
+    'cardinality', 'fanout', 'top_k_by_fanout', 'match_keys', 'has_triple', 'query_triple', 'query_patterns',
+    'list_tables', 'list_docs', 'get_doc_id', 'get_doc', 'get_docs', 'query_docs', 'iter_docs', 'count_docs',
+)
+# The readers that make the range index of their predicate, on the first use
+RANGE_READS = ('query_range', 'top_k')
+
+
+class RWLock:
+    """
+    Reader / writer lock. The waiting writers go before the new readers,
+    and the readers waiting for a write go before the next write,
+    so neither a stream of readers, nor a busy writer, can block the others forever.
+    The same thread can take the lock again, eg: a reader calling other readers,
+    or a writer calling readers, but a reader can't become a writer.
+    """
+
+    __slots__ = ('_cond', '_readers', '_writer', '_waiting', '_readers_waiting', '_read_turn', '_local')
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        # The number of reader threads
+        self._readers = 0
+        # The writer thread
+        self._writer = None
+        # The number of waiting writers, and readers
+        self._waiting = 0
+        self._readers_waiting = 0
+        # True after a write, until the waiting readers are in
+        self._read_turn = False
+        # The depth of the read & write locks of each thread
+        self._local = threading.local()
+
+    def _depth(self):
+        local = self._local
+        if not hasattr(local, 'reads'):
+            local.reads = local.writes = 0
+        return local
+
+    def held(self) -> bool:
+        """
+        True if the current thread holds the read, or the write lock
+        """
+        local = self._depth()
+        return bool(local.reads or local.writes)
+
+    def held_write(self) -> bool:
+        """
+        True if the current thread holds the write lock
+        """
+        return bool(self._depth().writes)
+
+    def acquire_read(self):
+        local = self._depth()
+        if local.reads or local.writes:
+            local.reads += 1
+            return
+        with self._cond:
+            if self._writer is not None or (self._waiting and not self._read_turn):
+                self._readers_waiting += 1
+                while self._writer is not None or (self._waiting and not self._read_turn):
+                    self._cond.wait()
+                self._readers_waiting -= 1
+                if not self._readers_waiting:
+                    self._read_turn = False
+            self._readers += 1
+        local.reads = 1
+
+    def release_read(self):
+        local = self._local
+        local.reads -= 1
+        if local.reads or local.writes:
+            return
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        local = self._depth()
+        if local.writes:
+            local.writes += 1
+            return
+        if local.reads:
+            raise RuntimeError('A reader cannot take the write lock')
+        with self._cond:
+            self._waiting += 1
+            while self._writer is not None or self._readers or self._read_turn:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer = threading.get_ident()
+        local.writes = 1
+
+    def release_write(self):
+        local = self._local
+        local.writes -= 1
+        if local.writes:
+            return
+        with self._cond:
+            self._writer = None
+            self._read_turn = self._readers_waiting > 0
+            self._cond.notify_all()
+
+
+def copy_result(result):
+    """
+    A copy of a result, that doesn't depend on the graph anymore
+    """
+    if isinstance(result, (set, frozenset)):
+        return set(result)
+    if hasattr(result, '__next__'):
+        return iter(list(result))
+    return result
+
+
+def write_lock(graph):
+    """
+    The write lock of a thread-safe graph, or a no-op for the other graphs,
+    for the functions that write into the graph, eg: the loaders of graphh.io.
+    """
+    if isinstance(graph, ThreadSafe):
+        return graph.writing()
+    return nullcontext(graph)
+
+
+def reader(func):
+    @wraps(func)
+    def method(self, *args, **kw):
+        lock = self._rwlock
+        if lock.held():
+            # Called by another method, that holds the lock until the result is used
+            return func(self, *args, **kw)
+        lock.acquire_read()
+        try:
+            return copy_result(func(self, *args, **kw))
+        finally:
+            lock.release_read()
+
+    return method
+
+
+def range_reader(func):
+    """
+    A reader that needs the range index of its predicate;
+    a missing index is made first, under the write lock, so the readers never add it.
+    """
+    read = reader(func)
+
+    @wraps(func)
+    def method(self, predicate, *args, **kw):
+        if not self._rwlock.held() and (self._hasher.node(predicate), 'range') not in self._value_indexes:
+            with self.writing():
+                self._range_index(predicate)
+        return read(self, predicate, *args, **kw)
+
+    return method
+
+
+def writer(func):
+    @wraps(func)
+    def method(self, *args, **kw):
+        lock = self._rwlock
+        lock.acquire_write()
+        try:
+            return func(self, *args, **kw)
+        finally:
+            lock.release_write()
+
+    return method
+
+
+class ThreadSafe:
+    """
+    Mixin that makes a graph safe for many reader threads and one writer.
+    It must come before the graph class, eg:
+
+        class SafeNeuro(ThreadSafe, Neuro): pass
+
+    The reader & writer methods of the graph class are wrapped,
+    if the subclass doesn't define them.
+    """
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        for names, wrap in ((READS, reader), (RANGE_READS, range_reader), (WRITES, writer)):
+            for name in names:
+                func = getattr(cls, name, None)
+                if func is not None and name not in cls.__dict__:
+                    setattr(cls, name, wrap(func))
+
+    def __init__(self, *args, **kw):
+        self._rwlock = RWLock()
+        super().__init__(*args, **kw)
+
+    def _freeze_into(self, frozen):
+        super()._freeze_into(frozen)
+        frozen._rwlock = RWLock()
+
+    def _range_index(self, predicate: str):
+        p_key = self._hasher.node(predicate)
+        index = self._value_indexes.get((p_key, 'range'))
+        if index is None and not self._rwlock.held_write():
+            # A range query inside a `reading` block: the index is made only for this query
+            return self._make_range_index(p_key)
+        return super()._range_index(predicate)
+
+    @contextmanager
+    def reading(self):
+        """
+        Hold the read lock for a block of reads, eg:
+
+            with g.reading():
+                for node in g.iter_next_nodes(key): ...
+        """
+        self._rwlock.acquire_read()
+        try:
+            yield self
+        finally:
+            self._rwlock.release_read()
+
+    @contextmanager
+    def writing(self):
+        """
+        Hold the write lock for a block of writes, so the readers see all of them, or none.
+        """
+        self._rwlock.acquire_write()
+        try:
+            yield self
+        finally:
+            self._rwlock.release_write()
+
+
+class SafeGraph(ThreadSafe, Graph):
+    pass
+
+
+class SafeNeuro(ThreadSafe, Neuro):
+    pass
+
+
+class SafeConvention(ThreadSafe, FsConvention):
+    pass
@@ -1,9 +1,15 @@
 
-#- rev: v2 -
-#- hash: VPOTST -
+#- rev: v20 -
+#- hash: TR422W -
 
+from heapq import nlargest
+from operator import itemgetter
+from types import MappingProxyType
 from .graph import Graph
-from .util import hash
+from .partition import PredicateTables
+from .query import query
+from .values import ValueIndex, RangeIndex
+from .util import HashCollision
 from stones import MemoryStore
 
 
@@ -24,19 +30,76 @@ def create_matcher(part: str, where: str):
     return lambda t: part in t
 
 
+def node_hasher(hasher, nodes: dict, memo: dict):
+    """
+    Returns a function that hashes each node value once,
+    and collects the new nodes as key -> value.
+    """
+    node_hash = hasher.node
+    check = hasher.check
+
+    def key_of(data):
+        # The class is part of the key, because 1 == 1.0 == True
+        # but they don't have the same hash
+        mk = (data.__class__, data)
+        key = memo.get(mk)
+        if key is None:
+            key = memo[mk] = node_hash(data)
+            if check and key in nodes and hasher.collides(nodes[key], data):
+                raise HashCollision(f'Node {data!r} has the same key as {nodes[key]!r}')
+            nodes[key] = data
+        return key
+
+    return key_of
+
+
 class Neuro(Graph):
     """
     Neuro[n] engine.
+
+    If `partitioned` is True, each predicate keeps a table of (subject, thing) pairs,
+    instead of the subject -> predicate -> thing edges, so the predicates
+    don't become huge nodes, connected to the whole dataset.
     """
 
-    __slots__ = ('_sp', '_pt')
+    __slots__ = ('_sp', '_pt', '_predicates', '_value_indexes')
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, compact=False, hasher=None, partitioned=False):
+        super().__init__(compact, hasher)
         # subject + predicate -> things
         self._sp = MemoryStore(encoder='noop')
         # predicate + thing -> subjects
         self._pt = MemoryStore(encoder='noop')
+        # predicate -> (subject, thing) tables, only when partitioned;
+        # the S+P and P+T indexes are not used in that case
+        self._predicates = PredicateTables() if partitioned else None
+        # (predicate, "subject" or "thing") -> ValueIndex, for the match queries
+        # (predicate, "range") -> RangeIndex, for the range queries
+        self._value_indexes = {}
+
+
+    def after_triple_add(self, s_key, p_key, t_key):
+        pass
+
+    def after_triples_add(self, triple_keys):
+        for s_key, p_key, t_key in triple_keys:
+            self.after_triple_add(s_key, p_key, t_key)
+
+    def before_triple_remove(self, s_key, p_key, t_key):
+        pass
+
+    def after_triple_remove(self, s_key, p_key, t_key):
+        pass
+
+
+    def _freeze_into(self, frozen):
+        super()._freeze_into(frozen)
+        frozen._sp = MappingProxyType({k: frozenset(v) for k, v in self._sp.items()})
+        frozen._pt = MappingProxyType({k: frozenset(v) for k, v in self._pt.items()})
+        frozen._predicates = None
+        if self._predicates is not None:
+            frozen._predicates = self._predicates.freeze()
+        frozen._value_indexes = {k: v.copy() for k, v in self._value_indexes.items()}
 
 
     def to_dict(self) -> dict:
@@ -47,6 +110,8 @@ class Neuro(Graph):
         out.update({
             'sp': dict(self._sp), 'pt': dict(self._pt)
         })
+        if self._predicates is not None:
+            out['tables'] = {k: list(v) for k, v in self._predicates.items()}
         return out
 
 
@@ -58,6 +123,10 @@ class Neuro(Graph):
         super().from_dict(data)
         self._sp.update(data['sp'])
         self._pt.update(data['pt'])
+        if self._predicates is not None:
+            for p_key, pairs in data.get('tables', {}).items():
+                for s_key, t_key in pairs:
+                    self._predicates.add(s_key, p_key, t_key)
 
 
     def add_triple(self, subject: str, predicate: str, thing: str):
@@ -67,25 +136,274 @@ class Neuro(Graph):
         * RO -> official_name -> Romania
         * RO -> capital -> Bucharest
         * RO -> area_size -> 238391
+        Returns the (subject, predicate, thing) keys.
         """
         # print(f'T :: {subject} -> {predicate} -> {thing}')
         s_key = self.add_node(subject)
         p_key = self.add_node(predicate)
         t_key = self.add_node(thing)
-        self.add_edge(s_key, p_key)
-        self.add_edge(p_key, t_key)
+        if self._predicates is None:
+            self.add_edge(s_key, p_key)
+            self.add_edge(p_key, t_key)
+        self._index_triple(s_key, p_key, t_key)
+        # Execute `after hook`
+        self.after_triple_add(s_key, p_key, t_key)
+        return s_key, p_key, t_key
+
+
+    def _index_triple(self, s_key: bytes, p_key: bytes, t_key: bytes):
+        """
+        Update the S+P and P+T indexes, for existing nodes and edges
+        """
+        if self._value_indexes:
+            self._index_values(((s_key, p_key, t_key),))
+        if self._predicates is not None:
+            self._predicates.add(s_key, p_key, t_key)
+            return
         # Add subject + predicate -> things
-        sp_key = hash(s_key, p_key)
+        sp_key = self._hasher.hash(s_key, p_key)
         sp_set = self._sp.get(sp_key, set())
         sp_set.add(t_key)
         self._sp[sp_key] = sp_set
         # Add predicate + thing -> subjects
-        pt_key = hash(p_key, t_key)
+        pt_key = self._hasher.hash(p_key, t_key)
         pt_set = self._pt.get(pt_key, set())
         pt_set.add(s_key)
         self._pt[pt_key] = pt_set
 
 
+    def add_triples(self, triples) -> int:
+        """
+        Create many (Subject -> Predicate -> Thing) relations, in one pass.
+        Each value is hashed once, and the nodes, edges,
+        subject + predicate and predicate + thing indexes are updated in bulk.
+        Returns the number of triples.
+        """
+        nodes = {}
+        key_of = node_hasher(self._hasher, nodes, {})
+        added = [(key_of(s), key_of(p), key_of(t)) for s, p, t in triples]
+        self._merge_nodes(nodes)
+        self._insert_triples(added)
+        # Execute `after hook`
+        self.after_triples_add(added)
+        return len(added)
+
+
+    def _merge_nodes(self, nodes: dict):
+        """
+        Insert the new nodes, after checking the existing ones for collisions
+        """
+        if self._hasher.check:
+            for key in nodes.keys() & self._nodes.keys():
+                self._check_node(key, nodes[key])
+        self._insert_nodes({k: v for k, v in nodes.items() if k not in self._nodes})
+
+    def _insert_triples(self, triple_keys):
+        """
+        Update the edges and the indexes, for many triples of existing nodes
+        """
+        if self._predicates is not None:
+            if self._value_indexes:
+                self._index_values(triple_keys)
+            for s_key, p_key, t_key in triple_keys:
+                self._predicates.add(s_key, p_key, t_key)
+            return
+        edge_hash = self._hasher.hash
+        edges = {}
+        sp = {}
+        pt = {}
+        # The same pairs are hashed once, eg: the popular things of a predicate
+        sp_keys = {}
+        pt_keys = {}
+        for s_key, p_key, t_key in triple_keys:
+            # The S+P and P+T keys are the same as the edge keys
+            sp_key = sp_keys.get((s_key, p_key))
+            if sp_key is None:
+                sp_key = sp_keys[s_key, p_key] = edge_hash(s_key, p_key)
+            pt_key = pt_keys.get((p_key, t_key))
+            if pt_key is None:
+                pt_key = pt_keys[p_key, t_key] = edge_hash(p_key, t_key)
+            if sp_key not in sp:
+                sp[sp_key] = set()
+                edges[sp_key] = (s_key, p_key)
+            sp[sp_key].add(t_key)
+            if pt_key not in pt:
+                pt[pt_key] = set()
+                edges[pt_key] = (p_key, t_key)
+            pt[pt_key].add(s_key)
+        self._insert_edges({k: v for k, v in edges.items() if k not in self._edges})
+        self._merge_indexes(sp, pt)
+
+    def _merge_indexes(self, sp: dict, pt: dict):
+        """
+        Merge sets of node keys into the S+P and P+T indexes
+        """
+        if self._value_indexes:
+            # The S+P keys are the same as the edge keys
+            edges = self._edges
+            self._index_values((s_key, p_key, t_key) for sp_key, things in sp.items()
+                               for s_key, p_key in (edges[sp_key],) for t_key in things)
+        for index, fresh in ((self._sp, sp), (self._pt, pt)):
+            for key, keys in fresh.items():
+                old = index.get(key)
+                if old:
+                    old.update(keys)
+                else:
+                    index[key] = set(keys)
+
+
+    def _index_values(self, triple_keys):
+        """
+        Add the values of new triples to the value indexes
+        """
+        indexes = self._value_indexes
+        get_node_id = self.get_node_id
+        for s_key, p_key, t_key in triple_keys:
+            index = indexes.get((p_key, 'subject'))
+            if index is not None:
+                index.add(get_node_id(s_key))
+            index = indexes.get((p_key, 'thing'))
+            if index is not None:
+                index.add(get_node_id(t_key))
+            index = indexes.get((p_key, 'range'))
+            if index is not None:
+                index.add(get_node_id(t_key), s_key)
+
+
+    def remove_triple(self, subject: str, predicate: str, thing: str) -> bool:
+        """
+        Remove a (Subject -> Predicate -> Thing) relation.
+        The S->P and P->T edges are removed when no other triple uses them,
+        the nodes are kept.
+        Returns False if the relation doesn't exist.
+        """
+        h = self._hasher
+        return self._remove_triple(h.node(subject), h.node(predicate), h.node(thing))
+
+    def _remove_triple(self, s_key: bytes, p_key: bytes, t_key: bytes) -> bool:
+        if t_key not in self._sp_keys(s_key, p_key):
+            return False
+        if self._compact:
+            raise ValueError('Compact graphs are append-only')
+        # Execute `before hook`
+        self.before_triple_remove(s_key, p_key, t_key)
+        if self._predicates is not None:
+            self._predicates.remove(s_key, p_key, t_key)
+        else:
+            sp_key = self._hasher.hash(s_key, p_key)
+            pt_key = self._hasher.hash(p_key, t_key)
+            self._discard_index(self._sp, sp_key, t_key)
+            self._discard_index(self._pt, pt_key, s_key)
+            # The S+P key of a triple can be the P+T key of another one
+            for key in (sp_key, pt_key):
+                if key not in self._sp and key not in self._pt and key in self._edges:
+                    self._remove_edge(key)
+        if self._value_indexes:
+            self._unindex_values(s_key, p_key, t_key)
+        # Execute `after hook`
+        self.after_triple_remove(s_key, p_key, t_key)
+        return True
+
+    @staticmethod
+    def _discard_index(index, key: bytes, node_id: bytes):
+        keys = index.get(key)
+        keys.discard(node_id)
+        if keys:
+            index[key] = keys
+        else:
+            del index[key]
+
+    def _unindex_values(self, s_key: bytes, p_key: bytes, t_key: bytes):
+        """
+        Remove the values of a removed triple from the value indexes,
+        unless other triples of the predicate still have them
+        """
+        indexes = self._value_indexes
+        index = indexes.get((p_key, 'subject'))
+        if index is not None and not self._sp_keys(s_key, p_key):
+            index.remove(self.get_node_id(s_key))
+        index = indexes.get((p_key, 'thing'))
+        if index is not None and not self._pt_keys(p_key, t_key):
+            index.remove(self.get_node_id(t_key))
+        index = indexes.get((p_key, 'range'))
+        if index is not None:
+            index.remove(self.get_node_id(t_key), s_key)
+
+
+    def remove_node(self, node_id: bytes) -> bool:
+        """
+        Removes a node, all the triples where it's the subject,
+        the predicate or the thing, and all its edges.
+        """
+        if node_id not in self._nodes:
+            return False
+        triples = set(self.match_keys(s_key=node_id))
+        triples.update(self.match_keys(p_key=node_id))
+        triples.update(self.match_keys(t_key=node_id))
+        for s_key, p_key, t_key in triples:
+            self._remove_triple(s_key, p_key, t_key)
+        return super().remove_node(node_id)
+
+
+    def create_value_index(self, predicate: str, side='thing') -> ValueIndex:
+        """
+        Index the string values of the things (or the subjects) of a predicate,
+        for the prefix, suffix and contains matches of `query_thing` (or `query_subject`).
+        The index is kept up to date with the new triples.
+        """
+        if side not in ('subject', 'thing'):
+            raise ValueError(f'Invalid index side: {side}')
+        p_key = self._hasher.node(predicate)
+        keys = self._subject_keys(p_key) if side == 'subject' else self._thing_keys(p_key)
+        index = self._value_indexes[p_key, side] = ValueIndex(map(self.get_node_id, keys))
+        return index
+
+    def drop_value_index(self, predicate: str, side='thing'):
+        self._value_indexes.pop((self._hasher.node(predicate), side), None)
+
+
+    def _range_index(self, predicate: str) -> RangeIndex:
+        """
+        The numbers of a predicate, indexed on the first range query;
+        then, the index is kept up to date with the new triples.
+        """
+        p_key = self._hasher.node(predicate)
+        index = self._value_indexes.get((p_key, 'range'))
+        if index is None:
+            index = self._value_indexes[p_key, 'range'] = self._make_range_index(p_key)
+        return index
+
+    def _make_range_index(self, p_key: bytes) -> RangeIndex:
+        get_node_id = self.get_node_id
+        return RangeIndex((get_node_id(t_key), s_key) for s_key, _, t_key in self.match_keys(p_key=p_key))
+
+    def query_range(self, predicate: str, lo=None, hi=None):
+        """
+        Find the "subjects" with a number between lo and hi (inclusive),
+        connected to a specific predicate, ordered by the number.
+        Missing bounds (None) are open.
+        Returns a generator.
+
+        Examples:
+            g.query_range('area_size', 1000, 5000)
+            g.query_range('latitude', lo=60)
+        """
+        get_node_id = self.get_node_id
+        for _, s_key in self._range_index(predicate).range(lo, hi):
+            yield get_node_id(s_key)
+
+    def top_k(self, predicate: str, k: int, reverse=False) -> list:
+        """
+        Returns the K "subjects" with the smallest numbers for a predicate,
+        or the largest if reverse is True, as a list of (subject, number).
+
+        Examples:
+            g.top_k('area_size', 3, reverse=True) # The 3 largest countries
+        """
+        get_node_id = self.get_node_id
+        return [(get_node_id(s_key), n) for n, s_key in self._range_index(predicate).top(k, reverse)]
+
+
     def query_subject(self, predicate: str, match='', where=''):
         """
         Find "subjects" that match, connected to a specific predicate.
@@ -99,15 +417,18 @@ class Neuro(Graph):
             g.query_subject('loves')) # Who is loving someone
             # ['dad', 'mom']
         """
-        p_key = hash(predicate)
+        p_key = self._hasher.node(predicate)
         if not match:
-            # Just return all subjects
-            for node in self.iter_prev_nodes(p_key):
+            # Just return all subjects; the keys are copied, so the graph can change between the results
+            for node in list(self._subject_keys(p_key)):
                 yield self.get_node_id(node)
+        elif (p_key, 'subject') in self._value_indexes:
+            # Match some subjects, from the index
+            yield from self._value_indexes[p_key, 'subject'].match(match, where)
         else:
             # Match some subjects
             matches = create_matcher(match, where)
-            for node in self.iter_prev_nodes(p_key):
+            for node in list(self._subject_keys(p_key)):
                 t = self.get_node_id(node)
                 if matches(t):
                     yield t
@@ -126,15 +447,18 @@ class Neuro(Graph):
             g.query_thing('loves')) # Who is loved by someone
             # ['boy', 'dad', 'girl', 'mom']
         """
-        p_key = hash(predicate)
+        p_key = self._hasher.node(predicate)
         if not match:
-            # Just return all things
-            for node in self.iter_next_nodes(p_key):
+            # Just return all things; the keys are copied, so the graph can change between the results
+            for node in list(self._thing_keys(p_key)):
                 yield self.get_node_id(node)
+        elif (p_key, 'thing') in self._value_indexes:
+            # Match some things, from the index
+            yield from self._value_indexes[p_key, 'thing'].match(match, where)
         else:
             # Match some things
             matches = create_matcher(match, where)
-            for node in self.iter_next_nodes(p_key):
+            for node in list(self._thing_keys(p_key)):
                 t = self.get_node_id(node)
                 if matches(t):
                     yield t
@@ -149,8 +473,8 @@ class Neuro(Graph):
             g.query_pt_s('UID123', 'continent')
             g.query_pt_s('UID456', 'currency')
         """
-        sp_key = hash(hash(subject), hash(predicate))
-        for n in self._sp.get(sp_key, set()):
+        h = self._hasher
+        for n in list(self._sp_keys(h.node(subject), h.node(predicate))):
             yield self.get_node_id(n)
 
 
@@ -163,48 +487,230 @@ class Neuro(Graph):
             g.query_pt_s('continent', 'Europe')
             g.query_pt_s('currency', 'Euro')
         """
-        pt_key = hash(hash(predicate), hash(thing))
-        for n in self._pt.get(pt_key, set()):
+        h = self._hasher
+        for n in list(self._pt_keys(h.node(predicate), h.node(thing))):
             yield self.get_node_id(n)
 
 
+    def _subject_keys(self, p_key: bytes):
+        """
+        The keys of the subjects of a predicate
+        """
+        if self._predicates is not None:
+            table = self._predicates.get(p_key)
+            return table.subjects.keys() if table else ()
+        return self.iter_prev_nodes(p_key)
+
+    def _thing_keys(self, p_key: bytes):
+        """
+        The keys of the things of a predicate
+        """
+        if self._predicates is not None:
+            table = self._predicates.get(p_key)
+            return table.things.keys() if table else ()
+        return self.iter_next_nodes(p_key)
+
+    def _sp_keys(self, s_key: bytes, p_key: bytes):
+        """
+        The keys of the things of a subject + predicate
+        """
+        if self._predicates is not None:
+            table = self._predicates.get(p_key)
+            return table.subjects.get(s_key, ()) if table else ()
+        return self._sp.get(self._hasher.hash(s_key, p_key)) or ()
+
+    def _pt_keys(self, p_key: bytes, t_key: bytes):
+        """
+        The keys of the subjects of a predicate + thing
+        """
+        if self._predicates is not None:
+            table = self._predicates.get(p_key)
+            return table.things.get(t_key, ()) if table else ()
+        return self._pt.get(self._hasher.hash(p_key, t_key)) or ()
+
+
+    def cardinality(self, predicate: str) -> tuple:
+        """
+        Returns the number of (triples, subjects, things) of a predicate.
+        It's instant for partitioned graphs; otherwise, the subjects are counted.
+        """
+        p_key = self._hasher.node(predicate)
+        if self._predicates is not None:
+            table = self._predicates.get(p_key)
+            if not table:
+                return 0, 0, 0
+            return len(table), len(table.subjects), len(table.things)
+        sizes = self.fanout(predicate)
+        return sum(sizes.values()), len(sizes), len(self.fanout(predicate, reverse=True))
+
+
+    def fanout(self, predicate: str, reverse=False) -> dict:
+        """
+        Count the "things" of each "subject", connected to a predicate.
+        If reverse is True, count the "subjects" of each "thing".
+        Returns a dict of node value -> count.
+
+        Examples:
+            g.fanout('knows') # How many people each one knows
+            g.fanout('knows', reverse=True) # By how many people each one is known
+        """
+        p_key = self._hasher.node(predicate)
+        if self._predicates is not None:
+            table = self._predicates.get(p_key)
+            if not table:
+                return {}
+            index = table.things if reverse else table.subjects
+            return {self.get_node_id(k): len(keys) for k, keys in index.items()}
+        # The S+P and P+T edge keys are the same as the index keys
+        if reverse:
+            edges, index, node_of = self.out_edges(p_key), self._pt, self.edge_tail
+        else:
+            edges, index, node_of = self.inc_edges(p_key), self._sp, self.edge_head
+        counts = {}
+        for edge_id in edges:
+            keys = index.get(edge_id)
+            if keys:
+                counts[self.get_node_id(node_of(edge_id))] = len(keys)
+        return counts
+
+    def top_k_by_fanout(self, predicate: str, k: int, reverse=False) -> list:
+        """
+        Returns the K "subjects" with the most "things" for a predicate,
+        as a list of (node value, count), largest first.
+        If reverse is True, the K "things" with the most "subjects".
+        """
+        return nlargest(k, self.fanout(predicate, reverse).items(), key=itemgetter(1))
+
+
+    def _subject_predicates(self, s_key: bytes):
+        """
+        The keys of the predicates of a subject
+        """
+        if self._predicates is not None:
+            return self._predicates.subject_preds.get(s_key, ())
+        # The next nodes of a subject are its predicates;
+        # if it's also a predicate, its things are filtered by the S+P index
+        return self.iter_next_nodes(s_key)
+
+    def _thing_predicates(self, t_key: bytes):
+        """
+        The keys of the predicates of a thing
+        """
+        if self._predicates is not None:
+            return self._predicates.thing_preds.get(t_key, ())
+        return self.iter_prev_nodes(t_key)
+
+
+    def match_keys(self, s_key=None, p_key=None, t_key=None):
+        """
+        Find the triples that match, as (subject, predicate, thing) keys.
+        The missing keys (None) match anything.
+        Every combination is answered from the indexes:
+        * S P ?, S P T -- subject + predicate -> things
+        * ? P T -- predicate + thing -> subjects
+        * ? P ? -- predicate -> things -> subjects
+        * S ? ?, S ? T -- subject -> predicates -> things
+        * ? ? T -- thing -> predicates -> subjects
+        """
+        if p_key is not None:
+            return self._match_predicate(s_key, p_key, t_key)
+        if s_key is not None:
+            return self._match_subject(s_key, t_key)
+        if t_key is not None:
+            return self._match_thing(t_key)
+        return self._match_all()
+
+    def _match_predicate(self, s_key, p_key, t_key):
+        if s_key is not None:
+            things = self._sp_keys(s_key, p_key)
+            if t_key is None:
+                for t in things:
+                    yield s_key, p_key, t
+            elif t_key in things:
+                yield s_key, p_key, t_key
+        elif t_key is not None:
+            for s in self._pt_keys(p_key, t_key):
+                yield s, p_key, t_key
+        else:
+            for t in self._thing_keys(p_key):
+                for s in self._pt_keys(p_key, t):
+                    yield s, p_key, t
+
+    def _match_subject(self, s_key, t_key):
+        for p in self._subject_predicates(s_key):
+            things = self._sp_keys(s_key, p)
+            if t_key is None:
+                for t in things:
+                    yield s_key, p, t
+            elif t_key in things:
+                yield s_key, p, t_key
+
+    def _match_thing(self, t_key):
+        for p in self._thing_predicates(t_key):
+            for s in self._pt_keys(p, t_key):
+                yield s, p, t_key
+
+    def _match_all(self):
+        if self._predicates is not None:
+            yield from self._predicates
+            return
+        # The S+P keys are the same as the edge keys
+        for sp_key in self._sp:
+            s, p = self._edges[sp_key]
+            for t in self._sp.get(sp_key) or ():
+                yield s, p, t
+
+
+    def has_triple(self, subject: str, predicate: str, thing: str) -> bool:
+        """
+        Returns True if the (Subject -> Predicate -> Thing) relation exists.
+        """
+        h = self._hasher
+        return h.node(thing) in self._sp_keys(h.node(subject), h.node(predicate))
+
+
     def query_triple(self, subject: str, predicate: str, thing: str):
         """
-        Query for "subject", or "thing".
-        The predicate must be specified.
+        Query the triples, with "?" for the unknown parts.
         This performs exact matches.
-        """
-        # Must specify something useful for the query
-        if (subject, predicate, thing) == ('?', '?', '?'):
-            return False
-        # Predicates cannot be queried
-        if predicate == '?':
-            return False
+        Returns a generator with the values of the unknown parts:
+        a single value for one "?", or a tuple for more.
 
+        Examples:
+            g.query_triple('mom', 'loves', '?') # 'dad', 'girl'
+            g.query_triple('mom', '?', '?') # ('loves', 'dad'), ('loves', 'girl')
+            g.query_triple('?', '?', 'mom') # ('dad', 'loves'), ('girl', 'needs')
+            g.query_triple('mom', 'loves', 'dad') # ()
+        """
         # S+P=T query
-        if subject != '?' and thing == '?':
+        if subject != '?' and predicate != '?' and thing == '?':
             return self.query_sp_t(subject, predicate)
-
         # P+T=S query
-        if thing != '?' and subject == '?':
+        if subject == '?' and predicate != '?' and thing != '?':
             return self.query_pt_s(predicate, thing)
 
-        # ELSE ???
-
-        # s_key = hash(subject)
-        # p_key = hash(predicate)
-        # t_key = hash(thing)
-
-        # for (sk0y, pk0y, tk0y) in self._triples.values():
-        #     if predicate != '?' and p_key != pk0y:
-        #         continue
-        #     if subject != '?' and s_key != sk0y:
-        #         continue
-        #     if thing != '?' and t_key != tk0y:
-        #         continue
-        #     yield (
-        #         self.get_node_id(sk0y), self.get_node_id(pk0y), self.get_node_id(tk0y)
-        #     )
+        node = self._hasher.node
+        parts = (subject, predicate, thing)
+        keys = [None if x == '?' else node(x) for x in parts]
+        unknown = [i for i, x in enumerate(parts) if x == '?']
+        get_node_id = self.get_node_id
+        if len(unknown) == 1:
+            pos = unknown[0]
+            return (get_node_id(triple[pos]) for triple in self.match_keys(*keys))
+        return (tuple(get_node_id(triple[i]) for i in unknown) for triple in self.match_keys(*keys))
+
+
+    def query_patterns(self, patterns):
+        """
+        Find the values of the variables, that match all the triple patterns.
+        The variables start with "?"; a single "?" matches anything.
+        Returns a generator of dicts, see `query.py`.
+
+        Examples:
+            g.query_patterns([('?who', 'loves', 'mom'), ('?who', 'needs', '?')])
+            # {'who': 'dad'}
+        """
+        return query(self, patterns)
 
 
 # Eof()
@@ -0,0 +1,167 @@
+"""
+Predicate-partitioned storage for Neuro.
+Each predicate has its own table of (subject, thing) pairs,
+instead of edges from all the subjects to the predicate node,
+and from the predicate node to all the things.
+"""
+#- rev: v3 -
+#- hash: FK7CHE -
+
+from types import MappingProxyType
+
+
+class PredicateTable:
+    """
+    The (subject, thing) key pairs of one predicate.
+    Both columns are hashed:
+    subject key -> thing keys, and thing key -> subject keys.
+    """
+
+    __slots__ = ('subjects', 'things', 'size')
+
+    def __init__(self, subjects=None, things=None, size=0):
+        self.subjects = {} if subjects is None else subjects
+        self.things = {} if things is None else things
+        # The number of pairs
+        self.size = size
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(subjects:{len(self.subjects)}, things:{len(self.things)}, pairs:{self.size})'
+
+    def add(self, s_key: bytes, t_key: bytes) -> bool:
+        """
+        Add a pair; returns False if it existed already.
+        """
+        things = self.subjects.get(s_key)
+        if things is None:
+            things = self.subjects[s_key] = set()
+        elif t_key in things:
+            return False
+        things.add(t_key)
+        subjects = self.things.get(t_key)
+        if subjects is None:
+            self.things[t_key] = {s_key}
+        else:
+            subjects.add(s_key)
+        self.size += 1
+        return True
+
+    def remove(self, s_key: bytes, t_key: bytes) -> bool:
+        """
+        Remove a pair; returns False if it didn't exist.
+        """
+        things = self.subjects.get(s_key)
+        if things is None or t_key not in things:
+            return False
+        things.discard(t_key)
+        if not things:
+            del self.subjects[s_key]
+        subjects = self.things[t_key]
+        subjects.discard(s_key)
+        if not subjects:
+            del self.things[t_key]
+        self.size -= 1
+        return True
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        """
+        Iterates over the (subject key, thing key) pairs
+        """
+        for s_key, things in self.subjects.items():
+            for t_key in things:
+                yield s_key, t_key
+
+    def freeze(self):
+        """
+        Returns a read-only copy of the table.
+        """
+        return PredicateTable(
+            MappingProxyType({k: frozenset(v) for k, v in self.subjects.items()}),
+            MappingProxyType({k: frozenset(v) for k, v in self.things.items()}),
+            self.size)
+
+
+class PredicateTables:
+    """
+    All the predicate tables of a graph, plus the predicates of each
+    subject and thing, so the triples can be found from any side:
+    subject -> predicates -> things, thing -> predicates -> subjects.
+    """
+
+    __slots__ = ('tables', 'subject_preds', 'thing_preds')
+
+    def __init__(self, tables=None, subject_preds=None, thing_preds=None):
+        # predicate key -> PredicateTable
+        self.tables = {} if tables is None else tables
+        # subject key -> predicate keys
+        self.subject_preds = {} if subject_preds is None else subject_preds
+        # thing key -> predicate keys
+        self.thing_preds = {} if thing_preds is None else thing_preds
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(predicates:{len(self.tables)})'
+
+    def add(self, s_key: bytes, p_key: bytes, t_key: bytes) -> bool:
+        """
+        Add a triple; returns False if it existed already.
+        """
+        table = self.tables.get(p_key)
+        if table is None:
+            table = self.tables[p_key] = PredicateTable()
+        if not table.add(s_key, t_key):
+            return False
+        self.subject_preds.setdefault(s_key, set()).add(p_key)
+        self.thing_preds.setdefault(t_key, set()).add(p_key)
+        return True
+
+    def remove(self, s_key: bytes, p_key: bytes, t_key: bytes) -> bool:
+        """
+        Remove a triple; returns False if it didn't exist.
+        The empty tables are dropped.
+        """
+        table = self.tables.get(p_key)
+        if table is None or not table.remove(s_key, t_key):
+            return False
+        if s_key not in table.subjects:
+            self._discard(self.subject_preds, s_key, p_key)
+        if t_key not in table.things:
+            self._discard(self.thing_preds, t_key, p_key)
+        if not table.size:
+            del self.tables[p_key]
+        return True
+
+    @staticmethod
+    def _discard(preds: dict, key: bytes, p_key: bytes):
+        keys = preds[key]
+        keys.discard(p_key)
+        if not keys:
+            del preds[key]
+
+    def get(self, p_key: bytes, default=None):
+        return self.tables.get(p_key, default)
+
+    def items(self):
+        return self.tables.items()
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def __iter__(self):
+        """
+        Iterates over the (subject key, predicate key, thing key) triples
+        """
+        for p_key, table in self.tables.items():
+            for s_key, t_key in table:
+                yield s_key, p_key, t_key
+
+    def freeze(self):
+        """
+        Returns a read-only copy of the tables.
+        """
+        return PredicateTables(
+            MappingProxyType({k: v.freeze() for k, v in self.tables.items()}),
+            MappingProxyType({k: frozenset(v) for k, v in self.subject_preds.items()}),
+            MappingProxyType({k: frozenset(v) for k, v in self.thing_preds.items()}))
@@ -0,0 +1,201 @@
+"""
+Basic graph pattern (BGP) queries, over Neuro.
+A pattern is a (subject, predicate, thing) triple, where each part is a value,
+or a variable: a string starting with "?". A single "?" matches anything,
+but it's not returned.
+The patterns are joined on their common variables, eg:
+
+    g.query_patterns([
+        ('?country', 'region', 'Europe'),
+        ('?country', 'currency', 'EUR'),
+        ('?country', 'capital', '?city')])
+    # {'country': 'DE', 'city': 'Berlin'}, {'country': 'FR', 'city': 'Paris'}, ...
+
+The patterns with a single variable, and two values, are posting lists:
+the S+P things, or the P+T subjects. The posting lists of the same variable
+are intersected first, from the smallest one (a hash join on the key sets),
+so in the example, only the smallest of the "Europe" and "EUR" postings is scanned.
+The other patterns are joined one binding at a time, from the indexes,
+and their new keys are checked against the intersected sets.
+"""
+#- rev: v2 -
+#- hash: 34SOKP -
+
+# Not a real number of triples, just larger than any estimate
+UNKNOWN = float('inf')
+
+
+def compile_patterns(graph, patterns) -> list:
+    """
+    Convert the patterns to key triples; the values are hashed,
+    the variables are kept as strings, and each "?" gets a unique name.
+    """
+    node = graph._hasher.node
+    compiled = []
+    for pattern in patterns:
+        if len(pattern) != 3:
+            raise ValueError(f'Invalid pattern: {pattern!r}')
+        parts = []
+        for part in pattern:
+            if part == '?':
+                part = f'?#{len(compiled)}.{len(parts)}'
+            elif not (isinstance(part, str) and part.startswith('?')):
+                part = node(part)
+            parts.append(part)
+        compiled.append(tuple(parts))
+    return compiled
+
+
+def estimate(graph, s_key, p_key, t_key) -> float:
+    """
+    Estimate the number of triples that match, from the size of the indexes.
+    The missing keys (None) match anything.
+    """
+    if p_key is not None:
+        if s_key is not None:
+            return 1 if t_key is not None else len(graph._sp_keys(s_key, p_key))
+        if t_key is not None:
+            return len(graph._pt_keys(p_key, t_key))
+        if graph._predicates is not None:
+            return len(graph._predicates.get(p_key) or ())
+        # The number of subjects, it's at least one triple each
+        return graph.inc_degree(p_key)
+    if graph._predicates is not None:
+        if s_key is not None:
+            return len(graph._predicates.subject_preds.get(s_key, ()))
+        if t_key is not None:
+            return len(graph._predicates.thing_preds.get(t_key, ()))
+    elif s_key is not None:
+        return graph.out_degree(s_key)
+    elif t_key is not None:
+        return graph.inc_degree(t_key)
+    return UNKNOWN
+
+
+def posting(graph, pattern: tuple):
+    """
+    The posting list of a pattern with one named variable and two values:
+    the things of S+P, or the subjects of P+T. Returns None for the other patterns.
+    """
+    s, p, t = pattern
+    if isinstance(p, str):
+        return None
+    if isinstance(s, str) and not isinstance(t, str) and not s.startswith('?#'):
+        return graph._pt_keys(p, t)
+    if isinstance(t, str) and not isinstance(s, str) and not t.startswith('?#'):
+        return graph._sp_keys(s, p)
+    return None
+
+
+def intersect(graph, patterns: list):
+    """
+    Intersect the posting lists of each variable, from the smallest one.
+    Returns (the other patterns, variable -> set of keys).
+    """
+    rest = []
+    postings = {}
+    for pattern in patterns:
+        keys = posting(graph, pattern)
+        if keys is None:
+            rest.append(pattern)
+        else:
+            var = pattern[0] if isinstance(pattern[0], str) else pattern[2]
+            postings.setdefault(var, []).append(keys)
+    candidates = {}
+    for var, sets in postings.items():
+        sets.sort(key=len)
+        found = set(sets[0])
+        for keys in sets[1:]:
+            if not found:
+                break
+            found.intersection_update(keys)
+        candidates[var] = found
+    return rest, candidates
+
+
+def plan(graph, patterns: list, candidates=None) -> list:
+    """
+    Order the compiled patterns, so each join is as small as possible.
+    The next pattern is the one with the most known parts
+    (values, or variables bound by the previous patterns),
+    and then, with the smallest estimated size.
+    The variables with candidate keys are steps too, as big as their sets;
+    they are dropped when a pattern binds them first.
+    """
+    candidates = candidates or {}
+    left = list(patterns) + list(candidates)
+    bound = set()
+    order = []
+    while left:
+        def cost(item):
+            if isinstance(item, str):
+                return -2, len(candidates[item])
+            known = sum(1 for x in item if not isinstance(x, str) or x in bound)
+            keys = [None if isinstance(x, str) else x for x in item]
+            return -known, estimate(graph, *keys)
+
+        best = min(left, key=cost)
+        order.append(best)
+        if isinstance(best, str):
+            bound.add(best)
+        else:
+            bound.update(x for x in best if isinstance(x, str))
+        left = [x for x in left if x is not best and not (isinstance(x, str) and x in bound)]
+    return order
+
+
+def join(graph, order: list, candidates=None, binding=None, step=0):
+    """
+    Join the ordered steps, one binding at a time.
+    A variable step binds each of its candidate keys;
+    a pattern step is looked up in the indexes, with the keys bound so far,
+    and its new keys must be in the candidate sets.
+    Yields dicts of variable -> node key.
+    """
+    if candidates is None:
+        candidates = {}
+    if binding is None:
+        binding = {}
+    if step == len(order):
+        yield binding
+        return
+    pattern = order[step]
+    if isinstance(pattern, str):
+        for key in candidates[pattern]:
+            yield from join(graph, order, candidates, {**binding, pattern: key}, step + 1)
+        return
+    keys = [binding.get(x) if isinstance(x, str) else x for x in pattern]
+    for triple in graph.match_keys(*keys):
+        new = binding
+        for part, key in zip(pattern, triple):
+            if not isinstance(part, str):
+                continue
+            old = new.get(part)
+            if old is None:
+                if part in candidates and key not in candidates[part]:
+                    break
+                if new is binding:
+                    new = dict(binding)
+                new[part] = key
+            elif old != key:
+                # The same variable, twice in a pattern
+                break
+        else:
+            yield from join(graph, order, candidates, new, step + 1)
+
+
+def query(graph, patterns):
+    """
+    Find all the bindings of the variables, that match all the patterns.
+    Returns a generator of dicts of variable name (without "?") -> value.
+    """
+    compiled = compile_patterns(graph, patterns)
+    names = {x: x[1:] for pattern in compiled for x in pattern
+             if isinstance(x, str) and not x.startswith('?#')}
+    rest, candidates = intersect(graph, compiled)
+    if not all(candidates.values()):
+        return
+    order = plan(graph, rest, candidates)
+    get_node_id = graph.get_node_id
+    for binding in join(graph, order, candidates):
+        yield {name: get_node_id(binding[var]) for var, name in names.items()}
@@ -0,0 +1,455 @@
+"""
+Hash-partitioned graphs, over many local worker processes.
+Each node is owned by one shard, from the prefix of its key: `shard_of(key, shards)`.
+Each shard is a normal Graph, or Neuro, in its own process, and the router talks to the shards over pipes.
+
+  * the nodes are stored in the shard of their key
+  * the edges are stored in the shard of their head node; the tail node is copied there, if needed
+  * the triples are stored in the shard of their subject, with copies of the predicate and thing nodes
+
+The writes are routed to the owning shards, and the queries are sent to all the shards,
+and the results are merged:
+
+    with ShardedNeuro(shards=4) as g:
+        g.add_triples(triples)
+        list(g.query_thing('region'))
+        list(g.query_pt_s('region', 'Europe'))
+
+The router is not thread-safe; use one router per thread, or a lock.
+"""
+#- rev: v4 -
+#- hash: PZIAQ3 -
+
+from multiprocessing import Pipe, Process
+from .graph import Graph
+from .neuro import Neuro
+from .util import Hasher, chunks
+
+# Triples per message, for the bulk writes
+CHUNK_SIZE = 10_000
+
+
+def shard_of(key: bytes, shards: int) -> int:
+    """
+    The shard that owns a node key
+    """
+    return int.from_bytes(key[:4], 'big') % shards
+
+
+class Shard:
+    """
+    The graph of one shard, in its worker process.
+    The router calls the methods by name.
+    """
+
+    def __init__(self, graph, index: int, shards: int):
+        self.graph = graph
+        self.index = index
+        self.shards = shards
+
+    def _owned(self):
+        index, shards = self.index, self.shards
+        return (k for k in self.graph.iter_nodes(values=False) if shard_of(k, shards) == index)
+
+    def owned_nodes(self) -> list:
+        return list(self._owned())
+
+    def number_of_nodes(self) -> int:
+        return sum(1 for _ in self._owned())
+
+    def number_of_edges(self) -> int:
+        return self.graph.number_of_edges()
+
+    def edge_keys(self) -> list:
+        return list(self.graph.iter_edges(values=False))
+
+    def add_nodes(self, nodes: list) -> list:
+        return self.graph.add_nodes_from(nodes)
+
+    def add_edges(self, edges: list) -> list:
+        """
+        Add (head key, tail key, tail value) edges;
+        the tail nodes from the other shards are copied here first.
+        """
+        g = self.graph
+        g.add_nodes_from([value for head, tail, value in edges if head in g and tail not in g])
+        return g.add_edges_from((head, tail) for head, tail, _ in edges)
+
+    def find_nodes(self, keys: list) -> dict:
+        """
+        The values of the keys found in this shard
+        """
+        g = self.graph
+        return {k: g.get_node_id(k) for k in keys if k in g}
+
+    def has_node(self, key: bytes) -> bool:
+        return key in self.graph
+
+    def get_node_id(self, key: bytes):
+        return self.graph.get_node_id(key)
+
+    def has_edge(self, head: bytes, tail: bytes) -> bool:
+        return self.graph.has_edge(head, tail)
+
+    def next_nodes(self, key: bytes) -> list:
+        return list(self.graph.iter_next_nodes(key))
+
+    def prev_nodes(self, key: bytes) -> list:
+        return list(self.graph.iter_prev_nodes(key))
+
+    def add_triples(self, triples: list) -> int:
+        return self.graph.add_triples(triples)
+
+    def remove_triple(self, subject, predicate, thing) -> bool:
+        return self.graph.remove_triple(subject, predicate, thing)
+
+    def has_triple(self, subject, predicate, thing) -> bool:
+        return self.graph.has_triple(subject, predicate, thing)
+
+    def create_value_index(self, predicate, side):
+        self.graph.create_value_index(predicate, side)
+
+    def query(self, method: str, args: tuple) -> list:
+        if method not in ('query_subject', 'query_thing', 'query_sp_t', 'query_pt_s'):
+            raise ValueError(f'Invalid query: {method}')
+        return list(getattr(self.graph, method)(*args))
+
+
+def serve(conn, graph_class, options: dict, index: int, shards: int):
+    """
+    The loop of a worker process: receive (method, args), send back (True, result), or (False, error).
+    It stops on None, or when the router is gone.
+    """
+    shard = Shard(graph_class(**options), index, shards)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        method, args = msg
+        try:
+            conn.send((True, getattr(shard, method)(*args)))
+        except Exception as err:
+            conn.send((False, err))
+    conn.close()
+
+
+class ShardedGraph:
+    """
+    A directed graph, partitioned by node key over many worker processes.
+    The node and edge keys are the same as in a normal Graph, with the same hasher.
+    The options are passed to the graph of each shard, eg: compact=True
+    """
+
+    graph_class = Graph
+
+    def __init__(self, shards=4, hasher=None, **options):
+        if shards < 1:
+            raise ValueError(f'Invalid number of shards: {shards}')
+        self._hasher = hasher or Hasher()
+        self.shards = shards
+        self._conns = []
+        self._procs = []
+        options['hasher'] = self._hasher
+        for index in range(shards):
+            conn, child = Pipe()
+            proc = Process(target=serve, args=(child, self.graph_class, options, index, shards), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(conn)
+            self._procs.append(proc)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(shards:{self.shards})'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker processes; the graph is lost.
+        """
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except OSError: # pragma: no cover
+                pass
+        for proc in self._procs:
+            proc.join()
+        for conn in self._conns:
+            conn.close()
+        self._conns = []
+        self._procs = []
+
+
+    def shard_of(self, key: bytes) -> int:
+        return shard_of(key, self.shards)
+
+    def _call(self, index: int, method: str, *args):
+        return self._gather({index: (method, args)})[index]
+
+    def _fan(self, method: str, *args) -> list:
+        """
+        Call the same method on all the shards, in parallel
+        """
+        found = self._gather({i: (method, args) for i in range(self.shards)})
+        return [found[i] for i in range(self.shards)]
+
+    def _gather(self, calls: dict) -> dict:
+        """
+        Send all the calls first, so the shards work in parallel, then collect the results.
+        All the replies are read, even after an error, to keep the pipes in sync.
+        """
+        if not self._conns:
+            raise ValueError('The sharded graph is closed')
+        for index, msg in calls.items():
+            self._conns[index].send(msg)
+        results = {}
+        error = None
+        for index in calls:
+            ok, result = self._conns[index].recv()
+            if ok:
+                results[index] = result
+            elif error is None:
+                error = result
+        if error is not None:
+            raise error
+        return results
+
+
+    def add_node(self, node_data):
+        """
+        Adds a new node, to the shard of its key.
+        """
+        return self.add_nodes_from((node_data,))[0]
+
+    def add_nodes_from(self, nodes) -> list:
+        """
+        Adds many nodes; each shard gets one message.
+        Returns the list of node keys, in the same order as the nodes.
+        """
+        nodes = list(nodes)
+        node_hash = self._hasher.node
+        keys = [node_hash(n) for n in nodes]
+        groups = {}
+        for key, node_data in zip(keys, nodes):
+            groups.setdefault(self.shard_of(key), []).append(node_data)
+        self._gather({i: ('add_nodes', (values,)) for i, values in groups.items()})
+        return keys
+
+    def add_edge(self, head_id: bytes, tail_id: bytes):
+        """
+        Adds a directed edge going from head_id to tail_id,
+        to the shard of the head node.
+        """
+        return self.add_edges_from(((head_id, tail_id),))[0]
+
+    def add_edges_from(self, edges) -> list:
+        """
+        Adds many directed edges, from (head_id, tail_id) pairs.
+        The tail values are fetched from their shards, and the edges are sent to the shards of the heads.
+        Returns the list of edge keys; the pairs with missing nodes are False.
+        """
+        edges = list(edges)
+        tails = {}
+        for _, tail in edges:
+            tails.setdefault(self.shard_of(tail), set()).add(tail)
+        values = {}
+        for found in self._gather({i: ('find_nodes', (list(keys),)) for i, keys in tails.items()}).values():
+            values.update(found)
+        keys = [False] * len(edges)
+        groups = {}
+        for pos, (head, tail) in enumerate(edges):
+            if tail in values:
+                groups.setdefault(self.shard_of(head), []).append(pos)
+        calls = {i: ('add_edges', ([(*edges[p], values[edges[p][1]]) for p in group],))
+                 for i, group in groups.items()}
+        for index, added in self._gather(calls).items():
+            for pos, key in zip(groups[index], added):
+                keys[pos] = key
+        return keys
+
+
+    def __contains__(self, node_id: bytes) -> bool:
+        return self._call(self.shard_of(node_id), 'has_node', node_id)
+
+    def get_node_id(self, node_id: bytes):
+        """
+        Returns the node data, from the shard of the node
+        """
+        return self._call(self.shard_of(node_id), 'get_node_id', node_id)
+
+    def get_node(self, node_data: object) -> bytes:
+        """
+        Returns the node ID, if the node exists
+        """
+        key = self._hasher.node(node_data)
+        return key if key in self else False
+
+    def has_edge(self, head_id: bytes, tail_id: bytes) -> bool:
+        return self._call(self.shard_of(head_id), 'has_edge', head_id, tail_id)
+
+    def number_of_nodes(self) -> int:
+        """
+        Returns the number of nodes; the copies of the nodes from other shards are not counted.
+        """
+        return sum(self._fan('number_of_nodes'))
+
+    def shard_sizes(self) -> list:
+        """
+        The number of nodes owned by each shard
+        """
+        return self._fan('number_of_nodes')
+
+    def number_of_edges(self) -> int:
+        """
+        Returns the number of edges; each edge is stored once, in the shard of its head.
+        """
+        return sum(self._fan('number_of_edges'))
+
+    def node_list(self) -> list:
+        return [key for keys in self._fan('owned_nodes') for key in keys]
+
+    def iter_next_nodes(self, node_id: bytes):
+        """
+        Iterates over the tails of the outgoing edges, from the shard of the node
+        """
+        yield from self._call(self.shard_of(node_id), 'next_nodes', node_id)
+
+    def iter_prev_nodes(self, node_id: bytes):
+        """
+        Iterates over the heads of the incoming edges, from all the shards
+        """
+        yield from merge(self._fan('prev_nodes', node_id))
+
+    def out_degree(self, node_id: bytes) -> int:
+        return sum(1 for _ in self.iter_next_nodes(node_id))
+
+    def inc_degree(self, node_id: bytes) -> int:
+        return sum(1 for _ in self.iter_prev_nodes(node_id))
+
+
+class ShardedNeuro(ShardedGraph):
+    """
+    A Neuro graph, partitioned by subject over many worker processes.
+    All the triples of a subject are in the same shard, so the subject queries
+    use one shard, and the predicate queries use all the shards.
+    The options are passed to the graph of each shard, eg: partitioned=True
+    """
+
+    graph_class = Neuro
+
+    def add_triple(self, subject: str, predicate: str, thing: str):
+        """
+        Create a (Subject -> Predicate -> Thing) relation, in the shard of the subject;
+        the predicate and thing nodes are also added to their own shards.
+        Returns the (subject, predicate, thing) keys.
+        """
+        self.add_triples(((subject, predicate, thing),))
+        h = self._hasher.node
+        return h(subject), h(predicate), h(thing)
+
+    def add_triples(self, triples) -> int:
+        """
+        Create many relations; each shard gets one message, per chunk of triples.
+        Returns the number of triples.
+        """
+        node_hash = self._hasher.node
+        count = 0
+        for chunk in chunks(triples, CHUNK_SIZE):
+            keys = {}
+            groups = {}
+            nodes = {}
+            for s, p, t in chunk:
+                for value in (s, p, t):
+                    # 1, 1.0 and True are equal, but they are different nodes
+                    memo = (value.__class__, value)
+                    if memo not in keys:
+                        key = keys[memo] = node_hash(value)
+                        nodes.setdefault(self.shard_of(key), {})[key] = value
+                groups.setdefault(self.shard_of(keys[s.__class__, s]), []).append((s, p, t))
+            # The nodes first, so they are in their shards before the triples
+            self._gather({i: ('add_nodes', (list(values.values()),)) for i, values in nodes.items()})
+            count += sum(self._gather({i: ('add_triples', (group,)) for i, group in groups.items()}).values())
+        return count
+
+    def remove_triple(self, subject: str, predicate: str, thing: str) -> bool:
+        """
+        Remove a relation; the nodes are kept.
+        """
+        return self._call(self.shard_of(self._hasher.node(subject)), 'remove_triple', subject, predicate, thing)
+
+    def has_triple(self, subject: str, predicate: str, thing: str) -> bool:
+        return self._call(self.shard_of(self._hasher.node(subject)), 'has_triple', subject, predicate, thing)
+
+    def create_value_index(self, predicate: str, side='thing'):
+        """
+        Create the value index in all the shards
+        """
+        self._fan('create_value_index', predicate, side)
+
+    def has_edge(self, head_id: bytes, tail_id: bytes) -> bool:
+        # The predicate -> thing edges are in the shards of the subjects
+        return any(self._fan('has_edge', head_id, tail_id))
+
+    def number_of_edges(self) -> int:
+        # The same predicate -> thing edge can be in many shards
+        return len(set().union(*self._fan('edge_keys')))
+
+    def iter_next_nodes(self, node_id: bytes):
+        yield from merge(self._fan('next_nodes', node_id))
+
+    def query_subject(self, predicate: str, match='', where=''):
+        """
+        Find "subjects" that match, connected to a specific predicate.
+        Each subject is in one shard, so the results are just chained.
+        """
+        for found in self._fan('query', 'query_subject', (predicate, match, where)):
+            yield from found
+
+    def query_thing(self, predicate: str, match='', where=''):
+        """
+        Find "things" that match, connected to a specific predicate.
+        The same thing can be found in many shards, so it's yielded once.
+        """
+        yield from merge(self._fan('query', 'query_thing', (predicate, match, where)))
+
+    def query_sp_t(self, subject: str, predicate: str):
+        """
+        Find all "things" of a subject and predicate, from the shard of the subject.
+        """
+        yield from self._call(self.shard_of(self._hasher.node(subject)), 'query', 'query_sp_t', (subject, predicate))
+
+    def query_pt_s(self, predicate: str, thing: str):
+        """
+        Find all "subjects" of a predicate and thing, from all the shards.
+        """
+        for found in self._fan('query', 'query_pt_s', (predicate, thing)):
+            yield from found
+
+
+def typed(item):
+    """
+    The key of a result, for the duplicates: 1, 1.0 and True are equal, but they are different nodes
+    """
+    if item.__class__ is tuple:
+        return tuple((x.__class__, x) for x in item)
+    return item.__class__, item
+
+
+def merge(results: list):
+    """
+    Chain the results of the shards, without duplicates
+    """
+    seen = set()
+    for found in results:
+        for item in found:
+            key = typed(item)
+            if key not in seen:
+                seen.add(key)
+                yield item
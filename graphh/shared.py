@@ -0,0 +1,265 @@
+"""
+Parallel analytics over a frozen graph, exported once to shared memory.
+The CSR arrays of the frozen graph are copied in one shared memory block;
+the worker processes attach to the block by name, instead of pickling the graph,
+and each task only gets a range of nodes, or edges.
+
+    with SharedGraph(g, workers=8) as sg:
+        sg.degrees('out')
+        sg.reach_counts(sources)
+        sg.predicate_stats() # only Neuro
+
+The results use the dense ints of the frozen graph, in the order of `graph.node_list()`,
+and they are mapped back to keys, or values, in the main process.
+"""
+#- rev: v2 -
+#- hash: ADY32M -
+
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .compact import INT_TYPE, FrozenAdjacency
+from .neuro import Neuro
+
+try:
+    import numpy as np
+except ImportError: # pragma: no cover
+    np = None
+
+# Tasks per worker, so the slow ranges don't keep the others waiting
+TASKS_PER_WORKER = 4
+
+# The shared blocks attached by this process: name -> (block, sections)
+_attached = {}
+
+
+def _layout(sizes: dict) -> dict:
+    """
+    Returns the sections as: name -> (offset, number of ints)
+    Every section starts at a multiple of 8 bytes.
+    """
+    layout = {}
+    offset = 0
+    for name, size in sizes.items():
+        offset += -offset % 8
+        layout[name] = (offset, size)
+        offset += size * 4
+    return layout
+
+
+def _attach(spec: tuple) -> dict:
+    """
+    The sections of a shared block, as memoryviews of ints.
+    Each worker attaches once, on its first task.
+    """
+    name, layout = spec
+    found = _attached.get(name)
+    if found is None:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            # The main process owns the block; the workers must not unlink it
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, 'shared_memory')
+        except Exception: # pragma: no cover
+            pass
+        mv = block.buf
+        sections = {k: mv[off:off + size * 4].cast(INT_TYPE) for k, (off, size) in layout.items()}
+        found = _attached[name] = (block, sections)
+    return found[1]
+
+
+def _ranges(size: int, parts: int):
+    step = max(1, -(-size // parts))
+    return [(lo, min(lo + step, size)) for lo in range(0, size, step)]
+
+
+def degree_task(spec: tuple, mode: str, lo: int, hi: int):
+    """
+    Write the degrees of the nodes lo...hi, in the shared "degrees" section
+    """
+    s = _attach(spec)
+    out = s['degrees']
+    offsets = [s['out_off']] if mode == 'out' else [s['inc_off']] if mode == 'inc' else [s['inc_off'], s['out_off']]
+    if np is not None:
+        total = np.zeros(hi - lo, dtype=INT_TYPE)
+        for off in offsets:
+            col = np.frombuffer(off, dtype=INT_TYPE)
+            total += col[lo + 1:hi + 1] - col[lo:hi]
+        np.frombuffer(out, dtype=INT_TYPE)[lo:hi] = total
+        return
+    for i in range(lo, hi):
+        out[i] = sum(off[i + 1] - off[i] for off in offsets)
+
+
+def reach_task(spec: tuple, sources: list, reverse: bool, max_depth) -> list:
+    """
+    Count the nodes reachable from each source, with a BFS on the shared CSR
+    """
+    s = _attach(spec)
+    offsets, neighbors = (s['inc_off'], s['inc_nodes']) if reverse else (s['out_off'], s['out_nodes'])
+    seen = bytearray(len(offsets) - 1)
+    counts = []
+    for source in sources:
+        visited = [source]
+        seen[source] = 1
+        frontier = [source]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            fresh = []
+            for node in frontier:
+                for n in neighbors[offsets[node]:offsets[node + 1]]:
+                    if not seen[n]:
+                        seen[n] = 1
+                        fresh.append(n)
+            visited.extend(fresh)
+            frontier = fresh
+            depth += 1
+        counts.append(len(visited) - 1)
+        # Reset only the visited nodes, not the whole array
+        for n in visited:
+            seen[n] = 0
+    return counts
+
+
+def predicate_task(spec: tuple, lo: int, hi: int) -> list:
+    """
+    The (predicate, triples, subjects, things) of the nodes lo...hi;
+    the nodes without triples are skipped
+    """
+    s = _attach(spec)
+    inc_off, inc_edges = s['inc_off'], s['inc_edges']
+    out_off, out_edges = s['out_off'], s['out_edges']
+    sp_size, pt_size = s['sp_size'], s['pt_size']
+    stats = []
+    for p in range(lo, hi):
+        triples = things = 0
+        for e in out_edges[out_off[p]:out_off[p + 1]]:
+            if pt_size[e]:
+                triples += pt_size[e]
+                things += 1
+        if not triples:
+            continue
+        subjects = sum(1 for e in inc_edges[inc_off[p]:inc_off[p + 1]] if sp_size[e])
+        stats.append((p, triples, subjects, things))
+    return stats
+
+
+class SharedGraph:
+    """
+    A frozen graph in shared memory, and a process pool to analyze it.
+    Close it, or use it as a context manager, to free the shared memory.
+    """
+
+    def __init__(self, graph, workers=None):
+        frozen = graph if isinstance(graph._adjacency, FrozenAdjacency) else graph.freeze()
+        self.workers = workers or os.cpu_count() or 1
+        self._neuro = isinstance(graph, Neuro)
+        self._tables = frozen._predicates if self._neuro else None
+        self._keys = frozen._nodes._keys
+        self._values = frozen._nodes._values
+        inc_off, inc_edges, inc_nodes = frozen._adjacency._inc
+        out_off, out_edges, out_nodes = frozen._adjacency._out
+        data = {
+            'inc_off': inc_off, 'inc_edges': inc_edges, 'inc_nodes': inc_nodes,
+            'out_off': out_off, 'out_edges': out_edges, 'out_nodes': out_nodes,
+        }
+        if self._neuro:
+            # The S+P and P+T keys are the same as the edge keys
+            edge_keys = frozen._edges._keys
+            data['sp_size'] = array(INT_TYPE, (len(frozen._sp.get(k, ())) for k in edge_keys))
+            data['pt_size'] = array(INT_TYPE, (len(frozen._pt.get(k, ())) for k in edge_keys))
+        sizes = {name: len(values) for name, values in data.items()}
+        # The output of the degree tasks
+        sizes['degrees'] = len(self._keys)
+        layout = _layout(sizes)
+        end = max((off + size * 4 for off, size in layout.values()), default=0)
+        self._block = shared_memory.SharedMemory(create=True, size=max(end, 1))
+        mv = self._block.buf
+        self._sections = {k: mv[off:off + size * 4].cast(INT_TYPE) for k, (off, size) in layout.items()}
+        for name, values in data.items():
+            self._sections[name][:] = array(INT_TYPE, values) if not isinstance(values, array) else values
+        self._spec = (self._block.name, layout)
+        # The main process is attached already; the forked workers too
+        _attached[self._block.name] = (self._block, self._sections)
+        self._pool = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(nodes:{len(self._keys)}, workers:{self.workers})'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._block is not None:
+            _attached.pop(self._block.name, None)
+            for mv in self._sections.values():
+                mv.release()
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+    def _map(self, func, tasks) -> list:
+        if self._block is None:
+            raise ValueError('The shared graph is closed')
+        if self.workers == 1:
+            # No pool for a single worker, the main process attaches too
+            return [func(self._spec, *args) for args in tasks]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        futures = [self._pool.submit(func, self._spec, *args) for args in tasks]
+        return [f.result() for f in futures]
+
+    def node_list(self) -> list:
+        return list(self._keys)
+
+    def degrees(self, mode='all') -> array:
+        """
+        Returns the degree of all nodes, as an array,
+        in the same order as the node list.
+        Mode is "inc", "out", or "all".
+        """
+        if mode not in ('inc', 'out', 'all'):
+            raise ValueError(f'Invalid degree mode: {mode}')
+        parts = self.workers * TASKS_PER_WORKER
+        self._map(degree_task, [(mode, lo, hi) for lo, hi in _ranges(len(self._keys), parts)])
+        return array(INT_TYPE, self._sections['degrees'])
+
+    def reach_counts(self, sources, reverse=False, max_depth=None) -> dict:
+        """
+        Count the nodes reachable from each source node key (the source itself is not counted).
+        If reverse is True, the nodes that can reach each source.
+        Returns a dict of source key -> count; the missing sources are ignored.
+        """
+        index = {key: i for i, key in enumerate(self._keys)}
+        found = [key for key in sources if key in index]
+        ids = [index[key] for key in found]
+        parts = self.workers * TASKS_PER_WORKER
+        tasks = [(ids[lo:hi], reverse, max_depth) for lo, hi in _ranges(len(ids), parts)]
+        counts = [c for chunk in self._map(reach_task, tasks) for c in chunk]
+        return dict(zip(found, counts))
+
+    def predicate_stats(self) -> dict:
+        """
+        Returns the (triples, subjects, things) of each predicate, like `Neuro.cardinality`,
+        as a dict of predicate value -> tuple.
+        """
+        if not self._neuro:
+            raise ValueError('Only Neuro graphs have predicates')
+        if self._tables is not None:
+            # The partitioned graphs know it already
+            index = {key: i for i, key in enumerate(self._keys)}
+            return {self._values[index[p_key]]: (len(t), len(t.subjects), len(t.things))
+                    for p_key, t in self._tables.tables.items()}
+        parts = self.workers * TASKS_PER_WORKER
+        stats = {}
+        for chunk in self._map(predicate_task, _ranges(len(self._keys), parts)):
+            for p, triples, subjects, things in chunk:
+                stats[self._values[p]] = (triples, subjects, things)
+        return stats
@@ -0,0 +1,186 @@
+
+#- rev: v1 -
+#- hash: GA6WCK -
+
+from collections import deque
+
+
+class _Seen(set):
+    """
+    Visited node keys, with the same interface as a bytearray of flags.
+    """
+
+    __slots__ = ()
+    __getitem__ = set.__contains__
+
+    def __setitem__(self, key, _):
+        self.add(key)
+
+
+def _walker(graph, reverse=False):
+    """
+    Returns the functions to walk a graph:
+    (node key -> id, id -> node key, id -> neighbor ids, visited flags)
+
+    The compact & frozen graphs walk over their dense ints,
+    with a bytearray for the visited flags.
+    The other graphs walk over the node keys, with a set.
+    """
+    adjacency = graph._adjacency
+    if graph._compact and hasattr(adjacency, 'next_ids'):
+        nodes = graph._nodes
+        step = adjacency.prev_ids if reverse else adjacency.next_ids
+        return nodes.index, nodes.key_at, step, bytearray(len(nodes))
+
+    def index(node_id):
+        return node_id if node_id in graph else None
+
+    step = graph.iter_prev_nodes if reverse else graph.iter_next_nodes
+    return index, _identity, step, _Seen()
+
+
+def _identity(node_id):
+    return node_id
+
+
+def bfs(graph, source: bytes, reverse=False, max_depth=None):
+    """
+    Breadth-first search, from a source node.
+    Yields the node keys, starting with the source.
+    If reverse is True, it follows the incoming edges.
+    """
+    index, key_at, step, seen = _walker(graph, reverse)
+    start = index(source)
+    if start is None:
+        return
+    seen[start] = 1
+    yield source
+    queue = deque((start,))
+    if max_depth is None:
+        popleft, append = queue.popleft, queue.append
+        while queue:
+            for nxt in step(popleft()):
+                if not seen[nxt]:
+                    seen[nxt] = 1
+                    append(nxt)
+                    yield key_at(nxt)
+        return
+    depth = 0
+    while queue and depth < max_depth:
+        depth += 1
+        # Expand one level at a time
+        for _ in range(len(queue)):
+            for nxt in step(queue.popleft()):
+                if not seen[nxt]:
+                    seen[nxt] = 1
+                    queue.append(nxt)
+                    yield key_at(nxt)
+
+
+def dfs(graph, source: bytes, reverse=False):
+    """
+    Depth-first search, from a source node.
+    Yields the node keys in pre-order, starting with the source.
+    If reverse is True, it follows the incoming edges.
+    """
+    index, key_at, step, seen = _walker(graph, reverse)
+    start = index(source)
+    if start is None:
+        return
+    seen[start] = 1
+    yield source
+    stack = [iter(step(start))]
+    while stack:
+        for nxt in stack[-1]:
+            if not seen[nxt]:
+                seen[nxt] = 1
+                yield key_at(nxt)
+                stack.append(iter(step(nxt)))
+                break
+        else:
+            stack.pop()
+
+
+def neighborhood(graph, source: bytes, depth: int, reverse=False) -> set:
+    """
+    Returns the set of nodes at most `depth` hops away from the source,
+    including the source.
+    """
+    return set(bfs(graph, source, reverse, max_depth=depth))
+
+
+def _path(parents: dict, node, key_at) -> list:
+    # Walk the parents back to the start; the start is its own parent
+    path = [key_at(node)]
+    while parents[node] != node:
+        node = parents[node]
+        path.append(key_at(node))
+    return path
+
+
+def shortest_path(graph, source: bytes, target: bytes):
+    """
+    Returns the shortest path from source to target, as a list of node keys;
+    or None, if the target can't be reached.
+    The edges are not weighted.
+    """
+    index, key_at, step, _ = _walker(graph)
+    start, end = index(source), index(target)
+    if start is None or end is None:
+        return None
+    parents = {start: start}
+    queue = deque((start,))
+    while queue:
+        node = queue.popleft()
+        if node == end:
+            return _path(parents, end, key_at)[::-1]
+        for nxt in step(node):
+            if nxt not in parents:
+                parents[nxt] = node
+                queue.append(nxt)
+    return None
+
+
+def bidirectional_path(graph, source: bytes, target: bytes):
+    """
+    Returns the shortest path from source to target, as a list of node keys;
+    or None, if the target can't be reached.
+    It searches forward from the source, using the outgoing edges,
+    and backward from the target, using the incoming edges,
+    always expanding the smaller frontier.
+    """
+    index, key_at, next_step, _ = _walker(graph)
+    prev_step = _walker(graph, reverse=True)[2]
+    start, end = index(source), index(target)
+    if start is None or end is None:
+        return None
+    if start == end:
+        return [source]
+
+    # Node -> (parent, distance), for each side
+    fwd = {start: (start, 0)}
+    bwd = {end: (end, 0)}
+    fwd_queue = deque((start,))
+    bwd_queue = deque((end,))
+    while fwd_queue and bwd_queue:
+        if len(fwd_queue) <= len(bwd_queue):
+            queue, seen, other, step = fwd_queue, fwd, bwd, next_step
+        else:
+            queue, seen, other, step = bwd_queue, bwd, fwd, prev_step
+        best = None
+        # Expand a whole level, then pick the shortest meeting point
+        for _ in range(len(queue)):
+            node = queue.popleft()
+            dist = seen[node][1] + 1
+            for nxt in step(node):
+                if nxt in seen:
+                    continue
+                seen[nxt] = (node, dist)
+                queue.append(nxt)
+                if nxt in other and (best is None or other[nxt][1] < other[best][1]):
+                    best = nxt
+        if best is not None:
+            fwd_path = _path({k: v[0] for k, v in fwd.items()}, best, key_at)[::-1]
+            bwd_path = _path({k: v[0] for k, v in bwd.items()}, best, key_at)
+            return fwd_path + bwd_path[1:]
+    return None
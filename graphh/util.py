@@ -1,23 +1,121 @@
 
-#- rev: v1 -
-#- hash: YAERSA -
+#- rev: v5 -
+#- hash: N6EJ42 -
 
+from functools import lru_cache
+from itertools import islice
 from hashlib import blake2b
 
+try:
+    import xxhash
+except ImportError: # pragma: no cover
+    xxhash = None
+
 HASH_SIZE = 32
 
 
+class HashCollision(Exception):
+    pass
+
+
+def to_bytes(d) -> bytes:
+    """
+    Normalize a value, before hashing.
+    """
+    if d.__class__ is bytes:
+        return d
+    if d is None or d == 'None' or d == 'NULL':
+        return b'null'
+    elif isinstance(d, str):
+        return d.encode('utf8')
+    elif isinstance(d, (int, float)):
+        return str(d).encode('utf8')
+    return d
+
+
 def hash(*data):
     """
     Blake2 64-bit hashing, 32 bytes output size.
     """
     key = blake2b(digest_size=HASH_SIZE)
     for d in data:
-        if d is None or d == 'None' or d == 'NULL':
-            d = b'null'
-        elif isinstance(d, str):
-            d = d.encode('utf8')
-        elif isinstance(d, (int, float)):
-            d = bytes(str(d).encode('utf8'))
-        key.update(d)
+        key.update(to_bytes(d))
     return key.digest()
+
+
+class Hasher:
+    """
+    The ID scheme of a graph: how node & edge keys are computed.
+
+    * size: digest size in bytes; 1..64 for Blake2, 8 for XXH3
+    * algo: "blake2b" (default), or "xxh3" (fast non-crypto hash, needs the xxhash package)
+    * memo: LRU cache size, for hashing hot values like predicates (0 = disabled)
+    * check: detect hash collisions when adding nodes and edges;
+        by default, enabled for digests shorter than 16 bytes
+
+    The default scheme is the same as `hash()`, 32 bytes Blake2.
+    """
+
+    __slots__ = ('size', 'algo', 'memo', 'check', 'hash', 'node')
+
+    def __init__(self, size=HASH_SIZE, algo='blake2b', memo=0, check=None):
+        if algo == 'blake2b':
+            if not 1 <= size <= 64:
+                raise ValueError(f'Invalid Blake2 digest size: {size}')
+
+            def _hash(*data):
+                return blake2b(b''.join(map(to_bytes, data)), digest_size=size).digest()
+
+        elif algo == 'xxh3':
+            if xxhash is None:
+                raise ImportError('The "xxh3" hasher needs the xxhash package')
+            if size != 8:
+                raise ValueError(f'Invalid XXH3 digest size: {size}')
+
+            def _hash(*data):
+                return xxhash.xxh3_64_digest(b''.join(map(to_bytes, data)))
+
+        else:
+            raise ValueError(f'Invalid hash algorithm: {algo}')
+
+        self.size = size
+        self.algo = algo
+        self.memo = memo
+        self.check = size < 16 if check is None else check
+        # Hash any number of values, eg: edge keys
+        self.hash = _hash
+        # Hash a single value, eg: node keys
+        self.node = lru_cache(maxsize=memo, typed=True)(_hash) if memo else _hash
+
+    def __reduce__(self):
+        # The hash functions are closures, so they are re-created
+        return (self.__class__, (self.size, self.algo, self.memo, self.check))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(size={self.size}, algo={self.algo!r}, memo={self.memo})'
+
+    def collides(self, old, new) -> bool:
+        """
+        Returns True if two values have the same key, but they are different.
+        """
+        if not self.check or old is None:
+            return False
+        return to_bytes(old) != to_bytes(new)
+
+    def check_key(self, key: bytes):
+        """
+        Raise if a key was not produced by this scheme.
+        """
+        if len(key) != self.size:
+            raise ValueError(f'The key has {len(key)} bytes, but the graph uses {self}')
+
+
+def chunks(iterable, size: int):
+    """
+    Split an iterable into lists of fixed size; the last one can be shorter.
+    """
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
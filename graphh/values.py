@@ -0,0 +1,254 @@
+"""
+Value indexes, for the match and range queries of Neuro.
+A value index keeps the strings of the subjects, or the things, of one predicate:
+  * sorted, for the prefix matches
+  * reversed & sorted, for the suffix matches
+  * split in n-grams, for the contains matches
+A range index keeps the numbers of the things of one predicate,
+sorted, with their subjects.
+"""
+#- rev: v5 -
+#- hash: MXV4R4 -
+
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from threading import Lock
+
+# The size of the n-grams
+GRAM = 3
+
+
+def iter_grams(value: str):
+    for i in range(len(value) - GRAM + 1):
+        yield value[i:i + GRAM]
+
+
+class ValueIndex:
+    """
+    Index of string values, for the exact, prefix, suffix & contains matches.
+    The new values are sorted lazily, on the next query;
+    the removed values are skipped by the queries, until they are 1/4 of the sorted values,
+    or the next values are sorted.
+    The sorted lists are replaced, not changed, so the readers can share them.
+    """
+
+    __slots__ = ('_values', '_sorted', '_reversed', '_grams', '_pending', '_dead', '_lock')
+
+    def __init__(self, values=()):
+        self._values = set()
+        self._sorted = []
+        self._reversed = []
+        # n-gram -> values
+        self._grams = {}
+        self._pending = set()
+        # The removed values, that are still in the sorted lists
+        self._dead = set()
+        self._lock = Lock()
+        for value in values:
+            self.add(value)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(values:{len(self)})'
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, value) -> bool:
+        return value in self._values
+
+    def add(self, value):
+        """
+        Add a value; the other types than strings are ignored.
+        """
+        if not isinstance(value, str) or value in self._values:
+            return
+        self._values.add(value)
+        if value in self._dead:
+            self._dead.discard(value)
+        else:
+            self._pending.add(value)
+        for gram in iter_grams(value):
+            values = self._grams.get(gram)
+            if values is None:
+                self._grams[gram] = {value}
+            else:
+                values.add(value)
+
+    def remove(self, value):
+        if value not in self._values:
+            return
+        self._values.discard(value)
+        for gram in iter_grams(value):
+            values = self._grams.get(gram)
+            if values is not None:
+                values.discard(value)
+                if not values:
+                    del self._grams[gram]
+        if value in self._pending:
+            self._pending.discard(value)
+        else:
+            self._dead.add(value)
+
+    def _stale(self) -> bool:
+        return bool(self._pending) or len(self._dead) * 4 > len(self._sorted)
+
+    def _flush(self):
+        if not self._stale():
+            return
+        with self._lock:
+            # Another reader could flush first
+            if self._stale():
+                dead = self._dead
+                pending = list(self._pending)
+                # Sorting a sorted list, plus a few values, is almost linear
+                self._sorted = sorted([v for v in self._sorted if v not in dead] + pending)
+                reversed_values = [v for v in self._reversed if v[::-1] not in dead]
+                self._reversed = sorted(reversed_values + [v[::-1] for v in pending])
+                self._pending = set()
+                self._dead = set()
+
+    @staticmethod
+    def _prefixed(column: list, part: str):
+        idx = bisect_left(column, part)
+        while idx < len(column) and column[idx].startswith(part):
+            yield column[idx]
+            idx += 1
+
+    def match(self, part: str, where=''):
+        """
+        Find the values that match, with the same rules as `create_matcher`:
+        "=" equal, "<" starts with, ">" ends with, or contains.
+        """
+        if where == '=':
+            return [part] if part in self._values else []
+        self._flush()
+        if where == '<':
+            found = self._prefixed(self._sorted, part)
+        elif where == '>':
+            found = (v[::-1] for v in self._prefixed(self._reversed, part[::-1]))
+        elif len(part) < GRAM:
+            found = (v for v in self._sorted if part in v)
+        else:
+            # Intersect the n-grams, from the smallest set, then check the values
+            sets = sorted((self._grams.get(g, ()) for g in set(iter_grams(part))), key=len)
+            found = set(sets[0]).intersection(*sets[1:])
+            return (v for v in found if part in v)
+        dead = self._dead
+        if dead:
+            return (v for v in found if v not in dead)
+        return found
+
+    def copy(self):
+        index = ValueIndex()
+        self._flush()
+        index._values = set(self._values)
+        index._sorted = list(self._sorted)
+        index._reversed = list(self._reversed)
+        index._grams = {k: set(v) for k, v in self._grams.items()}
+        index._dead = set(self._dead)
+        return index
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+class RangeIndex:
+    """
+    Index of the (number, subject key) pairs of a predicate,
+    sorted by number, for the range and the top K queries.
+    The other types than numbers are ignored.
+    Like the ValueIndex, the removed pairs are skipped, until the columns are sorted again.
+    """
+
+    __slots__ = ('_columns', '_pairs', '_pending', '_dead', '_lock')
+
+    def __init__(self, pairs=()):
+        # The sorted (numbers, keys), replaced together
+        self._columns = ([], [])
+        self._pairs = set()
+        self._pending = set()
+        # The removed pairs, that are still in the columns
+        self._dead = set()
+        self._lock = Lock()
+        for number, key in pairs:
+            self.add(number, key)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(pairs:{len(self)})'
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def add(self, number, key: bytes):
+        if not is_number(number) or (number, key) in self._pairs:
+            return
+        pair = (number, key)
+        self._pairs.add(pair)
+        if pair in self._dead:
+            self._dead.discard(pair)
+        else:
+            self._pending.add(pair)
+
+    def remove(self, number, key: bytes):
+        pair = (number, key)
+        if pair not in self._pairs:
+            return
+        self._pairs.discard(pair)
+        if pair in self._pending:
+            self._pending.discard(pair)
+        else:
+            self._dead.add(pair)
+
+    def _stale(self) -> bool:
+        return bool(self._pending) or len(self._dead) * 4 > len(self._columns[0])
+
+    def _flush(self):
+        if not self._stale():
+            return self._columns
+        with self._lock:
+            if self._stale():
+                dead = self._dead
+                pairs = [pair for pair in zip(*self._columns) if pair not in dead]
+                pairs.extend(self._pending)
+                pairs.sort()
+                self._columns = ([n for n, _ in pairs], [k for _, k in pairs])
+                self._pending = set()
+                self._dead = set()
+        return self._columns
+
+    def range(self, lo=None, hi=None):
+        """
+        Returns the (number, key) pairs with lo <= number <= hi, ascending.
+        Missing bounds (None) are open.
+        """
+        numbers, keys = self._flush()
+        start = 0 if lo is None else bisect_left(numbers, lo)
+        end = len(numbers) if hi is None else bisect_right(numbers, hi)
+        dead = self._dead
+        if dead:
+            return (pair for pair in zip(numbers[start:end], keys[start:end]) if pair not in dead)
+        return zip(numbers[start:end], keys[start:end])
+
+    def top(self, k: int, reverse=False) -> list:
+        """
+        Returns the K smallest (number, key) pairs, or the K largest if reverse is True.
+        """
+        numbers, keys = self._flush()
+        if k <= 0:
+            return []
+        dead = self._dead
+        if dead:
+            pairs = zip(reversed(numbers), reversed(keys)) if reverse else zip(numbers, keys)
+            return list(islice((pair for pair in pairs if pair not in dead), k))
+        if reverse:
+            return list(zip(numbers[:-k - 1:-1], keys[:-k - 1:-1]))
+        return list(zip(numbers[:k], keys[:k]))
+
+    def copy(self):
+        numbers, keys = self._flush()
+        index = RangeIndex()
+        index._columns = (list(numbers), list(keys))
+        index._pairs = set(self._pairs)
+        index._dead = set(self._dead)
+        return index
@@ -0,0 +1,112 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+import asyncio
+from json import load
+from concurrent.futures import ThreadPoolExecutor
+from graphh import Neuro, FsConvention
+from graphh.aio import AsyncGraph
+
+COUNTRIES = load(open('tests/data/countries.json'))
+
+
+def geo():
+    g = FsConvention('Geo')
+    g.create_table('countries')
+    g.create_docs('countries', ((item['cca2'], {
+        'name': item['name']['common'], 'region': item['region'], 'borders': item['borders']})
+        for item in COUNTRIES))
+    return g
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_async_queries():
+    g = geo()
+    uid = '/Geo/tables/countries/docs/RO/'
+    with ThreadPoolExecutor(2) as pool:
+        for a in (AsyncGraph(g, chunk_size=7), AsyncGraph(g, chunk_size=7, executor=pool)):
+            assert sorted(asyncio.run(collect(a.query_thing('borders')))) == sorted(g.query_thing('borders'))
+            assert sorted(asyncio.run(collect(a.query_subject('borders')))) == sorted(g.query_subject('borders'))
+            assert sorted(asyncio.run(collect(a.query_thing('name', 'Rom', '<')))) == ['Romania']
+            assert sorted(asyncio.run(collect(a.query_sp_t(uid, 'borders')))) == sorted(g.query_sp_t(uid, 'borders'))
+            assert sorted(asyncio.run(collect(a.query_pt_s('region', 'Europe')))) == \
+                sorted(g.query_pt_s('region', 'Europe'))
+            docs = asyncio.run(collect(a.query_docs('countries', {'region': 'Europe'}, {'name'})))
+            assert sorted(d['name'] for d in docs) == sorted(d['name'] for d in g.query_docs(
+                'countries', {'region': 'Europe'}, {'name'}))
+            assert asyncio.run(collect(a.query_docs('countries', {'region': 'Nowhere'}))) == []
+
+
+def test_async_control():
+    g = Neuro()
+    g.add_triples((f'n{i}', 'is', i) for i in range(1000))
+    a = AsyncGraph(g, chunk_size=10)
+
+    async def ticking():
+        # The event loop runs the other tasks between the chunks
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(tick())
+        await asyncio.sleep(0)
+        found = len(await collect(a.query_subject('is')))
+        task.cancel()
+        return found, len(ticks)
+
+    found, ticks = asyncio.run(ticking())
+    assert found == 1000
+    assert ticks > 50
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(collect(a.query_thing('is', timeout=0)))
+    with pytest.raises(asyncio.TimeoutError):
+        with ThreadPoolExecutor(1) as pool:
+            asyncio.run(collect(AsyncGraph(g, executor=pool, timeout=0).query_thing('is')))
+
+    async def cancelled():
+        task = asyncio.create_task(collect(a.query_thing('is')))
+        await asyncio.sleep(0)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancelled())
+
+
+def test_async_writes():
+    g = geo()
+    a = AsyncGraph(g, chunk_size=7)
+    things = sorted(g.query_thing('borders'))
+    docs = sorted(d['name'] for d in g.query_docs('countries', {'region': 'Europe'}, {'name'}))
+
+    async def interleaved(query):
+        # Another task adds triples & docs between the chunks
+        async def write():
+            # The query takes its first chunk, before the first write
+            await asyncio.sleep(0)
+            for i in range(200):
+                g.add_triple(f'/Geo/tables/countries/docs/Z{i}/', 'borders', f'Z{i}')
+                g.create_doc('countries', f'Y{i}', {'name': f'Y{i}', 'region': 'Europe'})
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(write())
+        await asyncio.sleep(0)
+        found = await collect(query)
+        await task
+        return found
+
+    assert sorted(asyncio.run(interleaved(a.query_thing('borders')))) == things
+    g = geo()
+    a = AsyncGraph(g, chunk_size=7)
+    found = asyncio.run(interleaved(a.query_docs('countries', {'region': 'Europe'}, {'name'})))
+    assert sorted(d['name'] for d in found) == docs
+    assert len(g.query_docs('countries', {'region': 'Europe'})) == len(docs) + 200
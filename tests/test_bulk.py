@@ -0,0 +1,66 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+from json import load
+from graphh import Graph, Neuro
+from graphh.generators import gen_complete_gr
+
+data = load(open('tests/data/les_miserables.json'))
+
+
+def test_bulk_graph():
+    for compact in (False, True):
+        g = gen_complete_gr(9)
+        x = Graph(compact=compact)
+
+        keys = x.add_nodes_from(chr(i + 96) for i in range(1, 10))
+        assert keys == g.node_list()
+        assert x.add_nodes_from(['a', 'a', 'b']) == keys[:1] * 2 + keys[1:2]
+
+        edges = x.add_edges_from(v for _, v in g.iter_edges())
+        assert edges == g.edge_list()
+        assert x.add_edges_from([(keys[0], b'missing')]) == [False]
+
+        assert x.number_of_nodes() == g.number_of_nodes()
+        assert x.number_of_edges() == g.number_of_edges()
+        for k in keys:
+            assert x.out_edges(k) == g.out_edges(k)
+            assert x.inc_edges(k) == g.inc_edges(k)
+
+
+def test_bulk_hooks():
+    added = []
+
+    class Hooked(Graph):
+        def after_node_add(self, node_id):
+            added.append(node_id)
+
+        def after_edge_add(self, edge_id):
+            added.append(edge_id)
+
+    g = Hooked()
+    a, b = g.add_nodes_from(['a', 'b'])
+    ab, = g.add_edges_from([(a, b)])
+    assert added == [a, b, ab]
+
+
+def test_bulk_triples():
+    g = Neuro()
+    x = Neuro()
+
+    for link in data['links']:
+        g.add_triple(link['source'], 'knows', link['target'])
+    count = x.add_triples((link['source'], 'knows', link['target']) for link in data['links'])
+
+    assert count == len(data['links'])
+    assert x.node_list() == g.node_list()
+    assert sorted(x.edge_list()) == sorted(g.edge_list())
+    assert x.to_dict()['sp'] == g.to_dict()['sp']
+    assert x.to_dict()['pt'] == g.to_dict()['pt']
+    assert set(x.query_thing('knows')) == set(g.query_thing('knows'))
+
+    # Adding on top of existing triples
+    x.add_triples([('Valjean', 'knows', 'Javert'), ('Javert', 'hunts', 'Valjean')])
+    assert 'Javert' in set(x.query_sp_t('Valjean', 'knows'))
+    assert list(x.query_pt_s('hunts', 'Valjean')) == ['Javert']
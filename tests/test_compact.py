@@ -0,0 +1,97 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+from json import load
+import pytest
+from graphh import Graph, Neuro, FsConvention
+from graphh.compact import MIN_PENDING
+
+
+def test_compact_shapes():
+    g = Graph(compact=True)
+
+    a = g.add_node('a')
+    b = g.add_node('b')
+    c = g.add_node('c')
+    g.add_edge(a, b)
+    g.add_edge(b, c)
+    g.add_edge(c, a)
+    assert g.add_edge(a, b, safe=False) is False
+
+    assert len(g) == 3
+    assert g.number_of_edges() == 3
+    assert g.node_list() == [a, b, c]
+    assert g.get_node_id(b) == 'b'
+
+    assert g.out_edges(a) == set([g.get_edge(a, b)])
+    assert g.inc_edges(a) == set([g.get_edge(c, a)])
+    assert g.edge_head(g.get_edge(a, b)) == a
+    assert g.edge_tail(g.get_edge(a, b)) == b
+
+    assert list(g.iter_next_nodes(a)) == [b]
+    assert list(g.iter_prev_nodes(a)) == [c]
+    assert g.out_degree(a) == 1
+    assert g.all_degree(a) == 2
+    assert g.out_degree(b'missing') == 0
+
+
+def test_compact_rebuild():
+    """
+    Many edges, to cross the CSR re-build threshold
+    """
+    size = MIN_PENDING * 3
+    g = Graph(compact=True)
+    x = Graph()
+    for gr in (g, x):
+        root = gr.add_node(0)
+        for i in range(1, size):
+            gr.add_edge(root, gr.add_node(i))
+            gr.add_edge(gr.get_node(i), root)
+
+    assert g.node_list() == x.node_list()
+    assert g.edge_list() == x.edge_list()
+    assert g.out_degree(root) == size - 1
+    assert g.inc_degree(root) == size - 1
+    assert set(g.iter_next_nodes(root)) == set(x.iter_next_nodes(root))
+    assert g.out_edges(root) == x.out_edges(root)
+
+    y = Graph(compact=True)
+    y.from_dict(x.to_dict())
+    assert y.inc_edges(root) == x.inc_edges(root)
+    assert set(y.iter_prev_nodes(root)) == set(x.iter_prev_nodes(root))
+
+
+def test_compact_neuro():
+    data = load(open('tests/data/les_miserables.json'))
+
+    g = Neuro(compact=True)
+    x = Neuro()
+    for gr in (g, x):
+        for link in data['links']:
+            gr.add_triple(link['source'], 'knows', link['target'])
+
+    assert g.number_of_edges() == x.number_of_edges()
+    assert set(g.query_thing('knows')) == set(x.query_thing('knows'))
+    assert set(g.query_subject('knows')) == set(x.query_subject('knows'))
+    assert set(g.query_sp_t('Valjean', 'knows')) == set(x.query_sp_t('Valjean', 'knows'))
+
+
+def test_compact_convention():
+    g = FsConvention('Family', compact=True)
+    g.create_table('people')
+    g.create_doc('people', 'mom', {'name': 'Mom', 'loves': ['dad', 'girl']})
+    g.create_doc('people', 'dad', {'name': 'Dad', 'loves': 'mom'})
+
+    assert sorted(g.list_docs('people')) == ['/Family/tables/people/docs/dad/', '/Family/tables/people/docs/mom/']
+    assert g.get_doc('people', 'dad') == {'name': 'Dad', 'loves': 'mom'}
+
+    # Append-only: the new properties are added, the removals are refused before any change
+    assert g.update_doc('people', 'dad', {'name': 'Dad', 'loves': ['mom', 'girl']})
+    assert g.get_doc('people', 'dad') == {'name': 'Dad', 'loves': {'mom', 'girl'}}
+    with pytest.raises(ValueError):
+        g.update_doc('people', 'dad', {'name': 'Papa'})
+    with pytest.raises(ValueError):
+        g.delete_doc('people', 'mom')
+    assert g.get_doc('people', 'dad') == {'name': 'Dad', 'loves': {'mom', 'girl'}}
+    assert g.count_docs('people') == 2
@@ -0,0 +1,213 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+from graphh import FsConvention
+
+
+def family():
+    g = FsConvention('Family')
+    g.create_table('people')
+    g.create_table('pets')
+    g.create_doc('people', 'mom', {'name': 'Mom', 'loves': ['dad', 'girl'], 'home': 'city'})
+    g.create_doc('people', 'dad', {'name': 'Dad', 'loves': 'mom', 'home': 'city'})
+    g.create_doc('people', 'girl', {'name': 'Girl', 'loves': 'cat', 'home': 'city'})
+    g.create_doc('pets', 'cat', {'name': 'Cat', 'loves': 'girl', 'home': 'city'})
+    return g
+
+
+def test_table_docs():
+    g = family()
+    assert g.count_docs('people') == 3
+    assert g.count_docs('pets') == 1
+    assert g.count_docs('cars') == 0
+
+    # Only the documents of the table
+    assert sorted(d['name'] for d in g.query_docs('people', {'home': 'city'})) == ['Dad', 'Girl', 'Mom']
+    assert [d['name'] for d in g.query_docs('pets', {'home': 'city'})] == ['Cat']
+    assert [d['name'] for d in g.query_docs('people', {'home': 'city', 'loves': 'girl'})] == ['Mom']
+    assert g.query_docs('people', {'home': 'city', 'loves': 'dog'}) == []
+    assert g.query_docs('cars', {'home': 'city'}) == []
+
+    f = g.freeze()
+    assert f.count_docs('people') == 3
+    assert [d['name'] for d in f.query_docs('pets', {'loves': 'girl'})] == ['Cat']
+
+
+def test_reload_docs():
+    from graphh.io import msgpack
+    g = family()
+    # The doc properties added with a triple are in the postings
+    g.add_triple('/Family/tables/people/docs/mom/', 'age', 40)
+    assert [d['name'] for d in g.query_docs('people', {'age': 40})] == ['Mom']
+    assert g.count_docs('people') == 3
+
+    # The postings are made again after loading
+    x = FsConvention('Family')
+    x.from_dict(g.to_dict())
+    pth = 'tests/family.mp'
+    msgpack.export_msgpack(g, pth, chunk_size=5)
+    y = msgpack.import_msgpack(FsConvention('Family'), pth)
+    os.remove(pth)
+    for loaded in (x, y):
+        assert loaded.count_docs('people') == 3
+        assert loaded.count_docs('pets') == 1
+        assert sorted(d['name'] for d in loaded.query_docs('people', {'home': 'city'})) == ['Dad', 'Girl', 'Mom']
+        assert [d['name'] for d in loaded.query_docs('people', {'age': 40})] == ['Mom']
+        assert loaded.query_docs('pets', {'loves': 'girl'}) == [{'name': 'Cat', 'loves': 'girl', 'home': 'city'}]
+
+
+def test_chains():
+    g = family()
+    mom = g.get_node('/Family/tables/people/docs/mom/')
+    assert len(g._chains[mom]) == 4
+    assert g.create_doc('people', 'boy', {'name': 'Boy'}) == g.get_node('/Family/tables/people/docs/boy/')
+    assert g.create_doc('people', 'boy', {'name': 'Boy'}) is False
+
+    assert g.get_doc('people', 'mom') == {'name': 'Mom', 'loves': {'dad', 'girl'}, 'home': 'city'}
+    assert g.get_doc('people', 'mom', {'name', b'home'}) == {'name': 'Mom', 'home': 'city'}
+    assert g.get_doc('people', 'nobody') == {}
+
+    docs = g.get_docs('people', ['dad', 'nobody', 'girl'], {'loves'})
+    assert docs == [{'loves': 'mom'}, {}, {'loves': 'cat'}]
+    assert g.freeze().get_docs('pets', ['cat']) == [{'name': 'Cat', 'loves': 'girl', 'home': 'city'}]
+
+    # The properties added later are in the chain
+    g.add_triple('/Family/tables/people/docs/mom/', 'age', 40)
+    g.add_triples([('/Family/tables/people/docs/mom/', 'loves', 'cat')])
+    assert g.get_doc('people', 'mom') == {'name': 'Mom', 'loves': {'dad', 'girl', 'cat'}, 'home': 'city', 'age': 40}
+
+    # The documents without a chain are still found
+    g.add_triple('/Family/tables/people/docs/ghost/', 'name', 'Ghost')
+    g.add_triple('/Family/tables/people/docs/ghost/', 'loves', 'mom')
+    g.add_triple('/Family/tables/people/docs/ghost/', 'loves', 'dad')
+    ghost = {'name': 'Ghost', 'loves': {'mom', 'dad'}}
+    assert g.get_doc('people', 'ghost') == ghost
+    assert g.get_docs('people', ['ghost', 'dad'], {'loves'}) == [{'loves': {'mom', 'dad'}}, {'loves': 'mom'}]
+    x = FsConvention('Family')
+    x.from_dict(g.to_dict())
+    assert x.get_doc('people', 'mom') == g.get_doc('people', 'mom')
+    assert x.get_docs('people', ['ghost', 'mom']) == [ghost, g.get_doc('people', 'mom')]
+
+
+def test_create_docs():
+    from json import load
+    countries = load(open('tests/data/countries.json'))
+
+    def iter_docs():
+        for item in countries:
+            yield item['cca2'], {
+                'name': item['name']['common'], 'region': item['region'],
+                'borders': item['borders'], 'area': item['area']}
+
+    one = FsConvention('Geo')
+    one.create_table('countries')
+    for uid, data in iter_docs():
+        one.create_doc('countries', uid, data)
+
+    for workers in (0, 2):
+        g = FsConvention('Geo')
+        g.create_table('countries')
+        keys = g.create_docs('countries', iter_docs(), workers=workers, chunk_size=50)
+        assert len(keys) == len(countries)
+        assert g.number_of_nodes() == one.number_of_nodes()
+        assert g.number_of_edges() == one.number_of_edges()
+        assert g.count_docs('countries') == len(countries)
+        assert g.get_doc('countries', 'RO') == one.get_doc('countries', 'RO')
+        assert len(g.query_docs('countries', {'region': 'Europe', 'borders': 'DEU'})) == 9
+        assert sorted(g.query_pt_s('borders', 'ROU')) == sorted(one.query_pt_s('borders', 'ROU'))
+        # The existing documents are ignored
+        assert g.create_docs('countries', [('RO', {'name': 'Other'}), ('XX', {'name': 'New'})]) == \
+            [g.get_node('/Geo/tables/countries/docs/XX/')]
+        assert g.get_doc('countries', 'RO')['name'] == 'Romania'
+
+    # The bulk insert doesn't decode the paths of its documents, to find their table
+    class Counted(FsConvention):
+        decoded = 0
+
+        def get_node_id(self, node_id):
+            Counted.decoded += 1
+            return super().get_node_id(node_id)
+
+    g = Counted('Geo')
+    g.create_table('countries')
+    Counted.decoded = 0
+    g.create_docs('countries', iter_docs())
+    assert Counted.decoded == 0
+    assert g.count_docs('countries') == len(countries)
+    assert len(g.query_docs('countries', {'region': 'Europe', 'borders': 'DEU'})) == 9
+
+
+def test_cache():
+    g = family()
+    assert g.cache_info() == {}
+    g.enable_cache(size=8)
+
+    mom = g.get_doc('people', 'mom')
+    assert g.get_doc('people', 'mom') == mom
+    assert g.cache_info() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 8}
+    # The cached documents are copies
+    g.get_doc('people', 'mom')['loves'].add('cat')
+    assert g.get_doc('people', 'mom') == mom
+
+    assert sorted(d['name'] for d in g.query_docs('people', {'home': 'city'})) == ['Dad', 'Girl', 'Mom']
+    assert sorted(g.query_pt_s('loves', 'girl')) == ['/Family/tables/people/docs/mom/', '/Family/tables/pets/docs/cat/']
+    assert len(g._cache) == 5
+    hits = g.cache_info()['hits']
+    assert len(g.query_docs('people', {'home': 'city'})) == 3
+    assert len(list(g.query_pt_s('loves', 'girl'))) == 2
+    assert g.cache_info()['hits'] == hits + 5
+
+    # A new triple drops only the doc and the postings it touches
+    g.add_triple('/Family/tables/pets/docs/cat/', 'loves', 'dad')
+    assert len(g._cache) == 5
+    g.add_triple('/Family/tables/people/docs/mom/', 'home', 'village')
+    assert len(g._cache) == 4
+    assert g.get_doc('people', 'mom')['home'] == {'city', 'village'}
+    g.create_doc('people', 'boy', {'name': 'Boy', 'home': 'city'})
+    assert sorted(d['name'] for d in g.query_docs('people', {'home': 'city'})) == ['Boy', 'Dad', 'Girl', 'Mom']
+    g.create_docs('people', [('dog', {'name': 'Dog', 'loves': 'girl'})])
+    assert len(list(g.query_pt_s('loves', 'girl'))) == 3
+
+    # The oldest entries are evicted
+    g.enable_cache(size=2)
+    for uid in ('dad', 'girl', 'boy'):
+        g.get_doc('people', uid)
+    assert len(g._cache) == 2
+    assert ('doc', g.get_node('/Family/tables/people/docs/dad/'), frozenset()) not in g._cache
+    g.disable_cache()
+    assert g.get_doc('people', 'boy') == {'name': 'Boy', 'home': 'city'}
+
+
+def test_update_delete_doc():
+    g = family()
+    g.enable_cache()
+    assert g.get_doc('people', 'mom')['loves'] == {'dad', 'girl'}
+    assert len(g.query_docs('people', {'loves': 'girl'})) == 1
+
+    mom = g.update_doc('people', 'mom', {'name': 'Mom', 'loves': ['dad', 'boy'], 'age': 40})
+    assert mom == g.get_node('/Family/tables/people/docs/mom/')
+    assert g.get_doc('people', 'mom') == {'name': 'Mom', 'loves': {'dad', 'boy'}, 'age': 40}
+    assert g.query_docs('people', {'loves': 'girl'}) == []
+    assert [d['name'] for d in g.query_docs('people', {'loves': 'boy'})] == ['Mom']
+    assert sorted(d['name'] for d in g.query_docs('people', {'home': 'city'})) == ['Dad', 'Girl']
+    assert sorted(g.query_sp_t('/Family/tables/people/docs/mom/', 'loves')) == ['boy', 'dad']
+    assert g.update_doc('people', 'nobody', {'name': 'Nobody'}) is False
+
+    assert g.delete_doc('people', 'dad')
+    assert not g.delete_doc('people', 'dad')
+    assert g.count_docs('people') == 2
+    assert g.get_doc('people', 'dad') == {}
+    assert sorted(d['name'] for d in g.query_docs('people', {'home': 'city'})) == ['Girl']
+    assert list(g.query_pt_s('loves', 'mom')) == []
+    assert '/Family/tables/people/docs/dad/' not in g.list_docs('people')
+    # The shared values are still there
+    assert g.get_node('city')
+
+    # The triples and the docs removed from the graph leave the postings too
+    assert g.remove_triple('/Family/tables/people/docs/mom/', 'loves', 'boy')
+    assert g.query_docs('people', {'loves': 'boy'}) == []
+    assert g.remove_node(g.get_node('/Family/tables/people/docs/girl/'))
+    assert g.count_docs('people') == 1
+    assert g.query_docs('people', {'home': 'city'}) == []
+    assert g.get_doc('people', 'girl') == {}
@@ -80,6 +80,27 @@ def test_countries():
     orig_africa = (n['name']['common'] for n in COUNTRIES if n.get('region') == 'Africa')
     assert sorted(n[b'common_name'] for n in count_africa) == sorted(orig_africa)
 
+    # All the conditions must match, each document is returned once
+    euro = g.query_docs('countries', {'region': 'Europe', 'currencies': 'EUR'}, {b'cca3'})
+    orig_euro = [n['cca3'] for n in COUNTRIES if n['region'] == 'Europe' and 'EUR' in n['currency']]
+    assert sorted(n[b'cca3'] for n in euro) == sorted(orig_euro)
+    assert g.query_docs('countries', {'region': 'Europe', 'currencies': 'XXX'}) == []
+    assert g.query_docs('countries', {}) == []
+
+    # Top 3 largest and smallest countries
+    by_area = sorted(COUNTRIES, key=lambda n: n['area'])
+    largest = g.top_k('area_size', 3, reverse=True)
+    assert [area for _, area in largest] == [n['area'] for n in by_area[:-4:-1]]
+    assert largest[0][0] == '/Geography/tables/countries/docs/RU/'
+    smallest = g.top_k('area_size', 3)
+    assert [area for _, area in smallest] == [n['area'] for n in by_area[:3]]
+
+    # Countries between the latitudes 60 and 70
+    nordic = set(g.query_range('latitude', 60, 70))
+    assert nordic == set(f'/Geography/tables/countries/docs/{n["cca2"]}/' for n in COUNTRIES
+        if n.get('latlng') and 60 <= n['latlng'][0] <= 70)
+    assert nordic
+
     info = g.get_doc('countries', 'RO')
     # print('What info about Romania ::', info)
     assert info[b'common_name'] == 'Romania'
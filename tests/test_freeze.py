@@ -0,0 +1,59 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+from json import load
+from graphh import Neuro, FsConvention
+from graphh.generators import gen_complete_gr, generate_star_gr
+
+
+def test_freeze_graph():
+    for g in (gen_complete_gr(6), generate_star_gr(9)):
+        f = g.freeze()
+        assert type(f) is type(g)
+        assert f.node_list() == g.node_list()
+        assert f.edge_list() == g.edge_list()
+        for node_id in g.node_list():
+            assert f.out_edges(node_id) == g.out_edges(node_id)
+            assert f.inc_edges(node_id) == g.inc_edges(node_id)
+            assert set(f.iter_next_nodes(node_id)) == set(g.iter_next_nodes(node_id))
+            assert set(f.iter_prev_nodes(node_id)) == set(g.iter_prev_nodes(node_id))
+            assert f.out_degree(node_id) == g.out_degree(node_id)
+            assert f.inc_degree(node_id) == g.inc_degree(node_id)
+        assert f.out_degree(b'missing') == 0
+        assert list(f.iter_next_nodes(b'missing')) == []
+
+    with pytest.raises(TypeError):
+        f.add_node('new')
+    with pytest.raises(TypeError):
+        f.add_edge(f.get_node('a'), f.get_node(0))
+
+
+def test_freeze_neuro():
+    data = load(open('tests/data/les_miserables.json'))
+    g = Neuro()
+    g.add_triples((link['source'], 'knows', link['target']) for link in data['links'])
+    f = g.freeze()
+    # The original graph is still writable
+    g.add_triple('Valjean', 'knows', 'Nobody')
+
+    assert 'Nobody' in set(g.query_sp_t('Valjean', 'knows'))
+    assert 'Nobody' not in set(f.query_sp_t('Valjean', 'knows'))
+    assert set(f.query_thing('knows')) == set(l['target'] for l in data['links'])
+    assert set(f.query_subject('knows')) == set(l['source'] for l in data['links'])
+    assert set(f.query_pt_s('knows', 'Valjean')) == set(l['source'] for l in data['links'] if l['target'] == 'Valjean')
+
+    with pytest.raises(TypeError):
+        f.add_triple('Valjean', 'knows', 'Nobody')
+
+
+def test_freeze_convention():
+    g = FsConvention('Family')
+    g.create_table('people')
+    g.create_doc('people', 'dad', {'name': 'Dad', 'loves': 'mom'})
+    f = g.freeze()
+
+    assert f.list_tables() == g.list_tables()
+    assert f.list_docs('people') == g.list_docs('people')
+    assert f.get_doc('people', 'dad') == {'name': 'Dad', 'loves': 'mom'}
@@ -0,0 +1,68 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+from graphh import Graph, Neuro
+from graphh.util import hash, Hasher, HashCollision
+from graphh.generators import gen_complete_gr
+
+
+def test_default_hasher():
+    h = Hasher()
+    assert h.size == 32 and not h.check
+    for value in ('a', b'a', 1, 1.5, None, 'NULL'):
+        assert h.node(value) == hash(value)
+    assert h.hash(b'x', b'y') == hash(b'x', b'y')
+
+
+def test_short_hasher():
+    for hasher in (Hasher(size=8), Hasher(size=16, memo=128)):
+        g = Neuro(hasher=hasher)
+        g.add_triple('mom', 'loves', 'dad')
+        g.add_triple('dad', 'loves', 'mom')
+        g.add_triples([('mom', 'loves', 'girl'), ('dad', 'loves', 'boy')])
+
+        assert all(len(k) == hasher.size for k in g.node_list())
+        assert all(len(k) == hasher.size for k in g.edge_list())
+        assert sorted(g.query_thing('loves')) == ['boy', 'dad', 'girl', 'mom']
+        assert sorted(g.query_sp_t('mom', 'loves')) == ['dad', 'girl']
+        assert list(g.query_pt_s('loves', 'boy')) == ['dad']
+
+
+def test_xxh3_hasher():
+    pytest.importorskip('xxhash')
+    g = Graph(hasher=Hasher(size=8, algo='xxh3', memo=64))
+    a, b = g.add_nodes_from(['a', 'b'])
+    assert len(a) == 8
+    assert len(g.add_edge(a, b)) == 8
+    assert g.has_edge(a, b)
+
+    with pytest.raises(ValueError):
+        Hasher(size=16, algo='xxh3')
+
+
+def test_hash_collision():
+    # With 1 byte keys, there must be collisions
+    g = Graph(hasher=Hasher(size=1))
+    with pytest.raises(HashCollision):
+        for i in range(300):
+            g.add_node(i)
+
+    g = Graph(hasher=Hasher(size=1))
+    with pytest.raises(HashCollision):
+        g.add_nodes_from(range(300))
+
+    # The same value is not a collision
+    g = Graph(hasher=Hasher(size=1))
+    assert g.add_node('a') == g.add_node(b'a')
+
+
+def test_load_32_bytes():
+    g = gen_complete_gr(5)
+    x = Graph()
+    x.from_dict(g.to_dict())
+    assert x.edge_list() == g.edge_list()
+
+    with pytest.raises(ValueError):
+        Graph(hasher=Hasher(size=8)).from_dict(g.to_dict())
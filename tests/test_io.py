@@ -2,8 +2,12 @@
 import os, sys # noqa: E401
 sys.path.insert(1, os.getcwd())
 
-from graphh import Graph
-from graphh.io import cbor, msgpack, csv
+import pytest
+from graphh import Graph, Neuro
+from graphh.io import cbor, msgpack, csv, snapshot
+from graphh.io.wal import LoggedNeuro
+from graphh.io.parallel import import_parallel
+from graphh.util import Hasher
 from graphh.generators import gen_complete_gr
 
 
@@ -49,6 +53,65 @@ def test_io_mpack():
     os.remove(pth)
 
 
+def test_io_stream_neuro():
+    """
+    Streaming CBOR and MsgPack, in many small records
+    """
+    g = Neuro()
+    for i in range(30):
+        g.add_triple(f'n{i}', 'is', 'odd' if i % 2 else 'even')
+        g.add_triple(f'n{i}', 'value', i)
+
+    for mod, export, load in ((cbor, cbor.export_cbor, cbor.import_cbor),
+                              (msgpack, msgpack.export_msgpack, msgpack.import_msgpack)):
+        pth = 'tests/n.stream'
+        export(g, pth, chunk_size=7)
+        x = load(Neuro(), pth)
+
+        assert x.node_list() == g.node_list()
+        assert x.edge_list() == g.edge_list()
+        assert x.to_dict() == g.to_dict()
+        assert sorted(x.query_pt_s('is', 'odd')) == sorted(f'n{i}' for i in range(1, 30, 2))
+        assert list(x.query_sp_t('n7', 'value')) == [7]
+        os.remove(pth)
+
+
+def test_io_stream_keys():
+    """
+    The streamed keys must match the hasher of the graph
+    """
+    from graphh.io.stream import iter_records, load_records
+    from graphh.util import HashCollision
+    g = gen_complete_gr(4)
+    with pytest.raises(ValueError):
+        load_records(Graph(hasher=Hasher(size=8)), iter_records(g))
+
+    x = Graph(hasher=Hasher(check=True))
+    key = x.add_node('a')
+    with pytest.raises(HashCollision):
+        load_records(x, [('n', [key, 'b'])])
+    assert x.get_node_id(key) == 'a'
+
+
+def test_io_legacy():
+    """
+    The old CBOR and MsgPack files are a single dict
+    """
+    import cbor2
+    import msgpack as mp
+    g = gen_complete_gr(5)
+
+    pth = 'tests/g.old'
+    with open(pth, 'wb') as fd:
+        cbor2.dump(g.to_dict(), fd)
+    assert cbor.import_cbor(Graph(), pth).edge_list() == g.edge_list()
+
+    with open(pth, 'wb') as fd:
+        fd.write(mp.packb(g.to_dict(), use_bin_type=True))
+    assert msgpack.import_msgpack(Graph(), pth).edge_list() == g.edge_list()
+    os.remove(pth)
+
+
 def test_io_csv():
     """
     Import-Export CSV files
@@ -73,4 +136,202 @@ def test_io_csv():
     os.remove(e_pth)
 
 
+def test_io_csv_stream():
+    """
+    Import-Export CSV files, with quoting and many chunks
+    """
+    g = Neuro()
+    g.add_triple('Paris, France', 'says', '"Bonjour"')
+    g.add_triple(b'bytes', 'has', 'new\nline')
+    for i in range(50):
+        g.add_triple(i, 'is', 'number')
+
+    n_pth = 'tests/nodes.csv'
+    e_pth = 'tests/edges.csv'
+    csv.export_csv(g, n_pth, e_pth, chunk_size=7)
+
+    x = Neuro()
+    csv.import_csv(x, n_pth, e_pth, chunk_size=7)
+
+    assert x.number_of_nodes() == g.number_of_nodes()
+    assert x.number_of_edges() == g.number_of_edges()
+    assert set(x.query_thing('says')) == {'"Bonjour"'}
+    assert set(x.query_subject('says')) == {'Paris, France'}
+    # The bytes node was saved as a string, so it has a new key
+    assert set(x.query_subject('has')) == {"b'bytes'"}
+    assert set(x.query_thing('has')) == {'new\nline'}
+
+    os.remove(n_pth)
+    os.remove(e_pth)
+
+
+def test_io_snapshot():
+    """
+    Export a snapshot and open it with mmap
+    """
+    g = gen_complete_gr(6)
+    pth = 'tests/g.snap'
+    snapshot.export_snapshot(g, pth)
+
+    x = snapshot.open_snapshot(pth)
+    assert type(x) is Graph
+    assert sorted(x.node_list()) == sorted(g.node_list())
+    assert sorted(x.edge_list()) == sorted(g.edge_list())
+    for node_id, value in g.iter_nodes():
+        assert x.get_node_id(node_id) == value
+        assert x.out_edges(node_id) == g.out_edges(node_id)
+        assert x.inc_edges(node_id) == g.inc_edges(node_id)
+        assert set(x.iter_next_nodes(node_id)) == set(g.iter_next_nodes(node_id))
+        assert x.all_degree(node_id) == g.all_degree(node_id)
+    assert x.get_node('a') == g.get_node('a')
+    assert x.has_edge(g.get_node('a'), g.get_node('b'))
+    assert not x.get_node('z')
+    del x
+
+    # The truncated files are refused
+    with open(pth, 'rb') as fd:
+        data = fd.read()
+    for size in (10, len(data) - 8):
+        with open(pth, 'wb') as fd:
+            fd.write(data[:size])
+        with pytest.raises(ValueError):
+            snapshot.open_snapshot(pth)
+    os.remove(pth)
+
+
+def test_io_snapshot_neuro():
+    g = Neuro(hasher=Hasher(size=16))
+    g.add_triple('mom', 'loves', 'dad')
+    g.add_triple('mom', 'loves', 'girl')
+    g.add_triple('dad', 'loves', 'mom')
+    g.add_triple('girl', 'age', 7)
+    g.add_triple('girl', 'height', 1.25)
+    g.add_triple('girl', 'tall', False)
+    g.add_triple(b'cat', 'likes', None)
+
+    pth = 'tests/n.snap'
+    snapshot.export_snapshot(g, pth)
+    x = snapshot.open_snapshot(pth)
+
+    assert type(x) is Neuro
+    assert len(x) == len(g)
+    assert sorted(x.query_sp_t('mom', 'loves')) == ['dad', 'girl']
+    assert sorted(x.query_pt_s('loves', 'mom')) == ['dad']
+    assert sorted(x.query_thing('loves')) == ['dad', 'girl', 'mom']
+    assert sorted(x.query_subject('loves')) == ['dad', 'mom']
+    assert list(x.query_thing('age')) == [7]
+    assert list(x.query_thing('height')) == [1.25]
+    assert list(x.query_thing('tall')) == [False]
+    assert list(x.query_subject('likes')) == [b'cat']
+    assert list(x.query_sp_t('cat', 'likes')) == [None]
+
+    with pytest.raises(TypeError):
+        x.add_node('new')
+    with pytest.raises(TypeError):
+        x.add_triple('dad', 'loves', 'boy')
+    del x
+    os.remove(pth)
+
+
+def test_io_append_log():
+    """
+    Append-only log, with compaction and replay
+    """
+    pth = 'tests/wal'
+    for ext in ('.log', '.snap'):
+        if os.path.isfile(pth + ext):
+            os.remove(pth + ext)
+
+    g = LoggedNeuro()
+    g.open_log(pth, compact_every=10)
+    g.add_triple('mom', 'loves', 'dad')
+    g.add_triple('dad', 'loves', 'mom')
+    g.save()
+    assert not os.path.isfile(pth + '.snap')
+    size = os.path.getsize(pth + '.log')
+
+    # Replay the log only
+    x = LoggedNeuro()
+    x.open_log(pth)
+    assert x.node_list() == g.node_list()
+    assert sorted(x.query_sp_t('mom', 'loves')) == ['dad']
+    x.close_log()
+    assert os.path.getsize(pth + '.log') == size
+
+    # Compact into a snapshot
+    g.add_triples([('mom', 'loves', 'girl'), ('girl', 'age', 7)])
+    g.save()
+    assert os.path.isfile(pth + '.snap')
+    # The log is small again, after compaction
+    g.add_triple('dad', 'loves', 'boy')
+    g.save()
+    assert os.path.getsize(pth + '.log') < size
+    # The removed triples & nodes are logged too
+    g.add_triple('dad', 'loves', 'cat')
+    g.remove_triple('dad', 'loves', 'cat')
+    g.remove_node(g.get_node('cat'))
+    # The values that can't be logged are refused, before they are added
+    with pytest.raises(TypeError):
+        g.add_triple('dad', 'loves', bytearray(b'cat'))
+    with pytest.raises(TypeError):
+        g.add_triples([('dad', 'loves', bytearray(b'cat'))])
+    assert g.get_node(bytearray(b'cat')) is False
+    g.close_log()
+
+    # A partial record at the end is dropped
+    with open(pth + '.log', 'ab') as fd:
+        fd.write(b'N' + b'x' * 5)
+
+    x = LoggedNeuro()
+    x.open_log(pth)
+    assert sorted(x.node_list()) == sorted(g.node_list())
+    assert sorted(x.edge_list()) == sorted(g.edge_list())
+    assert sorted(x.query_sp_t('mom', 'loves')) == ['dad', 'girl']
+    assert sorted(x.query_sp_t('dad', 'loves')) == ['boy', 'mom']
+    assert list(x.query_pt_s('age', 7)) == ['girl']
+    x.close_log()
+
+    os.remove(pth + '.log')
+    os.remove(pth + '.snap')
+
+    with pytest.raises(ValueError):
+        LoggedNeuro(partitioned=True).open_log(pth)
+    assert not os.path.isfile(pth + '.log')
+
+
+def test_io_parallel():
+    """
+    Import CSV, MsgPack and CBOR shards in parallel
+    """
+    shards = [Neuro() for _ in range(3)]
+    full = Neuro()
+    for i in range(60):
+        triple = (f'n{i}', 'is', 'odd' if i % 2 else 'even')
+        shards[i % 3].add_triple(*triple)
+        full.add_triple(*triple)
+
+    csv.export_csv(shards[0], 'tests/s0n.csv', 'tests/s0e.csv')
+    msgpack.export_msgpack(shards[1], 'tests/s1.pack', chunk_size=9)
+    cbor.export_cbor(shards[2], 'tests/s2.cbor', chunk_size=9)
+    files = [('tests/s0n.csv', 'tests/s0e.csv'), 'tests/s1.pack', 'tests/s2.cbor']
+
+    g = import_parallel(Neuro(), files, workers=2)
+
+    assert sorted(g.node_list()) == sorted(full.node_list())
+    assert sorted(g.edge_list()) == sorted(full.edge_list())
+    # The CSV shard has no S+P / P+T indexes
+    assert sorted(g.query_pt_s('is', 'odd')) == sorted(f'n{i}' for i in range(1, 60, 2) if i % 3)
+    assert sorted(g.query_thing('is')) == ['even', 'odd']
+
+    # The MsgPack and CBOR keys must match the hasher of the graph
+    for f in files[1:]:
+        with pytest.raises(ValueError):
+            import_parallel(Neuro(hasher=Hasher(size=16)), [f], workers=1)
+        with pytest.raises(ValueError):
+            import_parallel(Neuro(hasher=Hasher(algo='xxh3', size=8)), [f], workers=1)
+
+    for f in ('tests/s0n.csv', 'tests/s0e.csv', 'tests/s1.pack', 'tests/s2.cbor'):
+        os.remove(f)
+
+
 # The end
@@ -0,0 +1,203 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+import threading
+from graphh import Neuro
+from graphh.locks import RWLock, ThreadSafe, SafeNeuro, SafeConvention
+
+
+def test_rwlock():
+    lock = RWLock()
+    # The same thread can read again, and read while writing
+    lock.acquire_read()
+    lock.acquire_read()
+    with pytest.raises(RuntimeError):
+        lock.acquire_write()
+    lock.release_read()
+    lock.release_read()
+    lock.acquire_write()
+    lock.acquire_write()
+    lock.acquire_read()
+    lock.release_read()
+    lock.release_write()
+    lock.release_write()
+
+    # A writer waits for the readers
+    order = []
+    lock.acquire_read()
+
+    def write():
+        lock.acquire_write()
+        order.append('write')
+        lock.release_write()
+
+    t = threading.Thread(target=write)
+    t.start()
+    t.join(0.1)
+    order.append('read')
+    lock.release_read()
+    t.join()
+    assert order == ['read', 'write']
+
+
+def test_concurrent_reads():
+    g = SafeNeuro()
+    g.add_triple('hub', 'links', 'n0')
+    hub = g.get_node('hub')
+    errors = []
+    done = threading.Event()
+
+    def write():
+        try:
+            for batch in range(0, 500, 20):
+                # The readers see the whole batch, or nothing
+                with g.writing():
+                    for i in range(batch, batch + 20):
+                        g.add_triple('hub', 'links', f'n{i}')
+                        g.add_triple(f'n{i}', 'links', 'hub')
+        except Exception as err: # pragma: no cover
+            errors.append(err)
+        finally:
+            done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                for _ in g.iter_next_nodes(hub):
+                    pass
+                things = list(g.query_thing('links'))
+                assert len(things) == len(set(things))
+                # n0 ... n19, n20 ... n39, and the hub
+                assert len(things) % 20 == 1
+                assert g.out_edges(hub) is not g.out_edges(hub)
+        except Exception as err: # pragma: no cover
+            errors.append(err)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    threads.append(threading.Thread(target=write))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(list(g.query_sp_t('hub', 'links'))) == 500
+    assert len(list(g.query_pt_s('links', 'hub'))) == 500
+
+    # The frozen copy doesn't need the lock, but it's still usable
+    assert sorted(g.freeze().query_thing('links')) == sorted(g.query_thing('links'))
+    with g.writing():
+        g.add_triple('hub', 'links', 'last')
+        with g.reading():
+            assert g.has_triple('hub', 'links', 'last')
+
+
+def test_concurrent_docs():
+    g = SafeConvention('Geo')
+    g.create_table('countries')
+    g.enable_cache(size=100)
+    errors = []
+
+    def write(start):
+        try:
+            for i in range(start, start + 300):
+                g.create_doc('countries', f'C{i}', {'name': f'Country {i}', 'region': 'Europe'})
+        except Exception as err: # pragma: no cover
+            errors.append(err)
+
+    def read():
+        try:
+            for i in range(300):
+                docs = g.query_docs('countries', {'region': 'Europe'})
+                assert all(d['region'] == 'Europe' for d in docs)
+                g.get_doc('countries', f'C{i}')
+        except Exception as err: # pragma: no cover
+            errors.append(err)
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    threads += [threading.Thread(target=write, args=(i * 300,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert g.count_docs('countries') == 600
+    assert len(g.query_docs('countries', {'region': 'Europe'})) == 600
+
+
+def test_locked_loaders():
+    from graphh.io import msgpack
+    from graphh.io.wal import AppendLog
+    src = Neuro()
+    for i in range(20):
+        src.add_triple(f'n{i}', 'is', 'odd' if i % 2 else 'even')
+    pth = 'tests/locked.mp'
+    msgpack.export_msgpack(src, pth, chunk_size=5)
+
+    # The import waits for the readers, then the readers see all the records
+    g = SafeNeuro()
+    done = threading.Event()
+
+    def load():
+        msgpack.import_msgpack(g, pth)
+        done.set()
+
+    with g.reading():
+        t = threading.Thread(target=load)
+        t.start()
+        assert not done.wait(0.2)
+        assert g.number_of_nodes() == 0
+    t.join()
+    assert g.to_dict() == src.to_dict()
+    os.remove(pth)
+
+    # The log replay takes the same write lock, again
+    class SafeLoggedNeuro(ThreadSafe, AppendLog, Neuro):
+        pass
+
+    pth = 'tests/locked'
+    x = SafeLoggedNeuro()
+    x.open_log(pth)
+    x.add_triple('mom', 'loves', 'dad')
+    x.close_log()
+    y = SafeLoggedNeuro()
+    y.open_log(pth)
+    assert list(y.query_sp_t('mom', 'loves')) == ['dad']
+    y.close_log()
+    os.remove(pth + '.log')
+
+
+def test_range_index_lock():
+    g = SafeNeuro()
+    g.add_triples((f'n{i}', 'size', i) for i in range(100))
+    p_key = g.get_node('size')
+
+    # Inside a read block, the missing index is only made for the query
+    with g.reading():
+        assert g.top_k('size', 2) == [('n0', 0), ('n1', 1)]
+        assert (p_key, 'range') not in g._value_indexes
+    # Otherwise, it's made once, under the write lock
+    assert list(g.query_range('size', 97)) == ['n97', 'n98', 'n99']
+    index = g._value_indexes[p_key, 'range']
+    assert g.top_k('size', 1, reverse=True) == [('n99', 99)]
+    assert g._value_indexes[p_key, 'range'] is index
+
+    # Many readers and freeze, with the first range queries of many predicates
+    g.add_triples((f'n{i}', f'p{j}', i) for i in range(50) for j in range(20))
+    errors = []
+
+    def read(j):
+        try:
+            assert g.top_k(f'p{j % 20}', 1) == [('n0', 0)]
+            g.freeze()
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=read, args=(j,)) for j in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(g._value_indexes) == 21
@@ -43,6 +43,10 @@ def test_miserables():
     knows_who = set(l['source'] for l in data['links'])
     assert set(g.query_subject('knows')) == knows_who
 
-    # Want I need to find ::
     # Who knows the most people (top 3)
+    top = g.top_k_by_fanout('knows', 3)
+    assert set(top) == {('Bossuet', 10), ('Joly', 10), ('Marius', 10)}
+
     # Who is known by the most people (top 3)
+    top = g.top_k_by_fanout('knows', 3, reverse=True)
+    assert top == [('Valjean', 32), ('Gavroche', 18), ('Thenardier', 13)]
@@ -68,3 +68,120 @@ def test_family():
 
     assert sorted(g.query_triple('mom', 'loves', '?')) == ['dad', 'girl', 'lazy cat']
     assert sorted(g.query_triple('dad', 'loves', '?')) == ['boy', 'mom']
+
+
+def test_query_triple():
+    family = [
+        ('mom', 'loves', 'dad'), ('dad', 'loves', 'mom'), ('mom', 'loves', 'girl'),
+        ('girl', 'needs', 'mom'), ('boy', 'needs', 'mom'), ('loves', 'means', 'like'),
+    ]
+    for g in (Neuro(), Neuro(compact=True), Neuro(partitioned=True)):
+        g.add_triples(family)
+        for x in (g, g.freeze()):
+            assert sorted(x.query_triple('mom', '?', '?')) == [('loves', 'dad'), ('loves', 'girl')]
+            assert sorted(x.query_triple('?', '?', 'mom')) == [('boy', 'needs'), ('dad', 'loves'), ('girl', 'needs')]
+            assert sorted(x.query_triple('mom', '?', 'girl')) == ['loves']
+            assert sorted(x.query_triple('?', 'loves', '?')) == [('dad', 'mom'), ('mom', 'dad'), ('mom', 'girl')]
+            assert sorted(x.query_triple('?', '?', '?')) == sorted(family)
+            assert list(x.query_triple('mom', 'loves', 'dad')) == [()]
+            assert list(x.query_triple('mom', 'loves', 'boy')) == []
+            assert list(x.query_triple('?', '?', 'nobody')) == []
+            # The predicate "loves" is also a subject
+            assert list(x.query_triple('loves', '?', '?')) == [('means', 'like')]
+            assert x.has_triple('girl', 'needs', 'mom')
+            assert not x.has_triple('mom', 'needs', 'girl')
+
+
+def test_query_patterns():
+    from graphh.query import compile_patterns, plan
+
+    g = Neuro()
+    g.add_triples([
+        ('mom', 'loves', 'dad'), ('dad', 'loves', 'mom'), ('mom', 'loves', 'girl'), ('dad', 'loves', 'boy'),
+        ('girl', 'needs', 'mom'), ('boy', 'needs', 'mom'), ('boy', 'needs', 'dad'),
+        ('mom', 'age', 40), ('dad', 'age', 42),
+    ])
+    # Who loves someone who needs them
+    found = g.query_patterns([('?a', 'loves', '?b'), ('?b', 'needs', '?a')])
+    assert sorted((m['a'], m['b']) for m in found) == [('dad', 'boy'), ('mom', 'girl')]
+    # The anonymous parts are not returned
+    found = g.query_patterns([('?kid', 'needs', 'mom'), ('?kid', 'needs', 'dad'), ('?', 'loves', '?kid')])
+    assert list(found) == [{'kid': 'boy'}]
+    found = g.query_patterns([('?p', 'loves', 'girl'), ('?p', 'age', '?age')])
+    assert list(found) == [{'p': 'mom', 'age': 40}]
+    assert list(g.query_patterns([('?p', 'loves', 'nobody'), ('?p', 'age', '?age')])) == []
+    assert list(g.query_patterns([('?x', 'loves', '?x')])) == []
+
+    # The most selective pattern is the first
+    order = plan(g, compile_patterns(g, [('?p', 'loves', '?k'), ('?k', 'needs', 'dad')]))
+    assert order[0][1:] == (g.get_node('needs'), g.get_node('dad'))
+    # The variables without a common pattern are combined
+    found = g.query_patterns([('?p', 'age', 40), ('?k', 'needs', 'dad')])
+    assert list(found) == [{'p': 'mom', 'k': 'boy'}]
+
+
+def test_query_postings():
+    from graphh.query import compile_patterns, intersect
+
+    class Counted(Neuro):
+        calls = 0
+
+        def match_keys(self, s_key=None, p_key=None, t_key=None):
+            Counted.calls += 1
+            return super().match_keys(s_key, p_key, t_key)
+
+    g = Counted()
+    for i in range(300):
+        g.add_triples([(f'c{i}', 'region', 'Europe'), (f'c{i}', 'capital', f'city{i}')])
+        if i % 100 == 7:
+            g.add_triple(f'c{i}', 'currency', 'EUR')
+    g.add_triple('x', 'currency', 'EUR')
+    patterns = [('?c', 'region', 'Europe'), ('?c', 'currency', 'EUR'), ('?c', 'capital', '?city')]
+
+    # The postings of ?c are intersected, the capitals are looked up for the 3 countries only
+    rest, candidates = intersect(g, compile_patterns(g, patterns))
+    assert rest == [compile_patterns(g, patterns)[2]]
+    assert candidates == {'?c': {g.get_node(f'c{i}') for i in (7, 107, 207)}}
+    found = g.query_patterns(patterns)
+    assert sorted(m['city'] for m in found) == ['city107', 'city207', 'city7']
+    assert Counted.calls == 3
+    assert list(g.query_patterns([('?c', 'currency', 'EUR'), ('?c', 'region', 'Asia')])) == []
+
+
+def test_remove_triple():
+    import pytest
+    for g in (Neuro(), Neuro(partitioned=True)):
+        g.add_triples([
+            ('mom', 'loves', 'dad'), ('dad', 'loves', 'mom'), ('mom', 'loves', 'girl'),
+            ('girl', 'needs', 'mom'), ('girl', 'age', 7), ('boy', 'age', 5)])
+        g.create_value_index('loves')
+        assert g.top_k('age', 1) == [('boy', 5)]
+        edges = g.number_of_edges()
+
+        assert g.remove_triple('mom', 'loves', 'girl')
+        assert not g.remove_triple('mom', 'loves', 'girl')
+        assert not g.has_triple('mom', 'loves', 'girl')
+        assert sorted(g.query_sp_t('mom', 'loves')) == ['dad']
+        assert list(g.query_pt_s('loves', 'girl')) == []
+        assert sorted(g.query_thing('loves', 'd', '<')) == ['dad']
+        assert list(g.query_thing('loves', 'gi', '<')) == []
+        # Only the P->T edge is not used anymore
+        assert g.number_of_edges() == edges - (0 if g._predicates else 1)
+        assert g.cardinality('loves') == (2, 2, 2)
+
+        # All the triples of a node are removed, with the node
+        girl = g.get_node('girl')
+        assert g.remove_node(girl)
+        assert not g.remove_node(girl)
+        assert 'girl' not in g.query_subject('needs')
+        assert list(g.query_triple('?', '?', 'mom')) == [('dad', 'loves')]
+        assert g.top_k('age', 2, reverse=True) == [('boy', 5)]
+        assert list(g.query_range('age', 6)) == []
+
+    g = Neuro(compact=True)
+    g.add_triple('mom', 'loves', 'dad')
+    with pytest.raises(ValueError):
+        g.remove_triple('mom', 'loves', 'dad')
+    with pytest.raises(ValueError):
+        g.remove_node(g.get_node('dad'))
+    assert list(g.query_sp_t('mom', 'loves')) == ['dad']
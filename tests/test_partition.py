@@ -0,0 +1,70 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+from json import load
+from graphh import Neuro
+from graphh.io.stream import iter_records, load_records
+from graphh.io.snapshot import export_snapshot
+
+FAMILY = [
+    ('mom', 'loves', 'dad'), ('dad', 'loves', 'mom'), ('mom', 'loves', 'girl'),
+    ('dad', 'loves', 'boy'), ('girl', 'needs', 'mom'), ('boy', 'needs', 'mom'),
+]
+
+
+def check_family(g):
+    assert sorted(g.query_subject('loves')) == ['dad', 'mom']
+    assert sorted(g.query_thing('loves')) == ['boy', 'dad', 'girl', 'mom']
+    assert sorted(g.query_thing('loves', 'd', '<')) == ['dad']
+    assert sorted(g.query_sp_t('mom', 'loves')) == ['dad', 'girl']
+    assert sorted(g.query_pt_s('needs', 'mom')) == ['boy', 'girl']
+    assert list(g.query_pt_s('hates', 'mom')) == []
+    assert g.cardinality('loves') == (4, 2, 4)
+    assert g.cardinality('needs') == (2, 2, 1)
+    assert g.cardinality('hates') == (0, 0, 0)
+    assert g.fanout('needs', reverse=True) == {'mom': 2}
+
+
+def test_partitioned():
+    g = Neuro(partitioned=True)
+    for s, p, t in FAMILY:
+        g.add_triple(s, p, t)
+    # There are no predicate hub edges
+    assert g.number_of_nodes() == 6
+    assert g.number_of_edges() == 0
+    assert g.out_degree(g.get_node('loves')) == 0
+    check_family(g)
+    check_family(g.freeze())
+
+    b = Neuro(partitioned=True)
+    assert b.add_triples(FAMILY * 2) == 12
+    assert b.number_of_edges() == 0
+    check_family(b)
+
+    c = Neuro(partitioned=True)
+    c.from_dict(g.to_dict())
+    check_family(c)
+    # The default modes have the same results
+    for d in (Neuro(), Neuro(compact=True)):
+        d.add_triples(FAMILY)
+        check_family(d)
+
+
+def test_partitioned_records():
+    data = load(open('tests/data/les_miserables.json'))
+    g = Neuro(partitioned=True)
+    g.add_triples((link['source'], 'knows', link['target']) for link in data['links'])
+    top = g.top_k_by_fanout('knows', 1, reverse=True)
+    assert top == [('Valjean', 32)]
+
+    records = list(iter_records(g, chunk_size=100))
+    assert {tag for tag, _ in records[1:]} == {'n', 't'}
+    for target in (Neuro(partitioned=True), Neuro()):
+        load_records(target, records)
+        assert target.top_k_by_fanout('knows', 1, reverse=True) == top
+        assert set(target.query_subject('knows')) == set(g.query_subject('knows'))
+
+    with pytest.raises(ValueError):
+        export_snapshot(g, 'tests/partitioned.snap')
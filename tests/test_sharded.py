@@ -0,0 +1,97 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+from json import load
+from graphh import Graph, Neuro
+from graphh.sharded import ShardedGraph, ShardedNeuro
+
+COUNTRIES = load(open('tests/data/countries.json'))
+
+
+def iter_countries():
+    for item in COUNTRIES:
+        yield item['cca2'], 'region', item['region']
+        yield item['cca2'], 'name', item['name']['common']
+        for border in item['borders']:
+            yield item['cca2'], 'borders', border
+
+
+def test_sharded_graph():
+    data = load(open('tests/data/les_miserables.json'))
+    names = [n['id'] for n in data['nodes']]
+    g = Graph()
+    keys = g.add_nodes_from(names)
+    g.add_edges_from((g.get_node(l['source']), g.get_node(l['target'])) for l in data['links'])
+
+    with ShardedGraph(shards=3) as s:
+        assert s.add_nodes_from(names) == keys
+        assert s.add_node(names[0]) == keys[0]
+        edges = [(g.get_node(l['source']), g.get_node(l['target'])) for l in data['links']]
+        assert s.add_edges_from(edges) == [g.get_edge(*e) for e in edges]
+        assert s.add_edge(keys[0], b'missing') is False
+        assert s.number_of_nodes() == g.number_of_nodes()
+        assert s.number_of_edges() == g.number_of_edges()
+        assert sorted(s.node_list()) == sorted(g.node_list())
+        assert all(s.shard_sizes())
+        for key in keys:
+            assert s.get_node_id(key) == g.get_node_id(key)
+            assert set(s.iter_next_nodes(key)) == set(g.iter_next_nodes(key))
+            assert set(s.iter_prev_nodes(key)) == set(g.iter_prev_nodes(key))
+            assert s.out_degree(key) == g.out_degree(key)
+            assert s.inc_degree(key) == g.inc_degree(key)
+        head, tail = edges[0]
+        assert s.has_edge(head, tail)
+        assert not s.has_edge(tail, b'missing')
+        assert s.get_node('Valjean') == g.get_node('Valjean')
+        assert s.get_node('Nobody') is False
+    with pytest.raises(ValueError):
+        s.number_of_nodes()
+
+
+def test_sharded_neuro():
+    g = Neuro()
+    g.add_triples(iter_countries())
+    with ShardedNeuro(shards=4) as s:
+        assert s.add_triples(iter_countries()) == len(list(iter_countries()))
+        assert s.add_triple('XX', 'region', 'Nowhere') == g.add_triple('XX', 'region', 'Nowhere')
+        assert s.number_of_nodes() == g.number_of_nodes()
+        assert s.number_of_edges() == g.number_of_edges()
+        for p in ('region', 'borders', 'name'):
+            # The empty regions are None
+            assert sorted(s.query_thing(p), key=str) == sorted(g.query_thing(p), key=str)
+            assert sorted(s.query_subject(p)) == sorted(g.query_subject(p))
+        assert sorted(s.query_thing('name', 'Rom', '<')) == ['Romania']
+        for item in COUNTRIES[:20]:
+            uid = item['cca2']
+            assert sorted(s.query_sp_t(uid, 'borders')) == sorted(g.query_sp_t(uid, 'borders'))
+            assert sorted(s.query_pt_s('region', item['region'])) == sorted(g.query_pt_s('region', item['region']))
+            assert sorted(s.query_pt_s('borders', uid)) == sorted(g.query_pt_s('borders', uid))
+        region = g.get_node('region')
+        assert set(s.iter_next_nodes(region)) == set(g.iter_next_nodes(region))
+        assert s.has_edge(region, g.get_node('Europe'))
+
+        s.create_value_index('name')
+        s.add_triple('YY', 'name', 'Romania Mare')
+        assert sorted(s.query_thing('name', 'Rom', '<')) == ['Romania', 'Romania Mare']
+        assert s.has_triple('YY', 'name', 'Romania Mare')
+        assert s.remove_triple('YY', 'name', 'Romania Mare')
+        assert not s.has_triple('YY', 'name', 'Romania Mare')
+
+        # The equal values of different types are different nodes, in one chunk
+        numbers = [(1, 'is', 'int'), (1.0, 'is', 'float'), (True, 'is', 'bool')]
+        assert s.add_triples(numbers) == g.add_triples(numbers) == 3
+        assert list(s.query_sp_t(1.0, 'is')) == list(g.query_sp_t(1.0, 'is')) == ['float']
+        assert list(s.query_sp_t(True, 'is')) == ['bool']
+        assert [type(x) for x in s.query_pt_s('is', 'int')] == [int]
+        numbers = [('int', 'is', 1), ('float', 'is', 1.0), ('bool', 'is', True)]
+        s.add_triples(numbers)
+        g.add_triples(numbers)
+        assert sorted(type(x).__name__ for x in s.query_thing('is')) == \
+            sorted(type(x).__name__ for x in g.query_thing('is'))
+
+        # The errors from the shards are raised here, and the shards keep working
+        with pytest.raises(ValueError):
+            s.create_value_index('name', 'nowhere')
+        assert sorted(s.query_thing('name', 'Rom', '<')) == ['Romania']
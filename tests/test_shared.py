@@ -0,0 +1,57 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+from json import load
+from graphh import Neuro
+from graphh.shared import SharedGraph
+from graphh.traversal import bfs
+from graphh.generators import generate_star_gr
+
+COUNTRIES = load(open('tests/data/countries.json'))
+
+
+def countries(partitioned=False):
+    g = Neuro(partitioned=partitioned)
+    for item in COUNTRIES:
+        g.add_triple(item['cca2'], 'region', item['region'])
+        for border in item['borders']:
+            g.add_triple(item['cca2'], 'borders', border)
+    return g
+
+
+def test_shared_graph():
+    g = generate_star_gr(9)
+    for workers in (1, 2):
+        with SharedGraph(g, workers=workers) as sg:
+            keys = sg.node_list()
+            assert keys == g.freeze().node_list()
+            assert list(sg.degrees('out')) == [g.out_degree(k) for k in keys]
+            assert list(sg.degrees('inc')) == [g.inc_degree(k) for k in keys]
+            assert list(sg.degrees()) == [g.out_degree(k) + g.inc_degree(k) for k in keys]
+            with pytest.raises(ValueError):
+                sg.degrees('up')
+            with pytest.raises(ValueError):
+                sg.predicate_stats()
+    with pytest.raises(ValueError):
+        sg.degrees()
+
+
+def test_shared_neuro():
+    g = countries()
+    sources = [g.get_node(item['cca2']) for item in COUNTRIES[:30]] + [b'missing']
+    with SharedGraph(g, workers=2) as sg:
+        assert sg.predicate_stats() == {
+            'region': g.cardinality('region'), 'borders': g.cardinality('borders')}
+        for reverse in (False, True):
+            for depth in (None, 2):
+                counts = sg.reach_counts(sources, reverse=reverse, max_depth=depth)
+                assert b'missing' not in counts
+                assert counts == {
+                    k: len(list(bfs(g, k, reverse=reverse, max_depth=depth))) - 1 for k in sources[:-1]}
+
+    p = countries(partitioned=True)
+    with SharedGraph(p, workers=1) as sg:
+        assert sg.predicate_stats() == {
+            'region': p.cardinality('region'), 'borders': p.cardinality('borders')}
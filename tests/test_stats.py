@@ -0,0 +1,74 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+from graphh import Graph, stats
+from graphh.generators import generate_star_gr, gen_ladder_gr
+
+
+def backends(g):
+    c = Graph(compact=True)
+    c.from_dict(g.to_dict())
+    return g, c, g.freeze()
+
+
+def check_degrees(g):
+    nodes = g.node_list()
+    assert list(g.degrees('inc')) == [g.inc_degree(n) for n in nodes]
+    assert list(g.degrees('out')) == [g.out_degree(n) for n in nodes]
+    assert list(g.degrees()) == [g.all_degree(n) for n in nodes]
+    with pytest.raises(ValueError):
+        g.degrees('sideways')
+
+
+def test_degrees():
+    for g in backends(gen_ladder_gr(5)):
+        check_degrees(g)
+        assert g.degree_histogram() == [0, 0, 4, 6]
+        assert g.degree_histogram('inc') == [1, 5, 4]
+
+    for g in backends(generate_star_gr(9)):
+        check_degrees(g)
+        root = g.get_node(0)
+        assert g.top_k_by_degree(1) == [(root, 9)]
+        assert g.top_k_by_degree(1, 'inc') == [(g.get_node('a'), 1)]
+        assert len(g.top_k_by_degree(20)) == 10
+        assert g.top_k_by_degree(0) == []
+        assert g.degree_histogram('out') == [9, 0, 0, 0, 0, 0, 0, 0, 0, 1]
+
+    assert Graph().top_k_by_degree(3) == []
+    assert Graph().degree_histogram() == []
+
+
+def test_degree_columns():
+    # The columns are made once, then kept up to date
+    g = gen_ladder_gr(5)
+    check_degrees(g)
+    columns = g._degrees
+    a, b = g.add_node('new'), g.add_node('newer')
+    g.add_edge(a, b)
+    g.add_edges_from([(b, g.get_node(0)), (a, g.get_node(1))])
+    g.remove_edge(a, b)
+    check_degrees(g)
+    assert g._degrees is columns
+    g.remove_node(b)
+    check_degrees(g)
+
+
+def test_top_k_ties():
+    values = [2, 5, 5, 1, 5, 2, 0, 5]
+    assert stats.top_k(values, 3) == [1, 2, 4]
+    assert stats.top_k(values, 6) == [1, 2, 4, 7, 0, 5]
+    assert stats.top_k([7] * 10, 4) == [0, 1, 2, 3]
+
+
+def test_degrees_no_numpy(monkeypatch):
+    monkeypatch.setattr(stats, 'np', None)
+    for g in backends(generate_star_gr(9)):
+        check_degrees(g)
+        assert g.top_k_by_degree(2)[0] == (g.get_node(0), 9)
+        assert g.degree_histogram('inc') == [1, 9]
+    assert stats.top_k([3, 1, 3, 2], 3) == [0, 2, 3]
+    test_degree_columns()
+    test_top_k_ties()
@@ -0,0 +1,70 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+from graphh import Graph
+from graphh.traversal import bfs, dfs, neighborhood, shortest_path, bidirectional_path
+from graphh.generators import generate_line_gr, generate_star_gr, generate_polygon_gr, gen_ladder_gr
+
+
+def backends(g):
+    """
+    The same graph, with the default, compact and frozen adjacency.
+    """
+    c = Graph(compact=True)
+    c.from_dict(g.to_dict())
+    return g, c, g.freeze()
+
+
+def test_bfs_dfs():
+    for g in backends(generate_line_gr(6)):
+        first = g.get_node(1)
+        last = g.get_node(6)
+        nodes = [g.get_node(i) for i in range(1, 7)]
+        assert list(bfs(g, first)) == nodes
+        assert list(dfs(g, first)) == nodes
+        assert list(bfs(g, last, reverse=True)) == nodes[::-1]
+        assert list(bfs(g, first, max_depth=2)) == nodes[:3]
+        assert list(bfs(g, b'missing')) == []
+
+    for g in backends(generate_star_gr(9)):
+        root = g.get_node(0)
+        nodes = list(bfs(g, root))
+        assert nodes[0] == root
+        assert len(nodes) == 10
+        assert set(dfs(g, root)) == set(nodes)
+        assert list(bfs(g, g.get_node('a'))) == [g.get_node('a')]
+
+    for g in backends(generate_polygon_gr(5)):
+        a = g.get_node('a')
+        assert len(list(dfs(g, a))) == 5
+        assert len(list(dfs(g, a, reverse=True))) == 5
+
+
+def test_neighborhood():
+    for g in backends(gen_ladder_gr(4)):
+        a = g.get_node('a')
+        assert neighborhood(g, a, 0) == {a}
+        assert neighborhood(g, a, 1) == {a, g.get_node('b'), g.get_node('c')}
+        assert len(neighborhood(g, a, 10)) == 8
+        assert neighborhood(g, g.get_node('h'), 1, reverse=True) == {g.get_node(x) for x in 'hgf'}
+
+
+def test_shortest_path():
+    for g in backends(gen_ladder_gr(4)):
+        a, b, h = g.get_node('a'), g.get_node('b'), g.get_node('h')
+        for func in (shortest_path, bidirectional_path):
+            path = func(g, a, h)
+            assert len(path) == 5
+            assert path[0] == a and path[-1] == h
+            for head, tail in zip(path, path[1:]):
+                assert g.get_edge(head, tail)
+            assert func(g, a, a) == [a]
+            assert func(g, a, b) == [a, b]
+            assert func(g, h, a) is None
+            assert func(g, a, b'missing') is None
+
+    for g in backends(generate_polygon_gr(7)):
+        a, g_ = g.get_node('a'), g.get_node('g')
+        assert shortest_path(g, a, g_) == bidirectional_path(g, a, g_)
+        assert len(shortest_path(g, g_, a)) == 2
@@ -0,0 +1,100 @@
+
+import os, sys # noqa: E401
+sys.path.insert(1, os.getcwd())
+
+import pytest
+from json import load
+from graphh import Neuro
+from graphh.values import ValueIndex
+
+COUNTRIES = load(open('tests/data/countries.json'))
+QUERIES = [('U', '<'), ('ia', '>'), ('Republic', ''), ('of', ''), ('Romania', '='), ('Nowhere', '<'), ('zzz', '')]
+
+
+def test_value_index():
+    index = ValueIndex(['banana', 'bandana', 'cabana', 42, None])
+    assert len(index) == 3
+    assert sorted(index.match('ban', '<')) == ['banana', 'bandana']
+    assert sorted(index.match('ana', '>')) == ['banana', 'bandana', 'cabana']
+    assert sorted(index.match('aban', '')) == ['cabana']
+    assert sorted(index.match('d', '')) == ['bandana']
+    assert list(index.match('banana', '=')) == ['banana']
+    index.add('band')
+    assert sorted(index.match('band', '<')) == ['band', 'bandana']
+
+    # The removed values are skipped, then dropped from the sorted lists
+    sorted_values = index._sorted
+    index.remove('bandana')
+    assert sorted(index.match('ban', '<')) == ['banana', 'band']
+    assert sorted(index.match('ana', '>')) == ['banana', 'cabana']
+    assert index._sorted is sorted_values
+    index.add('bandana')
+    index.remove('band')
+    index.remove('cabana')
+    assert sorted(index.match('an', '')) == ['banana', 'bandana']
+    assert index._sorted == ['banana', 'bandana']
+    assert sorted_values == ['banana', 'band', 'bandana', 'cabana']
+
+
+@pytest.mark.parametrize('partitioned', [False, True])
+def test_indexed_queries(partitioned):
+    g = Neuro(partitioned=partitioned)
+    half = len(COUNTRIES) // 2
+    g.add_triples((n['cca2'], 'official_name', n['name']['official']) for n in COUNTRIES[:half])
+    scans = {q: sorted(g.query_thing('official_name', *q)) for q in QUERIES}
+    subject_scan = sorted(g.query_subject('official_name', 'R', '<'))
+
+    g.create_value_index('official_name')
+    g.create_value_index('official_name', 'subject')
+    for q in QUERIES:
+        assert sorted(g.query_thing('official_name', *q)) == scans[q]
+    assert sorted(g.query_subject('official_name', 'R', '<')) == subject_scan
+
+    # The new triples are indexed
+    for n in COUNTRIES[half:]:
+        g.add_triple(n['cca2'], 'official_name', n['name']['official'])
+    g.add_triples([('ZZ', 'official_name', 'Utopia')])
+    names = [n['name']['official'] for n in COUNTRIES] + ['Utopia']
+    assert sorted(g.query_thing('official_name', 'U', '<')) == sorted(n for n in names if n.startswith('U'))
+    assert sorted(g.query_thing('official_name', 'opia', '>')) == ['Federal Democratic Republic of Ethiopia', 'Utopia']
+    assert sorted(g.query_subject('official_name', 'Z', '<')) == ['ZA', 'ZM', 'ZW', 'ZZ']
+
+    f = g.freeze()
+    g.add_triple('YY', 'official_name', 'Uchronia')
+    assert 'Uchronia' not in set(f.query_thing('official_name', 'U', '<'))
+    assert 'Uchronia' in set(g.query_thing('official_name', 'U', '<'))
+
+    g.drop_value_index('official_name')
+    assert sorted(g.query_thing('official_name', 'opia', '>')) == ['Federal Democratic Republic of Ethiopia', 'Utopia']
+    with pytest.raises(ValueError):
+        g.create_value_index('official_name', 'predicate')
+
+
+def test_range_index():
+    g = Neuro()
+    g.add_triples((n['cca2'], 'area', n['area']) for n in COUNTRIES)
+    g.add_triple('XX', 'area', 'unknown')
+    g.add_triple('XX', 'area', True)
+    areas = sorted((n['area'], n['cca2']) for n in COUNTRIES)
+
+    assert list(g.query_range('area', 1000, 2000)) == [c for a, c in areas if 1000 <= a <= 2000]
+    assert list(g.query_range('area', hi=1)) == [c for a, c in areas if a <= 1]
+    assert len(list(g.query_range('area'))) == len(COUNTRIES)
+    assert g.top_k('area', 2, reverse=True) == [(c, a) for a, c in areas[:-3:-1]]
+    assert g.top_k('area', 0) == []
+    assert list(g.query_range('nothing', 1, 2)) == []
+
+    # The index is kept up to date
+    g.add_triple('ZZ', 'area', 1e9)
+    g.add_triples([('ZY', 'area', -2)])
+    assert g.top_k('area', 1, reverse=True) == [('ZZ', 1e9)]
+    assert g.top_k('area', 1) == [('ZY', -2)]
+
+    # The removed pairs are skipped
+    g.remove_triple('ZZ', 'area', 1e9)
+    assert g.top_k('area', 2, reverse=True) == [(c, a) for a, c in areas[:-3:-1]]
+    assert list(g.query_range('area', hi=-2)) == ['ZY']
+    g.remove_triple('ZY', 'area', -2)
+    assert list(g.query_range('area', hi=-2)) == []
+    g.add_triple('ZY', 'area', -2)
+    assert g.top_k('area', 1) == [('ZY', -2)]